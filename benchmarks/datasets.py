@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Synthetic datasets for the benchmarks. All generators are deterministic,
+the same arguments give the same data.
+"""
+
+import random
+
+LATIN = u'abcdefghijklmnopqrstuvwxyz'
+# czech letters, common in the test data of translated installations
+ACCENTED = u'áčďéěíňóřšťúůýž'
+# wide characters, every one takes two terminal columns
+CJK = u'中文日本語漢字軟件包管理器測試'
+
+
+def _word(rng, alphabet, length):
+    return u''.join(rng.choice(alphabet) for _i in xrange(length))
+
+
+def _text(rng, alphabet, words, word_length=6):
+    return u' '.join(_word(rng, alphabet, rng.randint(2, word_length)) for _i in xrange(words))
+
+
+def columns(count, multiline=()):
+    """
+    Returns printer column definitions col_0 .. col_<count-1>.
+
+    :type multiline: iterable of int
+    :param multiline: indexes of the multiline columns
+    """
+    cols = []
+    for i in xrange(count):
+        col = {'attr_name': 'col_%d' % i, 'name': u'Column %d' % i}
+        if i in multiline:
+            col['multiline'] = True
+        cols.append(col)
+    return cols
+
+
+def table(rows, column_count, alphabet=LATIN, words=2, multiline=(), seed=0):
+    """
+    Returns list of items for the columns(column_count).
+
+    :type alphabet: unicode
+    :param alphabet: characters of the values, e.g. CJK
+    :type words: int
+    :param words: number of words in one value
+    :param multiline: indexes of columns with multiline values
+    """
+    rng = random.Random(seed)
+    items = []
+    for row in xrange(rows):
+        item = {'id': row}
+        for i in xrange(column_count):
+            if i in multiline:
+                item['col_%d' % i] = u'\n'.join(_text(rng, alphabet, words) for _line in xrange(5))
+            else:
+                item['col_%d' % i] = _text(rng, alphabet, words)
+        items.append(item)
+    return items
+
+
+def wide_table(rows=2000):
+    return columns(30), table(rows, 30)
+
+
+def narrow_table(rows=20000):
+    return columns(3), table(rows, 3)
+
+
+def cjk_table(rows=5000):
+    return columns(6), table(rows, 6, alphabet=CJK + LATIN, words=3)
+
+
+def multiline_table(rows=2000):
+    multiline = (2, 4)
+    return columns(6, multiline), table(rows, 6, alphabet=ACCENTED + LATIN, words=4, multiline=multiline)
+
+
+def strings(count=20000, alphabet=CJK + ACCENTED + LATIN, length=40, seed=0):
+    rng = random.Random(seed)
+    return [_word(rng, alphabet, length) for _i in xrange(count)]
+
+
+def command_lines(count=5000, options=8, seed=0):
+    """
+    Returns command lines with long and short options and quoted values.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for _i in xrange(count):
+        parts = ['repo', 'create']
+        for j in xrange(options):
+            value = _text(rng, LATIN, rng.randint(1, 3))
+            if ' ' in value:
+                value = '"%s"' % value
+            if j % 3 == 0:
+                parts.append('-%s %s' % (rng.choice(LATIN), value))
+            else:
+                parts.append('--option_%d=%s' % (j, value))
+        lines.append(' '.join(parts).encode('utf-8'))
+    return lines
+
+
+def command_tree(depth=3, width=6, commands=8, options=40):
+    """
+    Builds a cli tree of sections 'depth' levels deep, every section with
+    'width' subsections and 'commands' commands with 'options' long options.
+
+    :return: (root section, list of completion lines reaching every level)
+    """
+    from okaara.cli import Section
+    from pertinax.cli import PertinaxCommand
+
+    class Context(object):
+        prompt = None
+        bindings = None
+        config = None
+
+    def setup_options(self):
+        for i in xrange(options):
+            self.create_option('--option_%d' % i, 'option %d' % i)
+
+    command_class = type('BenchmarkCommand', (PertinaxCommand,), {
+        'abstract': True,
+        '_setup_options': setup_options,
+    })
+    context = Context()
+    lines = []
+
+    def fill(section, prefix, level):
+        for i in xrange(commands):
+            command = command_class(context)
+            command.name = 'command_%d' % i
+            section.add_command(command)
+        lines.append(prefix + ' ')
+        lines.append(prefix + ' command_1 --option_')
+        if level == depth:
+            return
+        for i in xrange(width):
+            subsection = Section('section_%d' % i, 'section %d' % i)
+            section.add_subsection(subsection)
+            fill(subsection, '%s section_%d' % (prefix, i), level + 1)
+
+    root = Section('root', 'root section')
+    fill(root, '', 1)
+    return root, [line.lstrip() for line in lines]
@@ -0,0 +1,240 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Throughput and peak memory of the printer and completion hot paths.
+
+Every case runs in a fresh interpreter, so the peak memory (max rss) is
+not affected by the other cases. Throughput is the number of processed
+units (rows, strings, lines) per second of the best of the repeats.
+
+Usage:
+    python -m benchmarks.hot_paths [--case NAME] [--repeat 3]
+    python -m benchmarks.hot_paths --save-baseline benchmarks/baseline.json
+    python -m benchmarks.hot_paths --baseline benchmarks/baseline.json [--threshold 10]
+
+With a baseline, the exit code is non-zero when throughput of any case
+drops by more than the threshold (in percent) or its peak memory grows
+by more than the threshold.
+"""
+
+import json
+import subprocess
+import sys
+import time
+from optparse import OptionParser
+
+import __builtin__
+
+from benchmarks import datasets
+
+DEFAULT_THRESHOLD = 10.0
+
+
+class NullOutput(object):
+    """
+    Output that throws the text away, the benchmarks measure formatting only.
+    """
+
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+def _print_items(strategy_class, dataset):
+    columns, items = dataset()
+
+    def run():
+        strategy = strategy_class(output=NullOutput())
+        strategy.print_items(u'Benchmark', columns, items)
+        return len(items)
+    return run
+
+
+def grep_wide():
+    from pertinax.ui.printer import GrepStrategy
+    return _print_items(GrepStrategy, datasets.wide_table)
+
+
+def grep_narrow():
+    from pertinax.ui.printer import GrepStrategy
+    return _print_items(GrepStrategy, datasets.narrow_table)
+
+
+def grep_cjk():
+    from pertinax.ui.printer import GrepStrategy
+    return _print_items(GrepStrategy, datasets.cjk_table)
+
+
+def verbose_multiline():
+    from pertinax.ui.printer import VerboseStrategy
+    return _print_items(VerboseStrategy, datasets.multiline_table)
+
+
+def verbose_cjk():
+    from pertinax.ui.printer import VerboseStrategy
+    return _print_items(VerboseStrategy, datasets.cjk_table)
+
+
+def unicode_len():
+    from pertinax.ui.printer import unicode_len as func
+    strings = datasets.strings()
+
+    def run():
+        for text in strings:
+            func(text)
+        return len(strings)
+    return run
+
+
+def parse_tokens():
+    from pertinax.completion import parse_tokens as func
+    lines = datasets.command_lines()
+
+    def run():
+        for line in lines:
+            func(line)
+        return len(lines)
+    return run
+
+
+def complete():
+    from pertinax.completion import Completion
+    root, lines = datasets.command_tree()
+    completion = Completion(root)
+    # every line is completed many times, as the user types
+    lines = lines * 20
+
+    def run():
+        for line in lines:
+            completion.complete(line)
+        return len(lines)
+    return run
+
+
+# name -> function that prepares the data and returns the measured callable
+CASES = (
+    ('grep_wide', grep_wide),
+    ('grep_narrow', grep_narrow),
+    ('grep_cjk', grep_cjk),
+    ('verbose_multiline', verbose_multiline),
+    ('verbose_cjk', verbose_cjk),
+    ('unicode_len', unicode_len),
+    ('parse_tokens', parse_tokens),
+    ('complete', complete),
+)
+
+
+def run_case(name, repeat):
+    """
+    Run a case in this process.
+
+    :return: dict with units, seconds of the best run and peak rss in kB
+    """
+    import resource
+
+    # the translation function is installed by the launcher
+    if not hasattr(__builtin__, '_'):
+        __builtin__._ = lambda text: text
+
+    run = dict(CASES)[name]()
+    best = None
+    units = 0
+    for _i in xrange(repeat):
+        start = time.time()
+        units = run()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {'units': units, 'seconds': best,
+        'peak_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def measure(name, repeat, python=sys.executable):
+    """
+    Run a case in a fresh interpreter.
+    """
+    proc = subprocess.Popen([python, '-m', 'benchmarks.hot_paths', '--child', name, '--repeat', str(repeat)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError('Benchmark %s failed:\n%s' % (name, err))
+    result = json.loads(out)
+    result['throughput'] = result['units'] / result['seconds'] if result['seconds'] else 0.0
+    return result
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns list of regression messages.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        slowdown = 100.0 * (base['throughput'] - result['throughput']) / base['throughput']
+        if slowdown > threshold:
+            regressions.append('%s: throughput %.0f/s is %.1f%% below the baseline %.0f/s'
+                % (name, result['throughput'], slowdown, base['throughput']))
+        growth = 100.0 * (result['peak_kb'] - base['peak_kb']) / base['peak_kb']
+        if growth > threshold:
+            regressions.append('%s: peak memory %.1f MB is %.1f%% above the baseline %.1f MB'
+                % (name, result['peak_kb'] / 1024.0, growth, base['peak_kb'] / 1024.0))
+    return regressions
+
+
+def main(args):
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--case', action='append', help='case to run, all by default, can be repeated')
+    parser.add_option('--repeat', type='int', default=3, help='number of runs of every case')
+    parser.add_option('--baseline', help='json file with results to compare with')
+    parser.add_option('--threshold', type='float', default=DEFAULT_THRESHOLD,
+        help='allowed regression in percent')
+    parser.add_option('--save-baseline', dest='save_baseline', help='write the results to a json file')
+    parser.add_option('--child', help='internal, run a case in this process')
+    options, _args = parser.parse_args(args)
+
+    if options.child:
+        sys.stdout.write(json.dumps(run_case(options.child, options.repeat)))
+        return 0
+
+    names = options.case or [name for name, _func in CASES]
+    results = {}
+    sys.stdout.write('%-20s %10s %12s %14s %14s\n' % ('case', 'units', 'time [s]', 'units/s', 'peak mem [MB]'))
+    for name in names:
+        result = results[name] = measure(name, options.repeat)
+        sys.stdout.write('%-20s %10d %12.3f %14.0f %14.1f\n' % (name, result['units'],
+            result['seconds'], result['throughput'], result['peak_kb'] / 1024.0))
+
+    if options.save_baseline:
+        with open(options.save_baseline, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if options.baseline:
+        with open(options.baseline) as f:
+            regressions = compare(results, json.load(f), options.threshold)
+        if regressions:
+            sys.stdout.write('\nREGRESSIONS:\n')
+            for message in regressions:
+                sys.stdout.write('  %s\n' % message)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,121 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Measures cold start import time of a module, similarly to 'python -X importtime'.
+
+Each run imports the module in a fresh interpreter with an import hook that
+records self and cumulative time of every module imported for the first time.
+The best run is compared against a time budget.
+
+Usage:
+    python -m benchmarks.import_time [--module pertinax.cli] [--budget 150] [--runs 5] [--top 15]
+
+Exit code is non-zero when the budget is exceeded.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from optparse import OptionParser
+
+
+DEFAULT_MODULE = 'pertinax.cli'
+# cold start budget in milliseconds
+DEFAULT_BUDGET = 150.0
+
+# script run in the child interpreter, prints json {module -> [self_us, cumulative_us]}
+CHILD_SCRIPT = r"""
+import sys, time, json, __builtin__
+
+_orig_import = __builtin__.__import__
+_stack = []
+_times = {}
+
+def _timed_import(name, globals=None, locals=None, fromlist=None, level=-1):
+    new = name not in sys.modules
+    if new:
+        _stack.append(0.0)
+    start = time.time()
+    try:
+        return _orig_import(name, globals, locals, fromlist, level)
+    finally:
+        if new:
+            elapsed = time.time() - start
+            nested = _stack.pop()
+            if _stack:
+                _stack[-1] += elapsed
+            if name in sys.modules and name not in _times:
+                _times[name] = [int((elapsed - nested) * 1e6), int(elapsed * 1e6)]
+
+__builtin__.__import__ = _timed_import
+start = time.time()
+__import__(sys.argv[1])
+total = time.time() - start
+__builtin__.__import__ = _orig_import
+sys.stdout.write(json.dumps({'total': int(total * 1e6), 'modules': _times}))
+"""
+
+
+def measure(module, python=sys.executable):
+    """
+    Import the module in a fresh interpreter.
+
+    :type module: str
+    :param module: name of the module to import
+    :return: dict {'total': microseconds, 'modules': {name -> [self_us, cumulative_us]}}
+    """
+    proc = subprocess.Popen([python, '-c', CHILD_SCRIPT, module],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=os.environ.copy())
+    out, err = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError('Importing %s failed:\n%s' % (module, err))
+    return json.loads(out)
+
+
+def report(result, top, output=sys.stdout):
+    """
+    Print the slowest imports in a format similar to -X importtime
+    """
+    modules = sorted(result['modules'].items(), key=lambda item: item[1][0], reverse=True)
+    output.write('%10s | %10s | %s\n' % ('self [us]', 'cumul [us]', 'imported package'))
+    for name, (self_us, cumul_us) in modules[:top]:
+        output.write('%10d | %10d | %s\n' % (self_us, cumul_us, name))
+
+
+def main(args):
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--module', default=DEFAULT_MODULE, help='module to import')
+    parser.add_option('--budget', type='float', default=DEFAULT_BUDGET, help='budget in milliseconds')
+    parser.add_option('--runs', type='int', default=5, help='number of cold starts')
+    parser.add_option('--top', type='int', default=15, help='number of slowest imports to show')
+    options, _args = parser.parse_args(args)
+
+    results = [measure(options.module) for _i in range(options.runs)]
+    best = min(results, key=lambda result: result['total'])
+    report(best, options.top)
+
+    best_ms = best['total'] / 1000.0
+    sys.stdout.write('\n%s: best of %d cold starts %.1f ms, budget %.1f ms\n'
+        % (options.module, options.runs, best_ms, options.budget))
+    if best_ms > options.budget:
+        sys.stdout.write('BUDGET EXCEEDED\n')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,97 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Compares time and peak memory of u_obj and u_view on a large server payload.
+
+Every variant runs in a fresh interpreter so the peak memory (max rss) is
+not affected by the other variants. The payload is a list of package-like
+records, the printer accesses only a few of their fields.
+
+Usage:
+    python -m benchmarks.unicode_view [--size-mb 100] [--fields 3]
+"""
+
+import json
+import subprocess
+import sys
+from optparse import OptionParser
+
+VARIANTS = ('baseline', 'u_obj', 'u_view')
+
+CHILD_SCRIPT = r"""
+import json, resource, sys, time
+from pertinax.encoding import u_obj, u_view, u_str
+
+variant, size_mb, fields = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+
+record = {
+    'id': 'a1b2c3d4e5f6' * 2,
+    'name': 'package-name',
+    'version': '1.2.3',
+    'release': '4.el6',
+    'arch': 'x86_64',
+    'description': 'Long description of the package \xc5\xbelu\xc5\xa5ou\xc4\x8dk\xc3\xbd k\xc5\xaf\xc5\x88. ' * 4,
+    'files': ['/usr/share/doc/package/file-%d' % i for i in range(10)],
+}
+record_size = len(json.dumps(record))
+count = size_mb * 1024 * 1024 // record_size
+payload = [dict(record, id='%024d' % i) for i in xrange(count)]
+baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+start = time.time()
+if variant == 'u_obj':
+    data = u_obj(payload)
+elif variant == 'u_view':
+    data = u_view(payload)
+else:
+    data = payload
+keys = ['id', 'name', 'version', 'release', 'arch', 'description'][:fields]
+for item in data:
+    for key in keys:
+        u_str(item[key])
+elapsed = time.time() - start
+
+peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+sys.stdout.write(json.dumps({'items': count, 'seconds': elapsed,
+    'base_kb': baseline_rss, 'extra_kb': peak_rss - baseline_rss}))
+"""
+
+
+def measure(variant, size_mb, fields, python=sys.executable):
+    proc = subprocess.Popen([python, '-c', CHILD_SCRIPT, variant, str(size_mb), str(fields)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError('Benchmark %s failed:\n%s' % (variant, err))
+    return json.loads(out)
+
+
+def main(args):
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--size-mb', type='int', default=100, help='approximate size of the json payload')
+    parser.add_option('--fields', type='int', default=3, help='number of fields accessed per item')
+    options, _args = parser.parse_args(args)
+
+    sys.stdout.write('%-10s %10s %12s %16s\n' % ('variant', 'items', 'time [s]', 'extra mem [MB]'))
+    for variant in VARIANTS:
+        result = measure(variant, options.size_mb, options.fields)
+        sys.stdout.write('%-10s %10d %12.3f %16.1f\n' % (variant, result['items'],
+            result['seconds'], result['extra_kb'] / 1024.0))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,292 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import cPickle
+import sys
+import threading
+from collections import OrderedDict
+
+from pertinax.lazy import lazy_import
+from pertinax.timing import clock
+
+json = lazy_import('json', globals())
+
+# maximal number of results memoized by a RequestCoalescer
+MAX_RESULTS = 1000
+
+# attribute values that are returned as they are, without wrapping into a proxy
+PLAIN_TYPES = (basestring, int, long, float, bool, type(None), dict, list, tuple, set)
+
+
+class BindingsProxy(object):
+    """
+    Transparent wrapper of the api bindings. Calls of methods of the bindings
+    (or of any objects reachable through their attributes) go through _call,
+    which subclasses override to add behavior around the api calls.
+    """
+
+    def __init__(self, bindings, path=()):
+        """
+        :param bindings: wrapped bindings object
+        :type path: tuple of str
+        :param path: attribute path from the root bindings to this object
+        """
+        self._bindings = bindings
+        self._path = path
+
+    def __getattr__(self, name):
+        value = getattr(self._bindings, name)
+        path = self._path + (name,)
+        if isinstance(value, PLAIN_TYPES):
+            return value
+        elif callable(value):
+            return lambda *args, **kwargs: self._call(path, value, args, kwargs)
+        else:
+            return self._child(value, path)
+
+    def _child(self, bindings, path):
+        """
+        Returns proxy for a nested bindings object.
+        """
+        return self.__class__(bindings, path)
+
+    def _call(self, path, func, args, kwargs):
+        """
+        Called for every call of the bindings methods.
+
+        :type path: tuple of str
+        :param path: attribute path to the called method
+        :param func: the bound method
+        :param args: positional arguments of the call
+        :param kwargs: keyword arguments of the call
+        """
+        return func(*args, **kwargs)
+
+
+class ApiCallStats(object):
+    """
+    Statistics of api calls made during one command execution.
+    """
+
+    def __init__(self):
+        # list of (method name, seconds, response size, failed)
+        self.calls = []
+
+    def add(self, name, seconds, size, failed=False):
+        self.calls.append((name, seconds, size, failed))
+
+    def count(self):
+        return len(self.calls)
+
+    def latencies(self):
+        return [seconds for _name, seconds, _size, _failed in self.calls]
+
+    def sizes(self):
+        return [size for _name, _seconds, size, _failed in self.calls]
+
+
+def response_size(response):
+    """
+    Estimate size of a response: length of strings, number of
+    items of collections. None if the size can't be determined.
+    """
+    try:
+        return len(response)
+    except TypeError:
+        return None
+
+
+class RecordingBindings(BindingsProxy):
+    """
+    Bindings proxy that records latencies and response sizes of the api calls.
+    The total time is added to the 'api' phase of a timer.
+    """
+
+    def __init__(self, bindings, stats=None, timer=None, path=()):
+        """
+        :type stats: ApiCallStats
+        :param stats: statistics to record to, new instance by default
+        :type timer: pertinax.timing.PhaseTimer
+        :param timer: timer to add the 'api' phase to, optional
+        """
+        super(RecordingBindings, self).__init__(bindings, path)
+        self.stats = stats if stats is not None else ApiCallStats()
+        self.timer = timer
+
+    def _child(self, bindings, path):
+        return RecordingBindings(bindings, self.stats, self.timer, path)
+
+    def _call(self, path, func, args, kwargs):
+        start = clock()
+        failed = True
+        response = None
+        try:
+            response = super(RecordingBindings, self)._call(path, func, args, kwargs)
+            failed = False
+            return response
+        finally:
+            seconds = clock() - start
+            self.stats.add('.'.join(path), seconds, response_size(response), failed)
+            if self.timer is not None:
+                self.timer.add('api', seconds)
+
+
+class _PendingCall(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        # pickled result, None if the call failed or the result can't be pickled
+        self.data = None
+        self.exc_info = None
+
+
+class RequestCoalescer(object):
+    """
+    Memo of read-only api calls of one command execution. Identical calls
+    made while the first one is in flight wait for its result, later calls
+    get the memoized result. Failed calls are not memoized.
+
+    The caller that made the call gets the result as it is. The memo keeps
+    the result pickled and every other caller gets its own copy, so
+    formatting one of them doesn't change the others. Results that can't be
+    pickled are not memoized. At most max_results results are kept, the
+    least recently used are dropped first.
+    """
+
+    def __init__(self, max_results=MAX_RESULTS):
+        """
+        :type max_results: int
+        :param max_results: maximal number of memoized results
+        """
+        self.max_results = max_results
+        self.__lock = threading.Lock()
+        self.__results = OrderedDict()
+        self.__in_flight = {}
+        # number of calls answered without going to the server
+        self.saved = 0
+
+    def call(self, key, func):
+        """
+        :type key: hashable
+        :param key: identification of the call
+        :type func: callable
+        :param func: function without arguments that makes the call
+        """
+        with self.__lock:
+            data = self.__results.pop(key, None)
+            if data is not None:
+                self.__results[key] = data
+                self.saved += 1
+                return cPickle.loads(data)
+            pending = self.__in_flight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self.__in_flight[key] = _PendingCall()
+
+        if not owner:
+            pending.done.wait()
+            if pending.exc_info is not None:
+                raise pending.exc_info[0], pending.exc_info[1], pending.exc_info[2]
+            if pending.data is None:
+                # the result can't be shared, make the call again
+                return func()
+            with self.__lock:
+                self.saved += 1
+            return cPickle.loads(pending.data)
+
+        try:
+            value = func()
+        except:  # pylint: disable=W0702
+            pending.exc_info = sys.exc_info()
+            with self.__lock:
+                del self.__in_flight[key]
+            pending.done.set()
+            raise
+
+        try:
+            pending.data = cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+        except Exception:  # pylint: disable=W0703
+            pass
+        with self.__lock:
+            if pending.data is not None:
+                self.__results[key] = pending.data
+                while len(self.__results) > self.max_results:
+                    self.__results.popitem(last=False)
+            del self.__in_flight[key]
+        pending.done.set()
+        return value
+
+    def clear(self):
+        """
+        Forget the memoized results, e.g. after a call that changed data.
+        """
+        with self.__lock:
+            self.__results.clear()
+
+
+class CoalescingBindings(BindingsProxy):
+    """
+    Bindings proxy that routes read-only calls through a RequestCoalescer.
+    Only the methods listed in read_only are coalesced, any other call
+    clears the memo, so that data changed by the command are fetched again.
+    Task status calls are not read-only in this sense, they are polled
+    for changes.
+    """
+
+    def __init__(self, bindings, coalescer, path=(), read_only=()):
+        """
+        :type coalescer: RequestCoalescer
+        :type read_only: iterable of str
+        :param read_only: dotted attribute paths of the read-only methods,
+            e.g. 'repo.repository'
+        """
+        super(CoalescingBindings, self).__init__(bindings, path)
+        self.coalescer = coalescer
+        self.read_only = frozenset(read_only)
+
+    def _child(self, bindings, path):
+        return CoalescingBindings(bindings, self.coalescer, path, self.read_only)
+
+    def is_read_only(self, path):
+        """
+        Tells whether the method on the path only reads data.
+
+        :type path: tuple of str
+        """
+        return '.'.join(path) in self.read_only
+
+    def _call(self, path, func, args, kwargs):
+        call = lambda: super(CoalescingBindings, self)._call(path, func, args, kwargs)
+        if not self.is_read_only(path):
+            try:
+                return call()
+            finally:
+                self.coalescer.clear()
+        return self.coalescer.call(call_key(path, args, kwargs), call)
+
+
+def call_key(path, args, kwargs):
+    """
+    Returns a key identifying a call by its arguments. Equal dicts give
+    equal keys regardless of their order, objects that json can't
+    represent are identified by their repr.
+
+    :rtype: str
+    """
+    try:
+        return json.dumps([path, args, kwargs], sort_keys=True, default=repr)
+    except (ValueError, UnicodeDecodeError):
+        # circular structures or binary strings
+        return repr((path, args, sorted(kwargs.items())))
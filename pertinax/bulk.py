@@ -0,0 +1,193 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import json
+import os
+import sys
+from itertools import islice
+
+from pertinax.cli import PertinaxCommand
+from pertinax.encoding import u_str, encoded_stdout
+from pertinax.registry import CommandType
+from pertinax.ui.progress import ThroughputProgress
+from pertinax.ui.sink import output_sink
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def read_records(stream):
+    """
+    Iterate over records of a bulk input. Every non-empty line that doesn't
+    start with '#' is one record, either a json object or a plain identifier.
+    Lines that are not valid json objects are returned as InvalidRecord.
+
+    :param stream: file-like object with the input
+    """
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('{'):
+            try:
+                yield json.loads(line)
+            except ValueError, e:
+                yield InvalidRecord(_('invalid json record %(line)s: %(error)s') %
+                    {'line': line, 'error': u_str(e)})
+        else:
+            yield line.decode('utf-8')
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BulkCommandType(CommandType):
+    """
+    CommandType that checks when a bulk command is defined that it
+    implements the method its bulk_size calls for.
+    """
+
+    def __new__(mcs, class_name, bases, attrs):
+        abstract = attrs.get('abstract', False)
+        cls = super(BulkCommandType, mcs).__new__(mcs, class_name, bases, attrs)
+        if not abstract:
+            method = 'run_bulk' if cls.bulk_size else 'run_item'
+            if not callable(getattr(cls, method, None)):
+                raise TypeError('%s must implement %s' % (class_name, method))
+        return cls
+
+
+class PertinaxBulkCommand(PertinaxCommand):
+    """
+    Base class for commands that apply one action to many objects in one
+    process. Identifiers (one per line) or json records are read as a stream
+    from a file or the standard input, so the input size is not limited by
+    memory.
+
+    Subclasses set bulk_size and implement run_bulk(records) when the api has
+    a bulk call. It gets a list of at most bulk_size records and returns
+    a list of results in the order of the records. Otherwise they implement
+    run_item(record), which gets an identifier (unicode) or a json record
+    (dict) and returns a json serializable result. The calls run
+    concurrently and the result of every record is written to the report
+    as one json line: {"item": ..., "ok": true, "result": ...} or
+    {"item": ..., "ok": false, "error": "..."}.
+    Throughput is shown on stderr.
+    """
+    __metaclass__ = BulkCommandType
+    abstract = True
+
+    # maximal number of records in one bulk request, 0 if the api has no bulk call
+    bulk_size = 0
+    # maximal number of records read ahead of the report, e.g. while a slow call
+    # holds back the report of the following records
+    chunk_size = 500
+
+    def _setup_common_options(self):
+        super(PertinaxBulkCommand, self)._setup_common_options()
+        self.create_option('--file', _("file with one identifier or json record per line, standard input by default"))
+        self.create_option('--report', _("file to write the json lines report to, standard output by default"))
+        self.create_flag('--no_progress', _("don't print the progress to stderr"))
+
+    def run(self, options):
+        input_file = options.get('file')
+        report_file = options.get('report')
+
+        source = open(input_file) if input_file and input_file != '-' else sys.stdin
+        report = open(report_file, 'w') if report_file and report_file != '-' else encoded_stdout()
+        progress = None if options.get('no_progress') else ThroughputProgress()
+        try:
+            failed = self.process(read_records(source), report, progress)
+        finally:
+            if progress is not None:
+                progress.finish()
+            if source is not sys.stdin:
+                source.close()
+            if report_file and report_file != '-':
+                report.close()
+            else:
+                report.flush()
+
+        return os.EX_DATAERR if failed else os.EX_OK
+
+    def process(self, records, report, progress=None):
+        """
+        Process the records and write the report in the order of the input.
+        All the records go through one fan-out, so a slow call holds back
+        only the report, not the calls of the following records. Output
+        printed by the calls is written in the order of the records too,
+        and the report lines go through the same sink, so they don't tear
+        the printed lines when the report is the standard output.
+
+        :type records: iterable
+        :param report: stream for the json lines report
+        :type progress: pertinax.ui.progress.ThroughputProgress
+        :return: number of failed records
+        :rtype: int
+        """
+        if self.bulk_size:
+            window = max(1, self.chunk_size // self.bulk_size)
+            outcomes = self.fan_out_iter(self.__run_group, _chunks(records, self.bulk_size), window)
+            entries = (entry for group, results, exception in outcomes
+                for entry in self.__group_entries(group, results, exception))
+        else:
+            outcomes = self.fan_out_iter(self.__run_record, records, self.chunk_size)
+            entries = (self.__entry(record, result, exception) for record, result, exception in outcomes)
+
+        report = output_sink(report)
+        failed_total = 0
+        for entry in entries:
+            failed = not entry['ok']
+            report.write(json.dumps(entry, sort_keys=True) + '\n')
+            failed_total += failed
+            if progress is not None:
+                progress.update(1, failed)
+        return failed_total
+
+    def __run_record(self, record):
+        if isinstance(record, InvalidRecord):
+            raise record
+        return self.run_item(record)
+
+    def __run_group(self, group):
+        valid = [record for record in group if not isinstance(record, InvalidRecord)]
+        results = self.run_bulk(valid) if valid else []
+        if len(results or ()) != len(valid):
+            raise ValueError(_('bulk call returned %(got)d results for %(expected)d records') %
+                {'got': len(results or ()), 'expected': len(valid)})
+        return results
+
+    def __group_entries(self, group, results, exception):
+        results = iter(results or ())
+        for record in group:
+            if isinstance(record, InvalidRecord):
+                yield self.__entry(record, None, record)
+            else:
+                yield self.__entry(record, next(results) if exception is None else None, exception)
+
+    @classmethod
+    def __entry(cls, record, result, exception):
+        if isinstance(record, InvalidRecord):
+            return {'item': None, 'ok': False, 'error': u_str(record)}
+        if exception is not None:
+            return {'item': record, 'ok': False, 'error': u_str(exception) or exception.__class__.__name__}
+        return {'item': record, 'ok': True, 'result': result}
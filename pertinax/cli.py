@@ -14,19 +14,55 @@
 # in this software or its documentation.
 #
 
-import re
-
+import atexit
+import getpass
+import os
+import sys
+import time
+
+from pertinax.bindings import CoalescingBindings, RecordingBindings, RequestCoalescer
+from pertinax.config import Config
+from pertinax.encoding import encoded_stdout
 from pertinax.i18n_optparse import NoCatchErrorParser
+from pertinax.lazy import lazy_import
 from pertinax.option_validator import OptionValidator
+from pertinax.registry import CommandType, registry
+from pertinax.timing import PhaseTimer, clock
 from pertinax.ui.printer import Printer, GrepStrategy, VerboseStrategy
 
-from okaara.cli import Cli, Command, CommandUsage, OptionGroup
+from okaara.cli import Cli, Command, CommandUsage, OptionGroup, Section
+
+# modules used only by some commands or options, imported on the first use
+concurrency = lazy_import('pertinax.concurrency', globals())
+exceptions = lazy_import('pertinax.exceptions', globals())
+httpcache = lazy_import('pertinax.httpcache', globals())
+metrics = lazy_import('pertinax.metrics', globals())
+namecache = lazy_import('pertinax.namecache', globals())
+perflog = lazy_import('pertinax.perflog', globals())
+replay = lazy_import('pertinax.replay', globals())
+watch = lazy_import('pertinax.ui.watch', globals())
 
 
 # organization actions ---------------------------------------------------------
 
 
 class PertinaxCommand(Command):
+    """
+    Base class for the cli commands.
+    By default the name is snake_case version of the class name. It is computed
+    once when the class is defined, subclasses can set it explicitly as well
+    as a list of aliases.
+    """
+    __metaclass__ = CommandType
+
+    # column that identifies rows of the output in the watch mode
+    watch_key = 'id'
+
+    # dotted paths of the bindings methods the command calls that only read
+    # data, e.g. 'repo.repository'; repeated calls with the same arguments
+    # are made once, see pertinax.bindings.CoalescingBindings. More paths
+    # can be listed in the read_only option of the api section in client.conf
+    read_only_calls = ()
 
     def __init__(self, context):
         self.method = self.main
@@ -39,19 +75,70 @@ class PertinaxCommand(Command):
         self.option_groups = []
         self._setup_parser()
 
+        self.timer = PhaseTimer()
+        self._parse_start = None
+        self._show_timings = False
+
     def execute(self, prompt, args):
-        self._load_saved_options()
-        Command.execute(self, prompt, args)
+        self.timer = PhaseTimer()
+        # memoized calls don't reach the recording proxy, only real calls are recorded
+        self.context.coalescer = RequestCoalescer()
+        bindings = self.context.bindings
+        # replay is imported only in the record or replay mode
+        if os.environ.get('KATELLO_CLI_REPLAY') or os.environ.get('KATELLO_CLI_RECORD'):
+            bindings = replay.bindings_from_env(bindings)
+        self.recorder = RecordingBindings(bindings, timer=self.timer)
+        self.api = CoalescingBindings(self.recorder, self.context.coalescer, read_only=self._read_only_calls())
+        self.printer = None
+        self._show_timings = False
+        # None when an exception escapes the command
+        exit_code = None
+        try:
+            with self.timer.phase('load_saved_options'):
+                self._load_saved_options()
+            self._parse_start = clock()
+            result = Command.execute(self, prompt, args)
+            exit_code = os.EX_OK if result is None else result
+            return result
+        finally:
+            if self._show_timings:
+                self.timer.report()
+                sys.stderr.write("  %-20s %10d\n" % ('api calls saved', self.context.coalescer.saved))
+            self._record_execution(exit_code)
+
+    def _read_only_calls(self):
+        """
+        Returns the read-only bindings methods of the command and of the
+        configuration.
 
-    # pylint: disable=R0201
-    @property
-    def name(self):
+        :rtype: set of str
         """
-        Return a string with this command's name.
-        By default the name is camel_case version of the Class name
+        configured = self.context.config.get_str('api', 'read_only', '')
+        return set(self.read_only_calls) | set(configured.replace(',', ' ').split())
+
+    def _record_execution(self, exit_code):
         """
-        s = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', self.__class__.__name__)
-        return re.sub('([a-z0-9])([A-Z])', r'\1_\2', s).lower()
+        Write the execution statistics to the performance event log
+        and the metrics file if they are enabled.
+        """
+        config = self.context.config
+        perflog_enabled = config.get_bool('perflog', 'enabled')
+        metrics_enabled = config.get_bool('metrics', 'enabled')
+        # the modules are not imported at all while both are disabled
+        if not (perflog_enabled or metrics_enabled):
+            return
+        command_path = ' '.join(getattr(self.context, 'command_path', None) or [self.name])
+        if exit_code is None:
+            exit_code = exceptions.CODE_UNEXPECTED
+
+        if perflog_enabled:
+            rows = self.printer.rows_printed if self.printer else None
+            perflog.get_sink(config).write(
+                perflog.command_event(command_path, exit_code, self.timer, self.recorder.stats, rows))
+
+        if metrics_enabled:
+            metrics.get_metrics(config).record(command_path, exit_code, self.timer.elapsed(),
+                self.timer.get('render'), self.recorder.stats.count())
 
     @property
     def description(self):
@@ -71,16 +158,121 @@ class PertinaxCommand(Command):
         """
         Main action of the command
         """
-        try:
-            self.printer = self._create_printer(options)
-            self.validator = self._create_validator(options)
-            self._check_options(options)
-            self._process_option_errors()
+        if self._parse_start is not None:
+            self.timer.add('parse', clock() - self._parse_start)
+            self._parse_start = None
+        self._show_timings = options.get('timings')
 
-            return self.run(options)
+        try:
+            with self.timer.phase('setup'):
+                self.printer = self._create_printer(options)
+                self.validator = self._create_validator(options)
+            with self.timer.phase('validation'):
+                self._check_common_options(options)
+                self._check_options(options)
+                self._process_option_errors()
+
+            with self.timer.phase('run'):
+                if options.get('profile'):
+                    return self._run_profiled(options, options['profile'])
+                if options.get('watch'):
+                    return self._run_watched(options, float(options['watch']))
+                return self.run(options)
         except Exception, e:
             return self.context.exception_handler.handle_exception(e)
 
+    def _run_profiled(self, options, filename):
+        """
+        Run the command in cProfile and dump the stats to a file.
+        """
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(self.run, options)
+        finally:
+            profiler.dump_stats(filename)
+
+    def _run_watched(self, options, interval):
+        """
+        Run the command every 'interval' seconds until it's interrupted
+        with ctrl+c or fails. Only the lines that changed since the previous
+        run are redrawn, unchanged rows are not formatted again.
+        """
+        screen = watch.WatchScreen(encoded_stdout())
+        row_cache = watch.RowCache(self.watch_key)
+        command = ' '.join(self.context.command_path or [self.name])
+        try:
+            while True:
+                start = clock()
+                frame = watch.FrameBuffer()
+                frame.write(_('Every %(interval)ss: %(command)s') % {'interval': interval, 'command': command})
+                frame.write('    ' + time.strftime('%c') + '\n\n')
+                self.printer = self._create_printer(options, frame, row_cache)
+                exit_code = self.run(options)
+                screen.show(frame.lines())
+                if exit_code not in (None, os.EX_OK):
+                    return exit_code
+                time.sleep(max(0, interval - (clock() - start)))
+        except KeyboardInterrupt:
+            return os.EX_OK
+
+    def fan_out(self, func, items, timeout=None):
+        """
+        Call func for every item in parallel, e.g. to fetch details of
+        listed objects. Number of concurrent calls and the default timeout
+        are read from the 'concurrency' section of the config. With adaptive
+        concurrency enabled, the number of calls follows the controller
+        shared in the context. Output the calls print with the printer is
+        written in the order of the items.
+
+        :type func: callable
+        :param func: function(item) that makes the api call
+        :type items: iterable
+        :type timeout: float
+        :param timeout: seconds one call may take, overrides the config
+        :rtype: pertinax.concurrency.FanOutResult
+        """
+        ordered = self.printer.ordered_output() if self.printer is not None else None
+        try:
+            return concurrency.fan_out(func, items, *self.__fan_out_args(timeout), output=ordered)
+        finally:
+            if ordered is not None:
+                ordered.close()
+
+    def fan_out_iter(self, func, items, window=None, timeout=None):
+        """
+        Streaming version of fan_out, yields (item, result, exception)
+        in the order of the items while the calls are running.
+
+        :type func: callable
+        :param func: function(item) that makes the api call
+        :type items: iterable
+        :param items: items, read only when their calls can be started
+        :type window: int
+        :param window: maximal number of items started but not yielded yet
+        :type timeout: float
+        :param timeout: seconds one call may take, overrides the config
+        """
+        ordered = self.printer.ordered_output() if self.printer is not None else None
+        try:
+            for outcome in concurrency.fan_out_iter(func, items, *self.__fan_out_args(timeout),
+                    window=window, output=ordered):
+                yield outcome
+        finally:
+            if ordered is not None:
+                ordered.close()
+
+    def __fan_out_args(self, timeout):
+        """
+        Returns workers, timeout and controller of a fan-out.
+        """
+        config = self.context.config
+        if timeout is None:
+            timeout = config.get_int('concurrency', 'timeout')
+        workers = config.get_int('concurrency', 'workers', concurrency.DEFAULT_WORKERS)
+        return workers, timeout, self.context.get_concurrency_controller()
+
     def _create_parser(self):
         return NoCatchErrorParser()
 
@@ -92,29 +284,25 @@ class PertinaxCommand(Command):
     def _create_validator(self, options):
         return OptionValidator(self.parser, options)
 
-    def _create_printer(self, options):
-        return Printer(self._print_strategy(options), options.get('noheading'))
+    def _create_printer(self, options, output=None, row_cache=None):
+        return Printer(self._print_strategy(options, output, row_cache), options.get('noheading'),
+            timer=self.timer, output=output, row_cache=row_cache, pager=options.get('pager'))
 
     def _load_saved_options(self):
         config = self.context.config
 
         if not config.has_section('options'):
             return
-        for opt_name, opt_value in config.items('options'):
-            opt = self.parser.get_option_by_name(opt_name)
-            if not opt is None:
-                self.parser.set_default(opt.get_dest(), opt_value)
+        self.parser.set_saved_defaults(config.items('options'))
 
-    def _print_strategy(self, options):
+    def _print_strategy(self, options, output=None, row_cache=None):
         config = self.context.config
 
-        if (options.get('g') or (config.has_option('interface', 'force_grep_friendly') \
-            and config.get('interface', 'force_grep_friendly').lower() == 'true')):
-            return GrepStrategy(delimiter=options.get('d'))
+        if options.get('g') or config.get_bool('interface', 'force_grep_friendly'):
+            return GrepStrategy(delimiter=options.get('d'), output=output, row_cache=row_cache)
 
-        elif (options.get('v') or (config.has_option('interface', 'force_verbose') \
-            and config.get('interface', 'force_verbose').lower() == 'true')):
-            return VerboseStrategy()
+        elif options.get('v') or config.get_bool('interface', 'force_verbose'):
+            return VerboseStrategy(output=output)
 
         else:
             return None
@@ -130,11 +318,27 @@ class PertinaxCommand(Command):
         formatting.create_flag('-v', _("verbose, more structured output"))
         formatting.create_flag('--noheading', _("Suppress any heading output. Useful if grepping the output."))
         formatting.create_option('--d', _("column delimiter in grep friendly output, works only with option -g"), required=False)
+        formatting.create_flag('--pager', _("browse long lists in an interactive pager"))
         self.add_option_group(formatting)
 
+        diagnostics = OptionGroup("Diagnostics:")
+        diagnostics.create_flag('--timings', _("print time spent in phases of the command to stderr"))
+        diagnostics.create_option('--profile', _("profile the command and dump cProfile stats to a file"), required=False)
+        diagnostics.create_option('--watch', _("run the command every SECONDS and redraw the changed lines"), required=False)
+        self.add_option_group(diagnostics)
+
     def _setup_options(self):
         pass
 
+    def _check_common_options(self, options):
+        if options.get('watch') is not None:
+            try:
+                interval = float(options['watch'])
+            except ValueError:
+                interval = 0
+            if interval <= 0:
+                self.validator.add_option_error(_('Option --watch requires a positive number of seconds'))
+
     def _check_options(self, options):
         pass
 
@@ -155,12 +359,46 @@ class PertinaxCli(Cli):
 
     def run(self, args):
         try:
+            args = self._resolve_aliases(args)
+            self.context.command_path = self._command_path(args)
             exit_code = Cli.run(self, args)
             return exit_code
         except Exception, e:
             exit_code = self.context.exception_handler.handle_exception(e)
             return exit_code
 
+    def _resolve_aliases(self, args):
+        """
+        Replace command aliases on the command path with the command names.
+        """
+        args = list(args)
+        section = self.root_section
+        for i, arg in enumerate(args):
+            node = registry.find(section, arg)
+            if node is None:
+                break
+            args[i] = node.name
+            if not isinstance(node, Section):
+                break
+            section = node
+        return args
+
+    def _command_path(self, args):
+        """
+        Returns names of the sections and the command the arguments lead to.
+        """
+        path = []
+        section = self.root_section
+        for arg in args:
+            node = section.commands.get(arg, section.subsections.get(arg))
+            if node is None:
+                break
+            path.append(arg)
+            if not isinstance(node, Section):
+                break
+            section = node
+        return path
+
 
 class ClientContext:
 
@@ -169,7 +407,7 @@ class ClientContext:
         This stuff is created in pulp.client.launcher
 
         :type server: pulp.bindings.bindings.Bindings
-        :type config: pulp.common.config.Config
+        :type config: pertinax.config.CompiledConfig
         :type logger: logging.Logger
         :type prompt: pulp.client.extensions.core.PulpPrompt
         :type exception_handler: pulp.client.extensions.exceptions.ExceptionHandler
@@ -181,3 +419,60 @@ class ClientContext:
         self.exception_handler = exception_handler
         self.bindings = bindings
         self.cli = cli
+        # names of sections and command of the current execution
+        self.command_path = None
+        self.__concurrency_controller = None
+        self.__name_cache = None
+        self.__http_cache = None
+        # coalescer of the api calls of the current execution
+        self.coalescer = None
+
+    def get_name_cache(self):
+        """
+        Returns the cache of ids resolved from names. It's persisted per
+        server and user if enabled in the 'name_cache' section of the config,
+        otherwise it lives only in memory. Changes are saved at exit.
+
+        :rtype: pertinax.namecache.NameCache
+        """
+        if self.__name_cache is None:
+            path = None
+            if self.config.get_bool('name_cache', 'enabled'):
+                server = '%s:%s%s' % (self.config.get_str('server', 'host', ''),
+                    self.config.get_str('server', 'port', ''), self.config.get_str('server', 'path', ''))
+                user = self.config.get_str('options', 'username') or getpass.getuser()
+                path = namecache.cachefile(Config.USER_DIR, server, user)
+            self.__name_cache = namecache.NameCache(path, self.config.get_int('name_cache', 'ttl', namecache.DEFAULT_TTL),
+                self.exception_handler.is_not_found)
+            atexit.register(self.__name_cache.save)
+        return self.__name_cache
+
+    def get_http_cache(self):
+        """
+        Returns the disk cache of GET responses, None if it's not enabled
+        in the 'http_cache' section of the config. Hit and miss counts are
+        logged at exit.
+
+        :rtype: pertinax.httpcache.ResponseCache
+        """
+        if self.__http_cache is None and self.config.get_bool('http_cache', 'enabled'):
+            self.__http_cache = httpcache.ResponseCache(os.path.join(Config.USER_DIR, httpcache.CACHE_DIR),
+                self.config.get_int('http_cache', 'max_size', 100) * 0x100000,
+                self.config.get_int('http_cache', 'max_entry_size', 10) * 0x100000)
+            atexit.register(self.__http_cache.log_stats)
+        return self.__http_cache
+
+    def get_concurrency_controller(self):
+        """
+        Returns the concurrency controller shared by all parallel api calls,
+        None if adaptive concurrency is disabled in the config.
+
+        :rtype: pertinax.concurrency.AimdController
+        """
+        if self.__concurrency_controller is None and self.config.get_bool('concurrency', 'adaptive'):
+            self.__concurrency_controller = concurrency.AimdController(
+                minimum=self.config.get_int('concurrency', 'min_workers', 1),
+                maximum=self.config.get_int('concurrency', 'workers', concurrency.DEFAULT_WORKERS),
+                target_latency=self.config.get_int('concurrency', 'target_latency'),
+                classify=self.exception_handler.is_overload)
+        return self.__concurrency_controller
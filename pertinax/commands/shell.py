@@ -16,23 +16,24 @@
 
 import os
 
-from katello.client.core.base import BaseAction
-
-import pertinax.shell
 from pertinax.cli import PertinaxCommand
+from pertinax.i18n import lazy_gettext
 
 # shell action ------------------------------------------------------------
 
 class Shell(PertinaxCommand):
 
     name = "shell"
-    description = _('run the cli as a shell')
+    description = lazy_gettext('run the cli as a shell')
 
     def __init__(self, context):
         super(Shell, self).__init__(context)
         self.cli = context.cli
 
     def run(self, options):
+        # readline and the rest of the shell machinery is needed only here
+        import pertinax.shell
+
         self.cli.remove_command(self.name)
         shell = pertinax.shell.Shell(self.cli, prompt="foreman> ")
         shell.cmdloop()
@@ -17,6 +17,7 @@ import sys
 
 
 from okaara.cli import Section
+from pertinax.registry import registry
 
 def parse_tokens(tokenstring):
     """
@@ -77,8 +78,7 @@ class Completion():
         cmd = self.root_section
         for name in names:
             if isinstance(cmd, Section):
-                if name in (cmd.subsections.keys() + cmd.commands.keys()):
-                    cmd = cmd.commands.get(name, cmd.subsections.get(name, None))
+                cmd = registry.find(cmd, name) or cmd
         return cmd
 
 
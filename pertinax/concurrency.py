@@ -0,0 +1,390 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Parallel execution of per-item api calls. The limits are set in client.conf:
+
+    [concurrency]
+    # maximal number of calls in flight
+    workers = 8
+    # seconds after which a call is reported as failed, no limit by default
+    timeout = 120
+    # adapt the number of calls in flight to the server load, between
+    # min_workers and workers
+    adaptive = true
+    min_workers = 1
+    # calls slower than this (in seconds) count as a sign of overload
+    target_latency = 5
+"""
+
+import sys
+import threading
+from collections import deque
+from Queue import Queue, Empty
+
+from pertinax.encoding import u_str
+from pertinax.logutil import LazyLogger
+from pertinax.timing import clock
+
+DEFAULT_WORKERS = 8
+# number of latest latencies kept by the controller
+LATENCY_HISTORY = 1000
+
+_log = LazyLogger(__name__)
+
+# interval in which the waiting thread wakes up, keeps it responsive to ctrl+c
+POLL_INTERVAL = 0.5
+
+
+class CallTimeout(Exception):
+    """
+    Raised in place of a result when a call didn't finish in time.
+    """
+    pass
+
+
+class FanOutResult(object):
+    """
+    Results of a fan-out in the order of the items. Failed calls leave
+    None in the results and add a message to the errors, the same way
+    OptionValidator collects opt_errors.
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.results = [None] * len(items)
+        self.errors = []
+        # list of (item, exception) of the failed calls
+        self.failures = []
+        self.__failed = {}
+
+    def ok(self):
+        return not self.failures
+
+    def add_failure(self, index, exception):
+        self.__failed[index] = exception
+
+    def exception(self, index):
+        """
+        Returns the exception of a failed call or None if the call succeeded.
+        """
+        return self.__failed.get(index)
+
+    def finish(self):
+        """
+        Sort the failures in the order of the items.
+        """
+        for index in sorted(self.__failed):
+            item, exception = self.items[index], self.__failed[index]
+            self.failures.append((item, exception))
+            self.errors.append(_('%(item)s: %(error)s') %
+                {'item': u_str(item), 'error': u_str(exception) or exception.__class__.__name__})
+
+
+class AimdController(object):
+    """
+    Limit of concurrent api calls controlled by additive increase and
+    multiplicative decrease, as in TCP congestion control. Every successful
+    call raises the limit by 1/limit, i.e. by one per a round of calls.
+    A call that signals overload (see classify) or is slower than
+    target_latency cuts the limit by the backoff factor, at most once
+    per a call duration so that one burst of errors doesn't collapse it.
+
+    One controller is shared by all parallel work of a command.
+    """
+
+    def __init__(self, initial=None, minimum=1, maximum=DEFAULT_WORKERS, backoff=0.5,
+                 target_latency=None, classify=None):
+        """
+        :type initial: int
+        :param initial: starting limit, half of maximum by default
+        :type minimum: int
+        :type maximum: int
+        :type backoff: float
+        :param backoff: factor the limit is multiplied by on overload
+        :type target_latency: float
+        :param target_latency: seconds, slower calls count as overload, None to ignore latency
+        :type classify: callable
+        :param classify: function(exception) returning True if the exception
+            means the server is overloaded, e.g. ExceptionHandler.is_overload
+        """
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.backoff = backoff
+        self.target_latency = target_latency
+        self.classify = classify or (lambda e: isinstance(e, CallTimeout))
+        if initial is None:
+            initial = self.maximum / 2.0
+        self.__limit = float(min(max(initial, self.minimum), self.maximum))
+        self.__last_decrease = None
+        self.__lock = threading.Lock()
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+
+    def limit(self):
+        """
+        Returns the current maximal number of calls in flight.
+        """
+        return int(self.__limit)
+
+    def record(self, seconds, exception=None):
+        """
+        Update the limit with an outcome of a call.
+
+        :type seconds: float
+        :param seconds: duration of the call
+        :param exception: exception raised by the call, None if it succeeded
+        """
+        overload = exception is not None and self.classify(exception)
+        slow = self.target_latency is not None and seconds > self.target_latency
+
+        with self.__lock:
+            self.latencies.append(seconds)
+            old_limit = self.limit()
+            now = clock()
+            if overload or slow:
+                if self.__last_decrease is None or now - self.__last_decrease >= seconds:
+                    self.__limit = max(self.minimum, self.__limit * self.backoff)
+                    self.__last_decrease = now
+            elif exception is None:
+                self.__limit = min(self.maximum, self.__limit + 1.0 / self.__limit)
+
+            if self.limit() != old_limit:
+                _log.debug('concurrency limit %d -> %d after a call of %.3f s%s', old_limit, self.limit(),
+                    seconds, ' (%s)' % exception.__class__.__name__ if exception is not None else '')
+
+    def summary(self):
+        """
+        Returns one line description of the limit and the latencies.
+        """
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return 'concurrency limit %d, no calls' % self.limit()
+        return 'concurrency limit %d, %d calls, latency min %.3f s, median %.3f s, max %.3f s' % (
+            self.limit(), len(latencies), latencies[0], latencies[len(latencies) // 2], latencies[-1])
+
+
+def fan_out(func, items, workers=DEFAULT_WORKERS, timeout=None, controller=None, output=None):
+    """
+    Call func for every item, at most 'workers' calls at a time.
+    A failing call doesn't stop the others, the failures are collected
+    in the returned FanOutResult. See fan_out_iter for the details.
+
+    :type func: callable
+    :param func: function(item) that makes the api call
+    :type items: iterable
+    :type workers: int
+    :param workers: maximal number of concurrent calls
+    :type timeout: float
+    :param timeout: seconds one call may take, None for no limit
+    :type controller: AimdController
+    :param controller: adaptive limit of the concurrent calls, replaces workers
+    :type output: pertinax.ui.sink.OrderedOutput
+    :param output: output the calls print to, written in the order of the items
+    :rtype: FanOutResult
+    """
+    items = list(items)
+    result = FanOutResult(items)
+    outcomes = fan_out_iter(func, items, workers, timeout, controller, output=output)
+    for index, (_item, value, exception) in enumerate(outcomes):
+        if exception is not None:
+            result.add_failure(index, exception)
+        else:
+            result.results[index] = value
+    result.finish()
+    return result
+
+
+def fan_out_iter(func, items, workers=DEFAULT_WORKERS, timeout=None, controller=None, window=None, output=None):
+    """
+    Call func for every item, at most 'workers' calls at a time, and yield
+    (item, result, exception) in the order of the items as soon as the
+    outcomes of all the previous items are known. Items are read from the
+    iterable only when they can be started, so it can be a stream.
+
+    The calls run in a fixed pool of worker threads. With a controller,
+    the number of calls in flight follows its limit and the controller
+    gets the outcome of every call.
+
+    A call that exceeds the timeout is reported as failed with CallTimeout.
+    Threads can't be interrupted, so it keeps running and its result is
+    thrown away. Until it returns it still holds its worker and counts
+    against the limit, so a stuck server doesn't get more calls. When all
+    the workers hold timed out calls for another timeout, the items that
+    haven't been started fail with CallTimeout too.
+
+    :type func: callable
+    :param func: function(item) that makes the api call
+    :type items: iterable
+    :type workers: int
+    :param workers: maximal number of concurrent calls
+    :type timeout: float
+    :param timeout: seconds one call may take, None for no limit
+    :type controller: AimdController
+    :param controller: adaptive limit of the concurrent calls, replaces workers
+    :type window: int
+    :param window: maximal number of items started but not yielded yet, i.e. how
+        far the calls may run ahead of a slow item, None for no limit
+    :type output: pertinax.ui.sink.OrderedOutput
+    :param output: output the calls print to, every call runs in its task,
+        so the text is written in the order of the items
+    """
+    workers = max(1, workers)
+    size = controller.maximum if controller is not None else workers
+    if isinstance(items, (list, tuple)):
+        size = max(1, min(size, len(items)))
+    items = iter(items)
+    pool = _WorkerPool(func, size, output)
+    # index -> item of the calls that haven't been yielded yet
+    started = {}
+    # index -> (result, exception) of the finished calls that haven't been yielded yet
+    outcomes = {}
+    # index -> start of the calls whose thread hasn't returned yet
+    running = {}
+    # indexes of the running calls that have timed out
+    expired = set()
+    # since when all the workers hold timed out calls
+    stalled = None
+    # exception of the items that can't be started because the workers are stuck
+    stuck = None
+    next_index = next_yield = 0
+    exhausted = False
+
+    try:
+        while True:
+            while next_yield in outcomes:
+                value, exception = outcomes.pop(next_yield)
+                yield started.pop(next_yield), value, exception
+                next_yield += 1
+
+            limit = controller.limit() if controller is not None else workers
+            limit = min(limit, pool.size)
+            while not exhausted and (stuck is not None or len(running) < limit) \
+                    and (window is None or next_index - next_yield < window):
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                started[next_index] = item
+                if stuck is not None:
+                    outcomes[next_index] = (None, stuck)
+                else:
+                    running[next_index] = clock()
+                    pool.submit(next_index, item)
+                next_index += 1
+
+            if next_yield in outcomes:
+                continue
+            if exhausted and next_yield == next_index:
+                break
+
+            now = clock()
+            if not exhausted and stuck is None and running and len(expired) == len(running):
+                stalled = stalled if stalled is not None else now
+                if timeout and stalled + timeout <= now:
+                    stuck = CallTimeout(_('no free worker in %s seconds') % timeout)
+                    continue
+            else:
+                stalled = None
+
+            wait = POLL_INTERVAL
+            if timeout:
+                starts = [start for index, start in running.items() if index not in expired]
+                if stalled is not None and stuck is None:
+                    starts.append(stalled)
+                if starts:
+                    wait = max(0, min(wait, min(starts) + timeout - now))
+
+            try:
+                index, value, exception = pool.done.get(timeout=wait)
+            except Empty:
+                now = clock()
+                for index, start in running.items():
+                    if timeout and index not in expired and start + timeout <= now:
+                        expired.add(index)
+                        exception = CallTimeout(_('no response in %s seconds') % timeout)
+                        outcomes[index] = (None, exception)
+                        if controller is not None:
+                            controller.record(now - start, exception)
+                continue
+
+            start = running.pop(index)
+            if index in expired:
+                # late result of a call that has timed out, its worker is free again
+                expired.discard(index)
+                continue
+            if controller is not None:
+                controller.record(clock() - start, exception)
+            outcomes[index] = (value, exception)
+
+        if controller is not None:
+            _log.debug(controller.summary())
+    finally:
+        # workers still running timed out calls exit when the calls return,
+        # the idle ones are waited for so that they don't outlive the process
+        pool.close(wait=not running)
+
+
+class _WorkerPool(object):
+    """
+    Fixed number of daemon threads calling func for the submitted items.
+    Outcomes are put to the done queue as (index, value, exception).
+    """
+
+    def __init__(self, func, size, output=None):
+        self.func = func
+        self.size = size
+        self.output = output
+        self.done = Queue()
+        self.__tasks = Queue()
+        self.__threads = []
+        for number in range(size):
+            thread = threading.Thread(target=self.__work, name='fan-out-%d' % number)
+            thread.daemon = True
+            thread.start()
+            self.__threads.append(thread)
+
+    def submit(self, index, item):
+        self.__tasks.put((index, item))
+
+    def close(self, wait=False):
+        """
+        Let the workers exit after their current call.
+
+        :type wait: bool
+        :param wait: wait until the workers exit, only when none of them is busy
+        """
+        for thread in self.__threads:
+            self.__tasks.put(None)
+        if wait:
+            for thread in self.__threads:
+                thread.join()
+
+    def __work(self):
+        while True:
+            task = self.__tasks.get()
+            if task is None:
+                return
+            index, item = task
+            try:
+                self.done.put((index, self.__call(index, item), None))
+            except Exception:  # pylint: disable=W0703
+                self.done.put((index, None, sys.exc_info()[1]))
+
+    def __call(self, index, item):
+        if self.output is None:
+            return self.func(item)
+        with self.output.task(index):
+            return self.func(item)
@@ -15,12 +15,195 @@
 
 
 import os
+import marshal
+import tempfile
 import ConfigParser
-from pwd import getpwuid
 
 class ConfigFileError(Exception):
     pass
 
+
+def atomic_write(path, data, mode=0644):
+    """
+    Replace the content of a file atomically. The data is written to a
+    unique temporary file in the same directory, which is then renamed
+    over the file, so readers never see a partially written file and
+    concurrent writers don't overwrite each other's temporary files.
+
+    :type path: str
+    :type data: str or list of str
+    :param data: new content of the file
+    :type mode: int
+    :param mode: permissions of the file
+    :raises IOError, OSError: when the file can't be written,
+        the temporary file is removed
+    """
+    if isinstance(data, basestring):
+        data = [data]
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.writelines(data)
+        os.chmod(tmp_path, mode)
+        os.rename(tmp_path, path)
+    except:  # pylint: disable=W0702
+        os.remove(tmp_path)
+        raise
+
+
+def files_key(paths):
+    """
+    Identifies the state of files by their paths, sizes and mtimes.
+    Files that don't exist are left out.
+
+    :type paths: list of str
+    :rtype: list
+    """
+    key = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        key.append((path, stat.st_size, stat.st_mtime))
+    return key
+
+
+def load_cached(path, version, key):
+    """
+    Returns data stored by save_cached if it was stored with the same
+    version and key, otherwise None.
+
+    :type path: str
+    :param path: path to the cache file
+    :type version: int
+    :param version: version of the format of the data
+    :param key: marshallable identification of the source of the data,
+        usually files_key of the source files
+    """
+    try:
+        with open(path, 'rb') as f:
+            cached = marshal.loads(f.read())
+        if cached['version'] == version and cached['key'] == key:
+            return cached['data']
+    except (IOError, EOFError, ValueError, TypeError, KeyError):
+        pass
+    return None
+
+
+def save_cached(path, version, key, data):
+    """
+    Store marshallable data in a compiled cache file, see load_cached.
+    The file is replaced atomically, failures are ignored.
+    """
+    try:
+        Config.ensure_dir(path)
+        atomic_write(path, marshal.dumps({'version': version, 'key': key, 'data': data}))
+    except (IOError, OSError, ValueError):
+        pass
+
+
+class lazy_path(object):
+    """
+    Class attribute that is computed on the first access and then replaced
+    with the computed value.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner):
+        value = self.func(owner)
+        setattr(owner, self.func.__name__, value)
+        return value
+
+
+class CompiledConfig(ConfigParser.RawConfigParser):
+    """
+    RawConfigParser with typed accessors. Each key is converted only once,
+    the converted values are kept until the configuration is modified.
+    """
+
+    BOOLEAN_STATES = {'1': True, 'yes': True, 'true': True, 'on': True,
+                      '0': False, 'no': False, 'false': False, 'off': False}
+
+    def __init__(self, *args, **kwargs):
+        ConfigParser.RawConfigParser.__init__(self, *args, **kwargs)
+        self._resolved = {}
+
+    def get_str(self, section, option, default=None):
+        """
+        Returns a string value of the option or default if it's not set.
+        """
+        return self.__resolve(section, option, default, 'str', lambda value: value)
+
+    def get_bool(self, section, option, default=False):
+        """
+        Returns a boolean value of the option or default if it's not set.
+        Unknown values are treated as False.
+        """
+        return self.__resolve(section, option, default, 'bool',
+            lambda value: self.BOOLEAN_STATES.get(value.strip().lower(), False))
+
+    def get_int(self, section, option, default=None):
+        """
+        Returns an integer value of the option or default if it's not set.
+
+        :raises ValueError: when the value is not an integer
+        """
+        return self.__resolve(section, option, default, 'int', int)
+
+    def __resolve(self, section, option, default, value_type, convert):
+        """
+        :type value_type: str
+        :param value_type: name of the type the value is converted to,
+            values of different types are cached separately
+        """
+        key = (section, option, value_type, default)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        if self.has_option(section, option):
+            value = convert(self.get(section, option))
+        else:
+            value = default
+        self._resolved[key] = value
+        return value
+
+    def read(self, filenames):
+        self._resolved.clear()
+        return ConfigParser.RawConfigParser.read(self, filenames)
+
+    def set(self, section, option, value=None):
+        self._resolved.clear()
+        ConfigParser.RawConfigParser.set(self, section, option, value)
+
+    def remove_option(self, section, option):
+        self._resolved.clear()
+        return ConfigParser.RawConfigParser.remove_option(self, section, option)
+
+    def remove_section(self, section):
+        self._resolved.clear()
+        return ConfigParser.RawConfigParser.remove_section(self, section)
+
+    def dump(self):
+        """
+        Returns the merged configuration as a dict {section -> {option -> value}}
+        """
+        return dict((section, dict(self.items(section))) for section in self.sections())
+
+    def load(self, sections):
+        """
+        Fill the configuration from a dict created by dump()
+        """
+        for section, options in sections.iteritems():
+            if not self.has_section(section):
+                self.add_section(section)
+            for option, value in options.iteritems():
+                self.set(section, option, value)
+
 class Config(object):
     """
     The katello client configuration.
@@ -42,6 +225,10 @@ class Config(object):
     Config throws an Exception if 'Config.save()' is called before initializing
     the Config object.
 
+    The merged content of the config files is stored in a compiled snapshot
+    file in the user's directory. The snapshot is used instead of parsing the
+    files as long as none of them was changed (paths, sizes and mtimes match).
+
     @cvar PATH: The absolute path to the config directory.
     @type PATH: str
     @cvar USER: The path to an alternate configuration file
@@ -51,32 +238,60 @@ class Config(object):
 
     FILE = 'client.conf'
 
-    if os.environ.has_key('KATELLO_CLIENT_CONF_DIR'):
-        PATH = os.environ['KATELLO_CLIENT_CONF_DIR'] 
-    else:
-        PATH = os.path.join('/etc/katello', FILE)
+    # the paths are resolved on first access, not when the module is imported
 
-    USER_DIR = os.path.join(getpwuid(os.getuid())[5], '.katello')
-    USER = os.path.expanduser(os.path.join(USER_DIR, FILE))
-    USER_OPTIONS = os.path.expanduser(os.path.join(USER_DIR, 'client-options.conf'))
+    @lazy_path
+    def PATH(cls):
+        if os.environ.has_key('KATELLO_CLIENT_CONF_DIR'):
+            return os.environ['KATELLO_CLIENT_CONF_DIR']
+        else:
+            return os.path.join('/etc/katello', cls.FILE)
+
+    @lazy_path
+    def USER_DIR(cls):
+        from pwd import getpwuid
+        return os.path.join(getpwuid(os.getuid())[5], '.katello')
+
+    @lazy_path
+    def USER(cls):
+        return os.path.expanduser(os.path.join(cls.USER_DIR, cls.FILE))
+
+    @lazy_path
+    def USER_OPTIONS(cls):
+        return os.path.expanduser(os.path.join(cls.USER_DIR, 'client-options.conf'))
+
+    # compiled snapshot of the merged configuration files
+    @lazy_path
+    def SNAPSHOT(cls):
+        return os.path.expanduser(os.path.join(cls.USER_DIR, 'client.conf.cache'))
+
+    SNAPSHOT_VERSION = 2
 
     parser = None
 
     def __init__(self):
         """
-        Initializes a RawConfigParser and reads the configuration file into the object
+        Initializes a CompiledConfig and reads the configuration file into the object
         """
         if Config.parser:
             return
 
-        Config.parser = ConfigParser.RawConfigParser()
+        parser = CompiledConfig()
 
         # read global config, user config, user options if it exists
-        read_config_files = Config.parser.read([Config.PATH, Config.USER, Config.USER_OPTIONS])
-
-        if not read_config_files:
+        config_files = [Config.PATH, Config.USER, Config.USER_OPTIONS]
+        key = files_key(config_files)
+        if not key:
             raise ConfigFileError('No config file was found')
 
+        sections = load_cached(Config.SNAPSHOT, Config.SNAPSHOT_VERSION, key)
+        if sections is None:
+            parser.read(config_files)
+            save_cached(Config.SNAPSHOT, Config.SNAPSHOT_VERSION, key, parser.dump())
+        else:
+            parser.load(sections)
+        Config.parser = parser
+
         if Config.parser.has_section("DEFAULT"):
             raise ConfigFileError('Default section in configuration is not supported')
 
@@ -13,23 +13,185 @@
 # granted to use or replicate Red Hat trademarks that are incorporated
 # in this software or its documentation.
 
+import atexit
 import collections
-import codecs
 import sys
+import threading
+import weakref
+from contextlib import contextmanager
 from optparse import OptParseError
 
 stdout_origin = sys.stdout
 
-def encode_stream(stream, encoding='utf-8'):
+# encoded outputs flushed at exit, by a single atexit hook
+_outputs = weakref.WeakSet()
+_outputs_lock = threading.Lock()
+_flush_registered = False
+
+
+def _flush_outputs():
+    for output in list(_outputs):
+        output.flush()
+
+
+def _register_output(output):
+    global _flush_registered
+    with _outputs_lock:
+        _outputs.add(output)
+        if not _flush_registered:
+            atexit.register(_flush_outputs)
+            _flush_registered = True
+
+
+class EncodedOutput(object):
+    """
+    Output stream that encodes unicode text before writing it to a byte stream.
+
+    The text is collected in an internal buffer and encoded in chunks, not on
+    every small write. The buffer is written out when it exceeds buffer_size,
+    on flush() and at exit. Streams connected to a terminal are flushed after
+    every write, except inside batch() blocks, so that prompts and errors
+    appear immediately while bulk output is still encoded at once. Outputs
+    for error messages (stderr) should be created with autoflush=True.
+    The output can be shared by multiple threads.
+
+    The object never replaces the underlying stream, which stays usable
+    (e.g. by readline) as the raw attribute.
+    """
+
+    def __init__(self, stream, encoding='utf-8', buffer_size=8192, autoflush=None):
+        """
+        :type stream: file
+        :param stream: byte stream to write to
+        :type encoding: str
+        :param encoding: encoding of the unicode text
+        :type buffer_size: int
+        :param buffer_size: number of buffered characters that triggers writing
+        :type autoflush: bool
+        :param autoflush: flush after every write outside batch(), by default
+            only if the stream is a terminal
+        """
+        self.raw = stream
+        self.encoding = encoding
+        self.buffer_size = buffer_size
+        if autoflush is None:
+            autoflush = hasattr(stream, 'isatty') and stream.isatty()
+        self.autoflush = autoflush
+        self.softspace = 0
+        self.__text = []
+        self.__bytes = []
+        self.__size = 0
+        self.__batch_depth = 0
+        self.__lock = threading.RLock()
+        _register_output(self)
+
+    def __del__(self):
+        # text still in the buffer of an output that is garbage collected
+        try:
+            if self.__text or self.__bytes:
+                self.flush()
+        except:  # pylint: disable=W0702
+            pass
+
+    def write(self, text):
+        with self.__lock:
+            if isinstance(text, unicode):
+                self.__text.append(text)
+            else:
+                # already encoded, keep the order with the pending text
+                text = str(text)
+                self.__encode_text()
+                self.__bytes.append(text)
+            self.__size += len(text)
+
+            if self.__size >= self.buffer_size or (self.autoflush and not self.__batch_depth):
+                self.flush()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def __encode_text(self):
+        if self.__text:
+            self.__bytes.append(u''.join(self.__text).encode(self.encoding))
+            self.__text = []
+
+    def flush(self):
+        with self.__lock:
+            self.__encode_text()
+            if self.__bytes:
+                data = ''.join(self.__bytes)
+                self.__bytes = []
+                self.__size = 0
+                self.raw.write(data)
+            self.raw.flush()
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager that suspends autoflush, the output written inside
+        is encoded and written in bulk at the end of the block.
+        """
+        with self.__lock:
+            self.__batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self.__lock:
+                self.__batch_depth -= 1
+                if not self.__batch_depth:
+                    self.flush()
+
+    def fileno(self):
+        return self.raw.fileno()
+
+    def isatty(self):
+        return self.raw.isatty()
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+def encode_stream(stream, encoding='utf-8', autoflush=None):
     """
     Wrap a file stream with writer that uses the specified encoding.
+
+    :type autoflush: bool
+    :param autoflush: see EncodedOutput, True for unbuffered output
     """
     if isinstance(stream, file):
-        return codecs.getwriter(encoding)(stream)
+        return EncodedOutput(stream, encoding, autoflush=autoflush)
     else:
         return stream
 
 
+def raw_stream(stream):
+    """
+    Returns the byte stream under an encoding wrapper (EncodedOutput
+    or codecs.StreamWriter) or the stream itself if it's not wrapped.
+    """
+    if isinstance(stream, EncodedOutput):
+        return stream.raw
+    return getattr(stream, 'stream', stream)
+
+
+_encoded_stdout = None
+
+def encoded_stdout():
+    """
+    Returns the encoded output shared by all writers to the standard output.
+    If sys.stdout isn't wrapped (e.g. in the interactive shell where readline
+    needs the real file), a single EncodedOutput over it is created and reused.
+    """
+    global _encoded_stdout
+    if isinstance(sys.stdout, EncodedOutput):
+        return sys.stdout
+    stdout = raw_stream(sys.stdout)
+    if _encoded_stdout is None or _encoded_stdout.raw is not stdout:
+        _encoded_stdout = EncodedOutput(stdout)
+    return _encoded_stdout
+
+
 def fix_io_encoding():
     """
     Force utf-8 if no encoding is set for output streams.
@@ -37,13 +199,33 @@ def fix_io_encoding():
     We use utf-8 as all our server-side data are utf-8 encoded.
     """
     sys.stdout = encode_stream(sys.stdout)
-    sys.stderr = encode_stream(sys.stderr)
+    # errors must not wait in a buffer, even if stderr is redirected
+    sys.stderr = encode_stream(sys.stderr, autoflush=True)
+
+
+class LazyText(object):
+    """
+    Base of strings whose value is computed on the first use, such as
+    pertinax.i18n.LazyString. Subclasses implement resolve() that returns
+    unicode. They aren't basestring, so the casting functions below resolve
+    them and treat them as strings.
+    """
+
+    __slots__ = ()
+
+
+# types the casting functions treat as strings
+STRING_TYPES = (basestring, LazyText)
 
 
 def u_str(value):
     """
     Casts value to unicode string.
     """
+    if isinstance(value, unicode):
+        return value
+    if isinstance(value, LazyText):
+        return value.resolve()
     if isinstance(value, OptParseError):
         value = value.__str__()
     if not isinstance(value, basestring):
@@ -57,7 +239,7 @@ def u_obj(data):
     """
     Casts all strings in object 'data' to unicode.
     """
-    if isinstance(data, basestring):
+    if isinstance(data, STRING_TYPES):
         return u_str(data)
 
     elif isinstance(data, collections.Mapping):
@@ -68,3 +250,103 @@ def u_obj(data):
 
     else:
         return data
+
+
+def u_view(data):
+    """
+    Returns a read-only view of object 'data' that casts strings to unicode
+    lazily, when they are accessed. Unlike u_obj it doesn't copy the whole
+    structure, only the accessed values are converted (and cached).
+    """
+    if isinstance(data, STRING_TYPES):
+        return u_str(data)
+
+    elif isinstance(data, (UnicodeMappingView, UnicodeSequenceView)):
+        return data
+
+    elif isinstance(data, collections.Mapping):
+        return UnicodeMappingView(data)
+
+    elif isinstance(data, (list, tuple)):
+        return UnicodeSequenceView(data)
+
+    else:
+        return data
+
+
+class UnicodeMappingView(collections.Mapping):
+    """
+    Lazy unicode view of a mapping, see u_view.
+    """
+
+    __slots__ = ('_data', '_cache', '_keys')
+
+    def __init__(self, data):
+        self._data = data
+        self._cache = {}
+        # unicode keys yielded by the iteration -> str keys of the data
+        self._keys = None
+
+    def __getitem__(self, key):
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = u_view(self._data[self.__data_key(key)])
+            self._cache[key] = value
+            return value
+
+    def __contains__(self, key):
+        return self.__data_key(key) in self._data
+
+    def __data_key(self, key):
+        if not isinstance(key, unicode) or key in self._data:
+            return key
+        if self._keys is None:
+            self._keys = dict((u_str(k), k) for k in self._data if isinstance(k, str))
+        return self._keys.get(key, key)
+
+    def __iter__(self):
+        for key in self._data:
+            yield u_str(key) if isinstance(key, str) else key
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return 'UnicodeMappingView(%r)' % (self._data,)
+
+
+class UnicodeSequenceView(collections.Sequence):
+    """
+    Lazy unicode view of a list or a tuple, see u_view.
+    """
+
+    __slots__ = ('_data', '_cache')
+
+    def __init__(self, data):
+        self._data = data
+        self._cache = {}
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return UnicodeSequenceView(self._data[index])
+        if index < 0:
+            index += len(self._data)
+        if not 0 <= index < len(self._data):
+            raise IndexError('sequence index out of range')
+        try:
+            return self._cache[index]
+        except KeyError:
+            value = u_view(self._data[index])
+            self._cache[index] = value
+            return value
+
+    def __iter__(self):
+        for i in xrange(len(self._data)):
+            yield self[i]
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return 'UnicodeSequenceView(%r)' % (self._data,)
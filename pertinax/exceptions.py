@@ -27,9 +27,7 @@ react to it in the extension itself.
 
 import os
 from gettext import gettext as _
-from pertinax.logutil import getLogger
-
-from katello.client.server import ServerRequestError
+from pertinax.logutil import LazyLogger
 
 # -- constants ----------------------------------------------------------------
 
@@ -46,7 +44,7 @@ CODE_WRONG_HOST = os.EX_DATAERR
 CODE_UNKNOWN_HOST = os.EX_CONFIG
 CODE_SOCKET_ERROR = os.EX_CONFIG
 
-_log = getLogger(__name__)
+_log = LazyLogger(__name__)
 
 # -- classes ------------------------------------------------------------------
 
@@ -78,6 +76,8 @@ class ExceptionHandler:
         @return:
         """
 
+        from katello.client.server import ServerRequestError
+
         # Determine which method to call based on exception type
         mappings = (
             (ServerRequestError,      self.handle_server_error),
@@ -141,6 +141,40 @@ class ExceptionHandler:
             msg = _("Unknown error: ") + str(e)
 
         self.prompt.write(msg)
+        return self._server_error_status(e)
+
+    def is_overload(self, e):
+        """
+        Classifies an exception of an api call for adaptive concurrency.
+        Server errors with status 5xx or 429 (too many requests) and
+        timeouts mean the server is overloaded.
+
+        @return: True if the server is overloaded, otherwise False
+        """
+        from socket import timeout
+        from katello.client.server import ServerRequestError
+        from pertinax.concurrency import CallTimeout
+
+        if isinstance(e, (timeout, CallTimeout)):
+            return True
+        if isinstance(e, ServerRequestError):
+            status = self._server_error_status(e)
+            return status == 429 or 500 <= status < 600
+        return False
+
+    def is_not_found(self, e):
+        """
+        Tells whether an exception of an api call means that the requested
+        object doesn't exist (status 404).
+        """
+        from katello.client.server import ServerRequestError
+
+        return isinstance(e, ServerRequestError) and self._server_error_status(e) == 404
+
+    def _server_error_status(self, e):
+        """
+        Returns the http status of a server error.
+        """
         return e[0]
 
     def _log_server_exception(self, e):
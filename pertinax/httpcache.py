@@ -0,0 +1,364 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Disk cache of api responses revalidated with conditional requests.
+
+Responses of GET requests that carry an ETag or Last-Modified header are
+stored in the user's directory. The next request for the same url sends
+If-None-Match/If-Modified-Since and a 304 response is answered from the
+cache, so unchanged resources are not downloaded again. Enabled in
+client.conf:
+
+    [http_cache]
+    enabled = true
+    # maximal size of the cache in megabytes, least recently used
+    # responses are removed first
+    max_size = 100
+    # responses larger than this (in megabytes) are not cached
+    max_entry_size = 10
+
+The cache works on the level of httplib connections:
+
+    connection = CachingConnection(httplib.HTTPSConnection(host, port), context.get_http_cache())
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from pertinax.config import atomic_write
+from pertinax.logutil import LazyLogger
+
+CACHE_DIR = 'http'
+CACHE_VERSION = 1
+DEFAULT_MAX_SIZE = 100 * 0x100000
+DEFAULT_MAX_ENTRY_SIZE = 10 * 0x100000
+# share of max_size the eviction shrinks the cache to, leaves room for
+# the next responses before the directory is scanned again
+EVICT_TO = 0.8
+SUFFIX = '.response'
+
+# request headers that make responses differ
+KEY_HEADERS = ('accept', 'accept-language', 'authorization', 'cookie')
+
+_log = LazyLogger(__name__)
+
+
+class CacheEntry(object):
+
+    def __init__(self, status, reason, headers, body):
+        """
+        :type headers: list of (name, value)
+        :param headers: response headers with lower case names
+        """
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def header(self, name, default=None):
+        for header, value in self.headers:
+            if header == name:
+                return value
+        return default
+
+    def conditional_headers(self):
+        """
+        Returns request headers that revalidate the entry.
+        """
+        headers = {}
+        if self.header('etag'):
+            headers['If-None-Match'] = self.header('etag')
+        if self.header('last-modified'):
+            headers['If-Modified-Since'] = self.header('last-modified')
+        return headers
+
+
+class ResponseCache(object):
+    """
+    Directory of cached responses, one file per url. Size of the directory
+    is kept under max_size by removing the least recently used files, the
+    access time is tracked in the mtime of the files. The directory is
+    scanned only when the size counted from the stored files exceeds
+    max_size, or on the first store.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE, max_entry_size=DEFAULT_MAX_ENTRY_SIZE):
+        """
+        :type directory: str
+        :type max_size: int
+        :param max_size: maximal total size of the cached responses in bytes
+        :type max_entry_size: int
+        :param max_entry_size: maximal size of a cached response body in bytes
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.max_entry_size = min(max_entry_size, max_size)
+        self.hits = 0
+        self.misses = 0
+        # estimated size of the directory, None until it's scanned
+        self.__size = None
+        # the cache is shared by the fan-out worker threads
+        self.__lock = threading.RLock()
+
+    @staticmethod
+    def key(host, port, url, headers):
+        """
+        Returns key of a request. Requests of different users or for
+        different content types are cached separately.
+        """
+        headers = dict((name.lower(), value) for name, value in (headers or {}).items())
+        parts = [str(host), str(port), url] + [headers.get(name, '') for name in KEY_HEADERS]
+        return hashlib.sha1('\0'.join(parts)).hexdigest()
+
+    def __path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def lookup(self, key):
+        """
+        Returns the cached entry or None.
+
+        :rtype: CacheEntry
+        """
+        path = self.__path(key)
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+            if meta['version'] != CACHE_VERSION:
+                return None
+            # json turns the header strings to unicode
+            headers = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in meta['headers']]
+            return CacheEntry(meta['status'], meta['reason'].encode('latin-1'), headers, body)
+        except (IOError, ValueError, KeyError):
+            return None
+
+    def store(self, key, entry):
+        """
+        Write an entry to the cache, the file is replaced atomically.
+        Failures are logged and otherwise ignored.
+
+        :type entry: CacheEntry
+        """
+        meta = json.dumps({'version': CACHE_VERSION, 'status': entry.status, 'reason': entry.reason,
+            'headers': entry.headers}) + '\n'
+        try:
+            if not os.path.isdir(self.directory):
+                try:
+                    os.makedirs(self.directory, 0700)
+                except OSError:
+                    # created by another thread meanwhile
+                    if not os.path.isdir(self.directory):
+                        raise
+            atomic_write(self.__path(key), [meta, entry.body], 0600)
+        except (IOError, OSError):
+            _log.warning('Could not write to the http cache %s', self.directory, exc_info=True)
+            return
+        with self.__lock:
+            if self.__size is not None:
+                # a replaced entry is counted twice until the next scan
+                self.__size += len(meta) + len(entry.body)
+            if self.__size is None or self.__size > self.max_size:
+                self.evict()
+
+    def count_hit(self):
+        with self.__lock:
+            self.hits += 1
+
+    def count_miss(self):
+        with self.__lock:
+            self.misses += 1
+
+    def touch(self, key):
+        """
+        Mark an entry as recently used.
+        """
+        try:
+            os.utime(self.__path(key), None)
+        except OSError:
+            pass
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache takes at most
+        EVICT_TO of max_size.
+        """
+        with self.__lock:
+            self.__evict()
+
+    def __evict(self):
+        self.__size = None
+        try:
+            files = []
+            for name in os.listdir(self.directory):
+                if name.endswith(SUFFIX):
+                    stat = os.stat(os.path.join(self.directory, name))
+                    files.append((stat.st_mtime, stat.st_size, name))
+        except OSError:
+            return
+
+        total = sum(size for _mtime, size, _name in files)
+        if total <= self.max_size:
+            self.__size = total
+            return
+        for _mtime, size, name in sorted(files):
+            if total <= self.max_size * EVICT_TO:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                total -= size
+            except OSError:
+                pass
+        self.__size = total
+
+    def log_stats(self):
+        if self.hits or self.misses:
+            _log.info('http cache: %d hits, %d misses', self.hits, self.misses)
+
+
+class CachedResponse(object):
+    """
+    Minimal httplib.HTTPResponse replacement serving a cached entry.
+    """
+
+    def __init__(self, entry):
+        self.status = entry.status
+        self.reason = entry.reason
+        self.__entry = entry
+        self.__position = 0
+
+    def read(self, amt=None):
+        body = self.__entry.body
+        end = len(body) if amt is None else self.__position + amt
+        data = body[self.__position:end]
+        self.__position += len(data)
+        return data
+
+    def getheader(self, name, default=None):
+        return self.__entry.header(name.lower(), default)
+
+    def getheaders(self):
+        return list(self.__entry.headers)
+
+    def close(self):
+        pass
+
+
+class PrefixedResponse(object):
+    """
+    httplib.HTTPResponse wrapper whose body starts with data already read
+    from the response.
+    """
+
+    def __init__(self, prefix, response):
+        self.response = response
+        self.__prefix = prefix
+
+    def read(self, amt=None):
+        prefix = self.__prefix
+        if amt is None:
+            self.__prefix = ''
+            return prefix + self.response.read()
+        if len(prefix) >= amt:
+            self.__prefix = prefix[amt:]
+            return prefix[:amt]
+        self.__prefix = ''
+        return prefix + self.response.read(amt - len(prefix))
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+def _read_limited(response, limit):
+    """
+    Read at most limit + 1 bytes of the body, just enough to tell whether
+    it's longer than limit.
+    """
+    parts = []
+    size = 0
+    while size <= limit:
+        data = response.read(limit + 1 - size)
+        if not data:
+            break
+        parts.append(data)
+        size += len(data)
+    return ''.join(parts)
+
+
+class CachingConnection(object):
+    """
+    Wrapper of an httplib connection that answers GET requests from
+    the ResponseCache whenever the server confirms the cached version
+    is still valid. Other requests pass through unchanged.
+    """
+
+    def __init__(self, connection, cache):
+        """
+        :type connection: httplib.HTTPConnection
+        :type cache: ResponseCache
+        """
+        self.connection = connection
+        self.cache = cache
+        self.__pending = None
+
+    def request(self, method, url, body=None, headers=None):
+        headers = dict(headers or {})
+        self.__pending = None
+        if method == 'GET' and body is None:
+            key = self.cache.key(self.connection.host, self.connection.port, url, headers)
+            entry = self.cache.lookup(key)
+            if entry is not None:
+                headers.update(entry.conditional_headers())
+            self.__pending = (key, url, entry)
+        return self.connection.request(method, url, body, headers)
+
+    def getresponse(self):
+        response = self.connection.getresponse()
+        if self.__pending is None:
+            return response
+        key, url, entry = self.__pending
+        self.__pending = None
+
+        if response.status == 304 and entry is not None:
+            response.read()
+            self.cache.touch(key)
+            self.cache.count_hit()
+            _log.debug('http cache hit: %s', url)
+            return CachedResponse(entry)
+
+        self.cache.count_miss()
+        _log.debug('http cache miss: %s', url)
+        headers = [(name.lower(), value) for name, value in response.getheaders()]
+        entry = CacheEntry(response.status, response.reason, headers, None)
+        if response.status != 200 or not entry.conditional_headers() or \
+                'no-store' in entry.header('cache-control', ''):
+            return response
+
+        limit = self.cache.max_entry_size
+        length = response.getheader('content-length')
+        if length is not None and length.isdigit() and int(length) > limit:
+            return response
+        body = _read_limited(response, limit)
+        if len(body) > limit:
+            # too large to cache, the rest of the body is read from the connection
+            return PrefixedResponse(body, response)
+        entry.body = body
+        self.cache.store(key, entry)
+        return CachedResponse(entry)
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
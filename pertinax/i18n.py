@@ -12,11 +12,17 @@
 # in this software or its documentation.
 #
 
+import os
 import sys
-import gettext
-import locale
+import __builtin__
 
-from katello.client.lib.utils.encoding import encode_stream
+from pertinax.config import Config, files_key, load_cached, save_cached
+from pertinax.encoding import LazyText, encode_stream
+from pertinax.lazy import lazy_import
+
+gettext = lazy_import('gettext', globals())
+locale = lazy_import('locale', globals())
+struct = lazy_import('struct', globals())
 
 # Localization domain:
 APP = 'katello-cli'
@@ -24,6 +30,262 @@ APP = 'katello-cli'
 DIR = '/usr/share/locale/'
 # Encoding of the locales:
 ENCODING = 'utf-8'
+# Version of the format of compiled catalogs
+CATALOG_CACHE_VERSION = 3
+# magic numbers of little and big endian .mo files
+MO_MAGIC = {0x950412de: '<', 0xde120495: '>'}
+
+# changes every time the translations are (re)installed, lazy strings
+# resolved in an older generation are translated again
+_generation = 0
+
+
+class LazyString(LazyText):
+    """
+    String that is translated when it's used for the first time, not when it's
+    defined. The translation is memoized until the translations are reinstalled
+    (e.g. for a different locale). Functions of pertinax.encoding (u_str, u_obj)
+    treat it as a string.
+    """
+
+    __slots__ = ('msgid', '_value', '_generation')
+
+    def __init__(self, msgid):
+        self.msgid = msgid
+        self._value = None
+        self._generation = -1
+
+    def resolve(self):
+        """
+        :return: translated message
+        :rtype: unicode
+        """
+        if self._generation != _generation:
+            translate = getattr(__builtin__, '_', None)
+            value = translate(self.msgid) if translate else self.msgid
+            if not isinstance(value, unicode):
+                value = unicode(value, ENCODING)
+            self._value = value
+            self._generation = _generation
+        return self._value
+
+    def __unicode__(self):
+        return self.resolve()
+
+    def __str__(self):
+        return self.resolve().encode(ENCODING)
+
+    def __repr__(self):
+        return 'LazyString(%r)' % self.msgid
+
+    def __len__(self):
+        return len(self.resolve())
+
+    def __getitem__(self, key):
+        return self.resolve()[key]
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __contains__(self, item):
+        return item in self.resolve()
+
+    def __add__(self, other):
+        return self.resolve() + other
+
+    def __radd__(self, other):
+        return other + self.resolve()
+
+    def __mod__(self, other):
+        return self.resolve() % other
+
+    def __eq__(self, other):
+        return self.resolve() == other
+
+    def __ne__(self, other):
+        return self.resolve() != other
+
+    def __lt__(self, other):
+        return self.resolve() < other
+
+    def __hash__(self):
+        return hash(self.resolve())
+
+    def __getattr__(self, name):
+        # delegate string methods (format, split, ljust, ...) to the translation
+        return getattr(self.resolve(), name)
+
+
+def lazy_gettext(msgid):
+    """
+    Mark a message for translation and return a LazyString for it.
+    Use it for strings defined at import time.
+    """
+    return LazyString(msgid)
+
+
+def _catalog_cache_path(mofile):
+    name = mofile.strip(os.sep).replace(os.sep, '_') + '.cache'
+    return os.path.join(Config.USER_DIR, 'i18n', name)
+
+
+def parse_mo(data):
+    """
+    Parse the content of a GNU .mo file.
+
+    :type data: str
+    :return: (catalog, info); the catalog maps msgids to unicode translations,
+        plural forms are stored under (msgid, index) keys; info holds
+        the lowercased header fields
+    :raises IOError: if the data is not a .mo file
+    """
+    order = MO_MAGIC.get(struct.unpack('<I', data[:4])[0]) if len(data) >= 20 else None
+    if order is None:
+        raise IOError(0, 'Bad magic number')
+    _version, count, ids_offset, strs_offset = struct.unpack(order + '4I', data[4:20])
+
+    messages = []
+    for i in xrange(count):
+        id_length, id_offset = struct.unpack(order + '2I', data[ids_offset + 8 * i:ids_offset + 8 * i + 8])
+        str_length, str_offset = struct.unpack(order + '2I', data[strs_offset + 8 * i:strs_offset + 8 * i + 8])
+        messages.append((data[id_offset:id_offset + id_length], data[str_offset:str_offset + str_length]))
+
+    info = {}
+    for msgid, msgstr in messages:
+        if msgid == '':
+            for line in msgstr.split('\n'):
+                name, _sep, value = line.partition(':')
+                if value:
+                    info[name.strip().lower()] = value.strip()
+    charset = 'ascii'
+    if 'charset=' in info.get('content-type', ''):
+        charset = info['content-type'].split('charset=')[1].strip()
+
+    catalog = {}
+    for msgid, msgstr in messages:
+        if '\x00' in msgid:
+            msgid = unicode(msgid.split('\x00')[0], charset)
+            for i, form in enumerate(msgstr.split('\x00')):
+                catalog[(msgid, i)] = unicode(form, charset)
+        else:
+            catalog[unicode(msgid, charset)] = unicode(msgstr, charset)
+    return catalog, info
+
+
+def _plural_expression(info):
+    plural = info.get('plural-forms', '')
+    if 'plural=' not in plural:
+        return None
+    return plural.split('plural=')[1].rstrip(';').strip()
+
+
+class CatalogTranslations(object):
+    """
+    Translations from a catalog created by parse_mo(), with the interface
+    of gettext.NullTranslations.
+    """
+
+    def __init__(self, catalog, info, plural=None):
+        """
+        :type catalog: dict
+        :type info: dict
+        :type plural: str
+        :param plural: C expression selecting the plural form, None for
+            the english rules
+        """
+        self.catalog = catalog
+        self.__info = info
+        self.__output_charset = None
+        if plural:
+            self.plural = gettext.c2py(plural)
+        else:
+            self.plural = lambda n: int(n != 1)
+
+    def info(self):
+        return self.__info
+
+    def charset(self):
+        return ENCODING
+
+    def output_charset(self):
+        return self.__output_charset
+
+    def set_output_charset(self, charset):
+        self.__output_charset = charset
+
+    def ugettext(self, message):
+        translated = self.catalog.get(message)
+        if translated is None:
+            return unicode(message)
+        return translated
+
+    def ungettext(self, msgid1, msgid2, n):
+        translated = self.catalog.get((msgid1, self.plural(n)))
+        if translated is None:
+            return unicode(msgid1 if n == 1 else msgid2)
+        return translated
+
+    def gettext(self, message):
+        return self.__encode(self.ugettext(message))
+
+    def ngettext(self, msgid1, msgid2, n):
+        return self.__encode(self.ungettext(msgid1, msgid2, n))
+
+    lgettext = gettext
+    lngettext = ngettext
+
+    def __encode(self, text):
+        return text.encode(self.__output_charset or ENCODING)
+
+    def install(self, unicode=False, names=()):
+        """
+        Install ugettext() (or gettext()) as _() and optionally other
+        functions by their names globally.
+        """
+        __builtin__._ = self.ugettext if unicode else self.gettext
+        for name in names or ():
+            if name in ('gettext', 'ngettext', 'lgettext', 'lngettext'):
+                setattr(__builtin__, name, getattr(self, name))
+
+
+def load_translations(mofile, codeset=ENCODING):
+    """
+    Load GNU translations from a .mo file. The parsed catalog is stored in
+    a compiled cache in the user's directory and used instead of parsing the
+    .mo file as long as the file doesn't change.
+
+    :type mofile: str
+    :param mofile: path to the .mo file
+    :rtype: CatalogTranslations
+    """
+    key = files_key([mofile])
+    cache_path = _catalog_cache_path(mofile)
+    cached = load_cached(cache_path, CATALOG_CACHE_VERSION, key)
+    if cached is None:
+        with open(mofile, 'rb') as f:
+            catalog, info = parse_mo(f.read())
+        cached = {'catalog': catalog, 'info': info}
+        save_cached(cache_path, CATALOG_CACHE_VERSION, key, cached)
+
+    translations = CatalogTranslations(cached['catalog'], cached['info'],
+        _plural_expression(cached['info']))
+    translations.set_output_charset(codeset)
+    return translations
+
+
+def install_translations(domain=APP, localedir=DIR, codeset=ENCODING):
+    """
+    Find translations for the current locale and install ugettext() as _() globally.
+    """
+    global _generation
+
+    mofile = gettext.find(domain, localedir)
+    if mofile:
+        translations = load_translations(mofile, codeset)
+    else:
+        translations = gettext.NullTranslations()
+    translations.install(True)
+    _generation += 1
 
 
 def force_encoding(encoding):
@@ -36,7 +298,7 @@ def force_encoding(encoding):
     else:
         locale.setlocale(locale.LC_ALL, 'C')
     sys.stdout = encode_stream(sys.stdout, encoding)
-    sys.stderr = encode_stream(sys.stderr, encoding)
+    sys.stderr = encode_stream(sys.stderr, encoding, autoflush=True)
 
 
 def configure_i18n():
@@ -52,4 +314,4 @@ def configure_i18n():
         force_encoding(ENCODING)
 
     # this will set _() to ugettext() globaly
-    gettext.install(APP, DIR, True, ENCODING)
+    install_translations(APP, DIR, ENCODING)
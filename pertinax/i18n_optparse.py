@@ -25,10 +25,11 @@ http://bugs.python.org/issue4319
 """
 
 import sys
+from copy import deepcopy
 
 from okaara.cli import CommandUsage
 from optparse import OptionParser as _OptionParser
-from optparse import BadOptionError, OptionValueError
+from optparse import BadOptionError, OptionValueError, Values
 
 class OptionParserExitError(Exception):
     """
@@ -69,17 +70,80 @@ class OptionParser(_OptionParser):
         _("show program's version number and exit")
 
 
+    def __init__(self, *args, **kwargs):
+        # index of options by their destination {dest -> option}
+        self.__dest_index = {}
+        self.__saved_defaults = None
+        _OptionParser.__init__(self, *args, **kwargs)
+        self._defaults_changed()
+
+    def add_option(self, *args, **kwargs):
+        option = _OptionParser.add_option(self, *args, **kwargs)
+        if option.dest is not None:
+            self.__dest_index.setdefault(option.dest, option)
+        self._defaults_changed()
+        return option
+
+    def remove_option(self, opt_str):
+        option = self._long_opt.get(opt_str) or self._short_opt.get(opt_str)
+        _OptionParser.remove_option(self, opt_str)
+        if option is not None and self.__dest_index.get(option.dest) is option:
+            del self.__dest_index[option.dest]
+            # another option can store to the same destination
+            for opt in self.option_list:
+                if opt.dest == option.dest:
+                    self.__dest_index[opt.dest] = opt
+                    break
+        self._defaults_changed()
+
+    def set_default(self, dest, value):
+        _OptionParser.set_default(self, dest, value)
+        self._defaults_changed()
+
+    def set_defaults(self, **kwargs):
+        _OptionParser.set_defaults(self, **kwargs)
+        self._defaults_changed()
+
+    def _defaults_changed(self):
+        """
+        Hook called whenever the options or their default values change.
+        """
+        pass
+
     def get_option_by_dest(self, dest):
-        for opt in self.option_list:
-            if opt.dest == dest:
-                return opt
-        return None
+        return self.__dest_index.get(dest)
 
     def get_option_by_name(self, name):
-        for opt in ['--'+name, '-'+name]:
-            if self.has_option(opt):
-                return self.get_option(opt)
-        return None
+        return self._long_opt.get('--'+name) or self._short_opt.get('-'+name)
+
+    def set_saved_defaults(self, saved_options):
+        """
+        Set default values from saved options. The values are coerced
+        to the option types once and the work is skipped completely when
+        the saved options haven't changed since the last call.
+
+        :type saved_options: list of tuples
+        :param saved_options: list of (option name, value) pairs, e.g. items
+            of the 'options' config section
+        """
+        saved_options = tuple(saved_options)
+        if saved_options == self.__saved_defaults:
+            return
+
+        defaults = {}
+        for opt_name, opt_value in saved_options:
+            opt = self.get_option_by_name(opt_name)
+            if opt is None:
+                continue
+            if self.process_default_values and isinstance(opt_value, basestring):
+                try:
+                    opt_value = opt.check_value(opt.get_opt_string(), opt_value)
+                except OptionValueError:
+                    # leave the raw value, the error is reported on parsing
+                    pass
+            defaults[opt.dest] = opt_value
+        self.set_defaults(**defaults)
+        self.__saved_defaults = saved_options
 
     def get_options(self):
         return self._long_opt.keys() + self._short_opt.keys()
@@ -96,7 +160,16 @@ class NoCatchErrorParser(OptionParser):
     OptionParser's default behavior for handling errors is to print the output
     and exit. I'd rather go through the rest of the CLI's output methods, so
     change this behavior to throw my exception instead.
+
+    Results of parsing are cached by the exact list of arguments, so that
+    repeated executions of the same command line (e.g. in the shell) skip
+    the optparse machinery. The cache is dropped whenever options or their
+    defaults change.
     """
+
+    # maximum number of cached parse results
+    PARSE_CACHE_SIZE = 64
+
     def exit(self, status=0, msg=None):
         raise CommandUsage(other_messages=msg)
 
@@ -117,7 +190,13 @@ class NoCatchErrorParser(OptionParser):
         error() do with it as it wishes.
         """
         rargs = self._get_args(args)
+
+        cache_key = None
         if values is None:
+            if self._parse_cache is not None:
+                cache_key = tuple(rargs)
+                if cache_key in self._parse_cache:
+                    return self.__thaw_result(self._parse_cache[cache_key])
             values = self.get_default_values()
 
         self.rargs = rargs
@@ -131,4 +210,30 @@ class NoCatchErrorParser(OptionParser):
             raise CommandUsage(unexpected_options=[e.opt_str])
 
         args = largs + rargs
-        return self.check_values(values, args)
+        result = self.check_values(values, args)
+
+        # only successful parses are cached, errors are raised every time
+        if cache_key is not None:
+            if len(self._parse_cache) >= self.PARSE_CACHE_SIZE:
+                self._parse_cache.clear()
+            self._parse_cache[cache_key] = self.__freeze_result(result)
+        return result
+
+    def _defaults_changed(self):
+        # results of parsers with callback options are not cached as the
+        # callbacks can have side effects or depend on external state
+        options = self._long_opt.values() + self._short_opt.values()
+        if any(opt.action == 'callback' for opt in options):
+            self._parse_cache = None
+        else:
+            self._parse_cache = {}
+
+    @classmethod
+    def __freeze_result(cls, result):
+        values, args = result
+        return (deepcopy(values.__dict__), tuple(args))
+
+    def __thaw_result(self, frozen):
+        values_dict, args = frozen
+        self.values = Values(deepcopy(values_dict))
+        return (self.values, list(args))
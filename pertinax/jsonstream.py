@@ -0,0 +1,198 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Incremental decoding of json arrays.
+
+Large list responses can be decoded element by element while they are still
+being downloaded and handed to the printer as an iterator:
+
+    response = connection.getresponse()
+    printer.print_items(iter_json_array(response, wrap=u_view))
+"""
+
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+_NON_WHITESPACE = re.compile(r'[^ \t\n\r]')
+
+# characters that change the nesting outside strings
+_STRUCTURE = re.compile(r'["\[\]{}]')
+# characters that end or escape inside a string
+_STRING_END = re.compile(r'["\\]')
+# characters that end numbers, true, false and null
+_SCALAR_END = re.compile(r'[,\]}\s]')
+
+
+class JsonStreamError(ValueError):
+    pass
+
+
+def _chunks(source, chunk_size):
+    """
+    Iterate over chunks of a file-like object (anything with read(size))
+    or of an iterable of strings.
+    """
+    if hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        for chunk in source:
+            if chunk:
+                yield chunk
+
+
+class _ValueScanner(object):
+    """
+    Finds the end of one json value that can span several chunks. The nesting
+    depth and the string state are kept between the chunks, so every
+    character is scanned only once.
+    """
+
+    def __init__(self, first_char):
+        self.scalar = first_char not in '"[{'
+        self.depth = 0
+        self.in_string = False
+        # the previous chunk ended with a backslash in a string
+        self.escape = False
+
+    def feed(self, buf, pos):
+        """
+        Scan the buffer from pos.
+
+        :return: index after the end of the value or None if the value
+            continues in the next chunk
+        """
+        if self.scalar:
+            match = _SCALAR_END.search(buf, pos)
+            return match.start() if match else None
+
+        if self.escape:
+            pos += 1
+            self.escape = False
+        while True:
+            if self.in_string:
+                match = _STRING_END.search(buf, pos)
+                if match is None:
+                    return None
+                pos = match.end()
+                if match.group() == '\\':
+                    if pos >= len(buf):
+                        self.escape = True
+                        return None
+                    pos += 1
+                    continue
+                self.in_string = False
+                if self.depth == 0:
+                    return pos
+            else:
+                match = _STRUCTURE.search(buf, pos)
+                if match is None:
+                    return None
+                pos = match.end()
+                char = match.group()
+                if char == '"':
+                    self.in_string = True
+                elif char in '[{':
+                    self.depth += 1
+                else:
+                    self.depth -= 1
+                    if self.depth <= 0:
+                        return pos
+
+
+def iter_json_array(source, chunk_size=CHUNK_SIZE, wrap=None):
+    """
+    Yields elements of a top-level json array as soon as they are read.
+    Only the unprocessed part of the input is kept in memory. Every element
+    is decoded once, when its last character was read.
+
+    :param source: file-like object or iterable of strings with the json document
+    :type chunk_size: int
+    :param chunk_size: size of chunks read from a file-like source
+    :type wrap: callable
+    :param wrap: function applied to every decoded element, e.g. u_view
+    :raises JsonStreamError: when the document is not a valid json array
+    """
+    decoder = json.JSONDecoder()
+    chunks = _chunks(source, chunk_size)
+    buf = ''
+    pos = 0
+    # number of characters before the beginning of the buffer
+    offset = 0
+    # start: expects '[', first: a value or ']', value: a value, separator: ',' or ']'
+    state = 'start'
+    # scanner and parts of the value being read
+    scanner = None
+    parts = []
+    value_start = 0
+
+    while True:
+        if pos >= len(buf):
+            offset += len(buf)
+            try:
+                buf = next(chunks)
+            except StopIteration:
+                raise JsonStreamError('Unexpected end of json array')
+            pos = 0
+
+        if scanner is not None:
+            end = scanner.feed(buf, pos)
+            if end is None:
+                parts.append(buf[pos:])
+                pos = len(buf)
+                continue
+            parts.append(buf[pos:end])
+            pos = end
+            text = ''.join(parts)
+            scanner = None
+            parts = []
+            try:
+                element, length = decoder.raw_decode(text)
+            except ValueError:
+                length = None
+            if length != len(text):
+                raise JsonStreamError('Invalid json value at position %d' % value_start)
+            state = 'separator'
+            yield wrap(element) if wrap else element
+            continue
+
+        char = buf[pos]
+        if char in WHITESPACE:
+            match = _NON_WHITESPACE.search(buf, pos)
+            pos = match.start() if match else len(buf)
+        elif state == 'start':
+            if char != '[':
+                raise JsonStreamError('Json document is not an array')
+            state = 'first'
+            pos += 1
+        elif state == 'separator':
+            if char == ']':
+                return
+            elif char != ',':
+                raise JsonStreamError('Expected "," or "]" at position %d' % (offset + pos))
+            state = 'value'
+            pos += 1
+        elif state == 'first' and char == ']':
+            return
+        else:
+            scanner = _ValueScanner(char)
+            value_start = offset + pos
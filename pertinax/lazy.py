@@ -0,0 +1,68 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import sys
+import types
+from importlib import import_module
+
+
+class LazyModule(types.ModuleType):
+    """
+    Placeholder for a module that is imported on the first attribute access.
+
+    When the placeholder is created with the namespace it is stored in
+    (usually globals() of the importing module), the real module replaces it
+    there after the import, so subsequent accesses don't go through the proxy.
+    """
+
+    def __init__(self, name, namespace=None, alias=None):
+        super(LazyModule, self).__init__(name)
+        self.__dict__['_lazy_namespace'] = namespace
+        self.__dict__['_lazy_alias'] = alias or name.split('.')[-1]
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            module = import_module(self.__name__)
+            self.__dict__['_lazy_module'] = module
+            namespace = self.__dict__['_lazy_namespace']
+            if namespace is not None and namespace.get(self._lazy_alias) is self:
+                namespace[self._lazy_alias] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+
+def lazy_import(name, namespace=None, alias=None):
+    """
+    Returns a lazily loaded module. Modules that were already imported
+    are returned directly.
+
+    :type name: str
+    :param name: full name of the module
+    :type namespace: dict
+    :param namespace: namespace the module is stored in, the placeholder is replaced
+        with the real module there on the first access
+    :type alias: str
+    :param alias: name of the module in the namespace, last part of the module name by default
+    """
+    if sys.modules.get(name) is not None:
+        return sys.modules[name]
+    return LazyModule(name, namespace, alias)
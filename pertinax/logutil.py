@@ -15,15 +15,22 @@
 
 import os
 import sys
+import atexit
 import logging
+import threading
+from Queue import Queue, Empty, Full
 from logging import root, Formatter
 from logging.handlers import RotatingFileHandler
 from pertinax.config import Config
 
-USRDIR = Config.USER_DIR
 LOGDIR = '/var/log/katello'
 LOGFILE = 'client.log'
 
+# maximal number of records waiting for the writer thread, 0 means unbounded
+QUEUE_SIZE = 10000
+# maximal number of records written in one batch
+BATCH_SIZE = 256
+
 TIME = '%(asctime)s'
 LEVEL = ' [%(levelname)s]'
 THREAD = '[%(threadName)s]'
@@ -46,29 +53,157 @@ FMT = \
 
 handler = None
 
-def __logdir():
+
+class QueueHandler(logging.Handler):
+    """
+    Handler that puts records into a queue and lets a background thread
+    write them in batches to the target handler, so that logging calls
+    don't block on file I/O.
+
+    When the queue is bounded and full, records are dropped and counted.
+    The number of dropped records is reported in the log by the writer.
+    """
+
+    # marks the end of the queue
+    _STOP = object()
+
+    def __init__(self, target, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE):
+        """
+        :type target: logging.Handler
+        :param target: handler that does the actual writing
+        :type queue_size: int
+        :param queue_size: maximal number of waiting records, 0 for unbounded queue
+        :type batch_size: int
+        :param batch_size: maximal number of records written before flushing the target
+        """
+        logging.Handler.__init__(self)
+        self.target = target
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.__reported_dropped = 0
+        self.__queue = Queue(queue_size)
+        self.__writer = threading.Thread(target=self.__write_loop, name='log-writer')
+        self.__writer.daemon = True
+        self.__writer.start()
+
+    def emit(self, record):
+        try:
+            self.__queue.put_nowait(self.prepare(record))
+        except Full:
+            self.dropped += 1
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except:  # pylint: disable=W0702
+            self.handleError(record)
+
+    @classmethod
+    def prepare(cls, record):
+        """
+        Merge the message with its arguments and render the exception info
+        while the objects are still in the state they were logged in.
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def __write_loop(self):
+        while True:
+            batch = [self.__queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.__queue.get_nowait())
+            except Empty:
+                pass
+
+            stop = self._STOP in batch
+            for record in batch:
+                if record is not self._STOP:
+                    self.target.handle(record)
+            self.__report_dropped()
+            self.target.flush()
+            if stop:
+                return
+
+    def __report_dropped(self):
+        dropped = self.dropped - self.__reported_dropped
+        if dropped > 0:
+            self.__reported_dropped += dropped
+            record = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                '%d log records were dropped, the log queue was full', (dropped,), None,
+                func='report_dropped')
+            self.target.handle(record)
+
+    def flush(self):
+        self.target.flush()
+
+    def close(self):
+        """
+        Write all the waiting records and stop the writer thread.
+        """
+        if self.__writer.is_alive():
+            self.__queue.put(self._STOP)
+            self.__writer.join()
+        self.target.close()
+        logging.Handler.close(self)
+
+
+def logdir():
     if os.getuid() == 0:
         return LOGDIR
     else:
-        return os.path.expanduser(USRDIR)
+        return os.path.expanduser(Config.USER_DIR)
 
 def logfile():
-    return os.path.join(__logdir(), LOGFILE)
+    return os.path.join(logdir(), LOGFILE)
+
+def __env_int(name, default):
+    try:
+        return int(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+def __shutdown():
+    if handler is not None:
+        root.removeHandler(handler)
+        handler.close()
 
 def getLogger(name):
     global handler
-    logdir = __logdir()
-    if not os.path.exists(logdir):
-        os.mkdir(logdir)
     if handler is None:
-        try:
-            level = int(os.environ["KATELLO_CLI_LOGLEVEL"])
-        except (KeyError, ValueError):
-            level = logging.INFO
+        # the log directory is checked only once per process
+        directory = logdir()
+        if not os.path.exists(directory):
+            os.mkdir(directory)
+
+        level = __env_int("KATELLO_CLI_LOGLEVEL", logging.INFO)
+        queue_size = __env_int("KATELLO_CLI_LOG_QUEUE_SIZE", QUEUE_SIZE)
+
         path = logfile()
-        handler = RotatingFileHandler(path, maxBytes=0x100000, backupCount=5)
-        handler.setFormatter(Formatter(FMT))
+        file_handler = RotatingFileHandler(path, maxBytes=0x100000, backupCount=5)
+        file_handler.setFormatter(Formatter(FMT))
+        handler = QueueHandler(file_handler, queue_size=queue_size)
         root.setLevel(level)
         root.addHandler(handler)
+        # write the rest of the queue on exit
+        atexit.register(__shutdown)
     log = logging.getLogger(name)
     return log
+
+
+class LazyLogger(object):
+    """
+    Logger that is created on the first use, so that importing a module
+    doesn't set up the log file and the writer thread.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.__log = None
+
+    def __getattr__(self, attr):
+        if self.__log is None:
+            self.__log = getLogger(self.name)
+        return getattr(self.__log, attr)
@@ -0,0 +1,190 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Per-command metrics in the Prometheus textfile format, suitable for
+the node_exporter textfile collector. Enabled in client.conf:
+
+    [metrics]
+    enabled = true
+    # optional, defaults to katello_cli.prom in the log directory
+    file = /var/lib/node_exporter/textfile/katello_cli.prom
+
+The counters are kept in a json state file next to the metrics file.
+Both files are updated under an exclusive lock and replaced by an atomic
+rename, so concurrent invocations neither corrupt the files nor lose updates.
+"""
+
+import json
+import os
+
+from pertinax import logutil
+from pertinax.config import atomic_write
+from pertinax.exceptions import CODE_UNEXPECTED
+from pertinax.lazy import lazy_import
+
+fcntl = lazy_import('fcntl', globals())
+
+METRICS_FILE = 'katello_cli.prom'
+PREFIX = 'katello_cli'
+# upper bounds of the histogram buckets in seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def metricsfile():
+    return os.path.join(logutil.logdir(), METRICS_FILE)
+
+
+def get_metrics(config):
+    """
+    Returns the metrics file configured in the 'metrics' section of the config
+    or None when the metrics are disabled.
+
+    :type config: pertinax.config.CompiledConfig
+    """
+    if not config.get_bool('metrics', 'enabled'):
+        return None
+    return MetricsFile(config.get_str('metrics', 'file', metricsfile()))
+
+
+class MetricsFile(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.state_path = path + '.json'
+        self.lock_path = path + '.lock'
+
+    def record(self, command, exit_code, duration, render_time, api_calls):
+        """
+        Update the metrics with one command execution.
+
+        :type command: str
+        :param command: command path
+        :type exit_code: int
+        :param exit_code: exit code of the command, see CODE_* in pertinax.exceptions.
+            None (the command didn't finish) is counted as CODE_UNEXPECTED.
+        :type duration: float
+        :param duration: duration of the execution in seconds
+        :type render_time: float
+        :param render_time: time spent printing the output in seconds
+        :type api_calls: int
+        :param api_calls: number of api calls made
+        """
+        try:
+            with open(self.lock_path, 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    state = self.__load_state()
+                    if exit_code is None:
+                        exit_code = CODE_UNEXPECTED
+                    self.__update(state, command, exit_code, duration, render_time, api_calls)
+                    atomic_write(self.state_path, json.dumps(state))
+                    atomic_write(self.path, render(state))
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        except (IOError, OSError):
+            # metrics must never break the command itself
+            logutil.getLogger(__name__).warning('Could not update metrics file %s', self.path, exc_info=True)
+
+    def __load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    @classmethod
+    def __update(cls, state, command, exit_code, duration, render_time, api_calls):
+        cmd = state.setdefault(command, {
+            'invocations': 0,
+            'failures': {},
+            'api_calls': 0,
+            'duration': new_histogram(),
+            'render': new_histogram(),
+        })
+        cmd['invocations'] += 1
+        if exit_code != os.EX_OK:
+            code = str(exit_code)
+            cmd['failures'][code] = cmd['failures'].get(code, 0) + 1
+        cmd['api_calls'] += api_calls
+        observe(cmd['duration'], duration)
+        observe(cmd['render'], render_time)
+
+
+def new_histogram():
+    return {'buckets': [0] * len(BUCKETS), 'count': 0, 'sum': 0.0}
+
+
+def observe(histogram, value):
+    """
+    Add a value to a histogram with cumulative buckets.
+    """
+    for i, bound in enumerate(BUCKETS):
+        if value <= bound:
+            histogram['buckets'][i] += 1
+    histogram['count'] += 1
+    histogram['sum'] += value
+
+
+def _labels(**labels):
+    pairs = ['%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in sorted(labels.items())]
+    return '{' + ','.join(pairs) + '}'
+
+
+def _render_histogram(lines, name, command, histogram):
+    for bound, count in zip(BUCKETS, histogram['buckets']):
+        lines.append('%s_bucket%s %d' % (name, _labels(command=command, le=repr(bound)), count))
+    lines.append('%s_bucket%s %d' % (name, _labels(command=command, le='+Inf'), histogram['count']))
+    lines.append('%s_sum%s %f' % (name, _labels(command=command), histogram['sum']))
+    lines.append('%s_count%s %d' % (name, _labels(command=command), histogram['count']))
+
+
+def render(state):
+    """
+    Render the metrics state in the Prometheus text format.
+
+    :rtype: str
+    """
+    commands = sorted(state.items())
+    lines = []
+
+    lines.append('# HELP %s_invocations_total Number of command executions.' % PREFIX)
+    lines.append('# TYPE %s_invocations_total counter' % PREFIX)
+    for command, cmd in commands:
+        lines.append('%s_invocations_total%s %d' % (PREFIX, _labels(command=command), cmd['invocations']))
+
+    lines.append('# HELP %s_failures_total Number of failed command executions by exit code.' % PREFIX)
+    lines.append('# TYPE %s_failures_total counter' % PREFIX)
+    for command, cmd in commands:
+        for code, count in sorted(cmd['failures'].items()):
+            lines.append('%s_failures_total%s %d' % (PREFIX, _labels(command=command, exit_code=code), count))
+
+    lines.append('# HELP %s_api_calls_total Number of api calls made by the command.' % PREFIX)
+    lines.append('# TYPE %s_api_calls_total counter' % PREFIX)
+    for command, cmd in commands:
+        lines.append('%s_api_calls_total%s %d' % (PREFIX, _labels(command=command), cmd['api_calls']))
+
+    lines.append('# HELP %s_duration_seconds Duration of command executions.' % PREFIX)
+    lines.append('# TYPE %s_duration_seconds histogram' % PREFIX)
+    for command, cmd in commands:
+        _render_histogram(lines, PREFIX + '_duration_seconds', command, cmd['duration'])
+
+    lines.append('# HELP %s_render_seconds Time spent printing the output.' % PREFIX)
+    lines.append('# TYPE %s_render_seconds histogram' % PREFIX)
+    for command, cmd in commands:
+        _render_histogram(lines, PREFIX + '_render_seconds', command, cmd['render'])
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,215 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Cache of ids of objects looked up by their names (organizations,
+environments, products, ...). Without persistence the cache only saves
+repeated lookups within one process. It is kept between invocations
+when enabled in client.conf:
+
+    [name_cache]
+    enabled = true
+    # seconds for which a resolved id is trusted
+    ttl = 600
+
+The entries are stored per server and user in the user's directory.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from pertinax.config import atomic_write
+from pertinax.logutil import LazyLogger
+
+CACHE_DIR = 'names'
+CACHE_VERSION = 1
+DEFAULT_TTL = 600
+
+_log = LazyLogger(__name__)
+
+
+def cachefile(user_dir, server, user):
+    """
+    Returns path of the cache file of a server and a user.
+    """
+    digest = hashlib.sha1(('%s\0%s' % (server, user)).encode('utf-8')).hexdigest()
+    return os.path.join(user_dir, CACHE_DIR, digest + '.json')
+
+
+def _key(kind, name, scope):
+    return json.dumps([kind, list(scope), name])
+
+
+class NameCache(object):
+    """
+    Maps (kind, scope, name) to ids with expiration.
+
+    The scope distinguishes objects with the same name under different
+    parents, e.g. environments are resolved in the scope of an organization:
+
+        env_id = cache.resolve('environment', name,
+            lambda name: self.api.environment_by_name(org_id, name)['id'],
+            scope=(org_id,))
+
+    Ids that lead to 404 are dropped by call_with, which then resolves
+    the name again.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, is_not_found=None):
+        """
+        :type path: str
+        :param path: file to persist the cache to, None for a cache held in memory
+        :type ttl: int
+        :param ttl: seconds for which an entry is valid
+        :type is_not_found: callable
+        :param is_not_found: function(exception) returning True if the
+            exception means the object doesn't exist (404)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.is_not_found = is_not_found or (lambda e: False)
+        self.hits = 0
+        self.misses = 0
+        self.__entries = None
+        self.__dirty = False
+
+    def __load(self):
+        if self.__entries is not None:
+            return self.__entries
+        self.__entries = {}
+        if self.path is None:
+            return self.__entries
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                self.__entries = data['entries']
+        except (IOError, ValueError, KeyError, AttributeError):
+            pass
+        return self.__entries
+
+    def get(self, kind, name, scope=()):
+        """
+        Returns the cached id or None if it's not cached or has expired.
+        """
+        entry = self.__load().get(_key(kind, name, scope))
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def put(self, kind, name, object_id, scope=()):
+        self.__load()[_key(kind, name, scope)] = [object_id, time.time() + self.ttl]
+        self.__dirty = True
+
+    def invalidate(self, kind, name, scope=()):
+        if self.__load().pop(_key(kind, name, scope), None) is not None:
+            self.__dirty = True
+
+    def resolve(self, kind, name, lookup, scope=()):
+        """
+        Returns id of the named object, calls lookup only if it's not cached.
+
+        :type kind: str
+        :param kind: type of the object, e.g. 'organization'
+        :type name: str
+        :type lookup: callable
+        :param lookup: function(name) returning the id, None if not found
+        :type scope: tuple
+        :param scope: ids of the parent objects
+        :return: the id or None if the object was not found
+        """
+        object_id = self.get(kind, name, scope)
+        if object_id is not None:
+            self.hits += 1
+            return object_id
+
+        self.misses += 1
+        object_id = lookup(name)
+        if object_id is not None:
+            self.put(kind, name, object_id, scope)
+        return object_id
+
+    def resolve_many(self, kind, names, lookup_many, scope=()):
+        """
+        Resolve many names, the ones that are not cached are looked up in
+        one call.
+
+        :type names: iterable of str
+        :type lookup_many: callable
+        :param lookup_many: function(list of names) returning dict name -> id
+            of the objects that were found
+        :return: dict name -> id, names that were not found are left out
+        """
+        resolved = {}
+        missing = []
+        for name in names:
+            object_id = self.get(kind, name, scope)
+            if object_id is not None:
+                resolved[name] = object_id
+            elif name not in missing:
+                missing.append(name)
+
+        self.hits += len(resolved)
+        self.misses += len(missing)
+        if missing:
+            found = lookup_many(missing)
+            for name in missing:
+                if found.get(name) is not None:
+                    resolved[name] = found[name]
+                    self.put(kind, name, found[name], scope)
+        return resolved
+
+    def call_with(self, kind, name, lookup, func, scope=()):
+        """
+        Resolve the name and call func with the id. If the call fails
+        with 404, the cached id was stale: the entry is dropped and the call
+        is repeated with a freshly looked up id.
+
+        :type func: callable
+        :param func: function(id) making the api call
+        :return: result of func
+        """
+        cached = self.get(kind, name, scope) is not None
+        object_id = self.resolve(kind, name, lookup, scope)
+        try:
+            return func(object_id)
+        except Exception, e:
+            if not (cached and self.is_not_found(e)):
+                raise
+            _log.debug('stale %s id %s of "%s", resolving again', kind, object_id, name)
+            self.invalidate(kind, name, scope)
+            return func(self.resolve(kind, name, lookup, scope))
+
+    def save(self):
+        """
+        Write the changed cache to its file. Expired entries are left out.
+        The file is replaced atomically, failures are only logged.
+        """
+        if self.path is None or not self.__dirty:
+            return
+
+        now = time.time()
+        entries = dict((key, entry) for key, entry in self.__entries.items() if entry[1] >= now)
+        try:
+            directory = os.path.dirname(self.path)
+            if not os.path.exists(directory):
+                os.makedirs(directory, 0700)
+            atomic_write(self.path, json.dumps({'version': CACHE_VERSION, 'entries': entries}), 0600)
+            self.__dirty = False
+        except (IOError, OSError):
+            _log.warning('Could not save the name cache %s', self.path, exc_info=True)
+        _log.debug('name cache: %d hits, %d misses', self.hits, self.misses)
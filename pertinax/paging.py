@@ -0,0 +1,159 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import collections
+import sys
+import threading
+from Queue import Queue, Empty, Full
+
+from pertinax.timing import clock
+
+
+class PagerError(Exception):
+    """
+    Raised when the pages stop coming: the fetching thread died or a page
+    didn't arrive in time.
+    """
+    pass
+
+
+class PrefetchingPager(object):
+    """
+    Iterator over items of paginated api results. Next pages are fetched in
+    a background thread while the items of the current page are consumed,
+    so network and rendering overlap:
+
+        pager = PrefetchingPager(lambda offset, limit: self.api.packages(offset=offset, limit=limit))
+        self.printer.print_items(pager)
+
+    The page size adapts to the observed latency. It grows while the pages
+    are fetched faster than target_latency and shrinks when they are slower.
+    Servers may return less items than requested (e.g. they cap the page
+    size), so the iteration ends only with an empty page or when the total
+    reported by the server is reached. fetch_page can return the server's
+    response with 'results' and 'subtotal' or 'total' for that.
+    """
+
+    # interval for checking whether the consumer stopped iterating
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, fetch_page, page_size=100, prefetch=2, min_page_size=10,
+                 max_page_size=1000, target_latency=1.0, timeout=None):
+        """
+        :type fetch_page: callable
+        :param fetch_page: function(offset, limit) that returns list of items
+            or a dict with the items in 'results' and their total count
+        :type page_size: int
+        :param page_size: initial number of items requested in one page
+        :type prefetch: int
+        :param prefetch: maximal number of pages fetched ahead
+        :type min_page_size: int
+        :type max_page_size: int
+        :type target_latency: float
+        :param target_latency: desired duration of one page request in seconds
+        :type timeout: float
+        :param timeout: seconds to wait for a page before raising PagerError,
+            no limit by default
+        """
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.min_page_size = min_page_size
+        self.max_page_size = max_page_size
+        self.target_latency = target_latency
+        self.timeout = timeout
+        # (limit, number of items, seconds) of the fetched pages
+        self.pages = []
+
+    def __iter__(self):
+        queue = Queue(self.prefetch)
+        stop = threading.Event()
+        fetcher = threading.Thread(target=self.__fetch_pages, args=(queue, stop), name='pager')
+        fetcher.daemon = True
+        fetcher.start()
+        try:
+            while True:
+                page, exc_info = self.__get(queue, fetcher)
+                if exc_info is not None:
+                    raise exc_info[0], exc_info[1], exc_info[2]
+                if page is None:
+                    return
+                for item in page:
+                    yield item
+        finally:
+            stop.set()
+
+    def __get(self, queue, fetcher):
+        """
+        Wait for the next page, raise PagerError when the fetcher died
+        or the timeout passed.
+        """
+        start = clock()
+        while True:
+            try:
+                return queue.get(timeout=self.POLL_INTERVAL)
+            except Empty:
+                pass
+            if not fetcher.is_alive():
+                # the last entry might have been queued right before the end
+                try:
+                    return queue.get_nowait()
+                except Empty:
+                    raise PagerError('The page fetching thread stopped unexpectedly')
+            if self.timeout is not None and clock() - start > self.timeout:
+                raise PagerError('No page received in %s seconds' % self.timeout)
+
+    def __fetch_pages(self, queue, stop):
+        offset = 0
+        try:
+            while not stop.is_set():
+                limit = self.page_size
+                start = clock()
+                page, total = self.__split_response(self.fetch_page(offset, limit))
+                self.__adapt_page_size(limit, len(page), clock() - start)
+
+                if page:
+                    self.__put(queue, stop, (page, None))
+                offset += len(page)
+                if not page or (total is not None and offset >= total):
+                    self.__put(queue, stop, (None, None))
+                    return
+        except:  # pylint: disable=W0702
+            self.__put(queue, stop, (None, sys.exc_info()))
+
+    @classmethod
+    def __split_response(cls, response):
+        """
+        :return: (list of items, total count or None if not known)
+        """
+        if isinstance(response, collections.Mapping) and 'results' in response:
+            total = response.get('subtotal', response.get('total'))
+            return list(response['results']), total
+        return list(response), None
+
+    def __put(self, queue, stop, entry):
+        while not stop.is_set():
+            try:
+                queue.put(entry, timeout=self.POLL_INTERVAL)
+                return
+            except Full:
+                continue
+
+    def __adapt_page_size(self, limit, count, seconds):
+        self.pages.append((limit, count, seconds))
+        if seconds < self.target_latency / 2:
+            self.page_size = min(self.max_page_size, self.page_size * 2)
+        elif seconds > self.target_latency:
+            self.page_size = max(self.min_page_size, self.page_size // 2)
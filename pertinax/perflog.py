@@ -0,0 +1,223 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Structured performance event log.
+
+When enabled in client.conf, every command execution appends one JSON
+record to a size-rotated JSON-lines file:
+
+    [perflog]
+    enabled = true
+    # optional, defaults to perf.jsonl in the log directory
+    file = /var/log/katello/perf.jsonl
+    max_bytes = 10485760
+    backup_count = 5
+
+The files can be summarized with:
+
+    python -m pertinax.perflog FILE [FILE ...]
+"""
+
+import json
+import math
+import os
+import socket
+import sys
+import time
+from optparse import OptionParser
+
+from pertinax import logutil
+from pertinax.lazy import lazy_import
+
+fcntl = lazy_import('fcntl', globals())
+
+PERFLOG_FILE = 'perf.jsonl'
+MAX_BYTES = 10 * 0x100000
+BACKUP_COUNT = 5
+
+_sink = None
+
+
+def perflogfile():
+    return os.path.join(logutil.logdir(), PERFLOG_FILE)
+
+
+def get_sink(config):
+    """
+    Returns the event sink configured in the 'perflog' section of the config
+    or None when the event log is disabled.
+
+    :type config: pertinax.config.CompiledConfig
+    """
+    global _sink
+    if not config.get_bool('perflog', 'enabled'):
+        return None
+    if _sink is None:
+        _sink = EventSink(
+            config.get_str('perflog', 'file', perflogfile()),
+            config.get_int('perflog', 'max_bytes', MAX_BYTES),
+            config.get_int('perflog', 'backup_count', BACKUP_COUNT))
+    return _sink
+
+
+class EventSink(object):
+    """
+    Appends events as JSON lines to a file rotated by size. Several client
+    processes can write to the same file: every event is written as a whole
+    line by a single append and the rotation is serialized by a lock file.
+    """
+
+    def __init__(self, path, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+        """
+        :type max_bytes: int
+        :param max_bytes: size the file is rotated at, 0 for no rotation
+        :type backup_count: int
+        :param backup_count: number of rotated files kept
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+    def write(self, event):
+        """
+        :type event: dict
+        :param event: json serializable event
+        """
+        line = json.dumps(event, sort_keys=True) + '\n'
+        try:
+            if self.max_bytes > 0 and self.__size() + len(line) > self.max_bytes:
+                self.__rotate(len(line))
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        except (IOError, OSError):
+            # the event log must never break the command itself
+            logutil.getLogger(__name__).warning('Could not write performance event to %s', self.path, exc_info=True)
+
+    def __size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def __rotate(self, incoming):
+        """
+        Rename the file to path.1, path.1 to path.2 and so on. Processes that
+        still append to the renamed file write whole lines to it, no event
+        is broken.
+        """
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # another process may have rotated the file meanwhile
+                if self.__size() + incoming <= self.max_bytes:
+                    return
+                if self.backup_count <= 0:
+                    os.remove(self.path)
+                    return
+                for i in xrange(self.backup_count - 1, 0, -1):
+                    source = '%s.%d' % (self.path, i)
+                    if os.path.exists(source):
+                        os.rename(source, '%s.%d' % (self.path, i + 1))
+                os.rename(self.path, self.path + '.1')
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def command_event(command_path, exit_code, timer, api_stats=None, rows=None):
+    """
+    Create an event describing one command execution.
+
+    :type command_path: str
+    :param command_path: sections and the name of the command, space separated
+    :type exit_code: int
+    :type timer: pertinax.timing.PhaseTimer
+    :type api_stats: pertinax.bindings.ApiCallStats
+    :type rows: int
+    :param rows: number of printed rows
+    :rtype: dict
+    """
+    event = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+        'command': command_path,
+        'exit_code': exit_code,
+        'duration_ms': round(timer.elapsed() * 1000, 3),
+        'phases_ms': dict((name, round(seconds * 1000, 3)) for name, seconds in timer.phases()),
+        'rows': rows,
+    }
+    if api_stats is not None:
+        event['api_calls'] = api_stats.count()
+        event['api_latencies_ms'] = [round(seconds * 1000, 3) for seconds in api_stats.latencies()]
+        event['response_sizes'] = api_stats.sizes()
+    return event
+
+
+# -- report -------------------------------------------------------------------
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+    if not values:
+        return None
+    # pct * n first, so that e.g. p95 of 20 values is exactly rank 19
+    rank = int(math.ceil(pct * len(values) / 100.0)) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+
+def read_events(paths):
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def report(events, output=sys.stdout):
+    """
+    Print p50/p95/p99 of command durations per command.
+    """
+    durations = {}
+    for event in events:
+        durations.setdefault(event.get('command'), []).append(event.get('duration_ms', 0))
+
+    output.write('%-40s %8s %10s %10s %10s\n' % ('command', 'count', 'p50 [ms]', 'p95 [ms]', 'p99 [ms]'))
+    for command in sorted(durations, key=lambda c: c or ''):
+        values = sorted(durations[command])
+        output.write('%-40s %8d %10.1f %10.1f %10.1f\n' % (command, len(values),
+            percentile(values, 50), percentile(values, 95), percentile(values, 99)))
+
+
+def main(args):
+    parser = OptionParser(usage='%prog FILE [FILE ...]')
+    _options, paths = parser.parse_args(args)
+    if not paths:
+        paths = [perflogfile()]
+    report(read_events(paths))
+    return os.EX_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
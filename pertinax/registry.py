@@ -0,0 +1,139 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import re
+
+
+def command_name(class_name):
+    """
+    Convert a command class name to the command name.
+    CreateSyncPlan -> create_sync_plan
+
+    :type class_name: str
+    :param class_name: name of the command class
+    :rtype: str
+    """
+    s = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', class_name)
+    return re.sub('([a-z0-9])([A-Z])', r'\1_\2', s).lower()
+
+
+class CommandRegistry(object):
+    """
+    Index of command classes by their names and aliases.
+    Command classes are registered when they are defined, so the lookups
+    don't need to walk the cli tree or rebuild lists of its keys.
+    """
+
+    def __init__(self):
+        self.__classes = {}
+        # alias -> names of the commands that declare it, commands in
+        # different sections can share an alias
+        self.__aliases = {}
+
+    def register(self, command_class):
+        """
+        Add a command class to the registry.
+
+        :type command_class: class
+        :param command_class: command class with name and aliases attributes
+        """
+        self.__classes.setdefault(command_class.name, []).append(command_class)
+        for alias in getattr(command_class, 'aliases', ()):
+            names = self.__aliases.setdefault(alias, [])
+            if command_class.name not in names:
+                names.append(command_class.name)
+
+    def get_classes(self, name):
+        """
+        Returns all command classes registered under a name or an alias.
+        Several classes can share a name if they live in different sections.
+
+        :type name: str
+        :param name: command name or alias
+        :rtype: list of classes
+        """
+        classes = list(self.__classes.get(name, ()))
+        for command in self.__aliases.get(name, ()):
+            classes.extend(cls for cls in self.__classes[command] if name in getattr(cls, 'aliases', ()))
+        return classes
+
+    def resolve_name(self, name):
+        """
+        Translate an alias to the command name. Names that are not aliases
+        are returned unchanged. When commands in several sections share
+        the alias, the name registered first is returned, use find to look
+        the alias up in a section.
+
+        :type name: str
+        :param name: command name or alias
+        :rtype: str
+        """
+        names = self.__aliases.get(name)
+        return names[0] if names else name
+
+    def find(self, section, name):
+        """
+        Returns command or subsection of a section by its name or alias.
+
+        :type section: okaara.cli.Section
+        :param section: section to search in
+        :type name: str
+        :param name: command/section name or alias
+        :return: command, section or None if nothing was found
+        """
+        node = section.commands.get(name, section.subsections.get(name))
+        if node is None:
+            for command_name in self.__aliases.get(name, ()):
+                command = section.commands.get(command_name)
+                # the section may have a command of that name without the alias
+                if command is not None and name in getattr(command, 'aliases', ()):
+                    return command
+        return node
+
+    def contains(self, section, name):
+        """
+        Test whether a section contains a command or subsection with the name or alias.
+
+        :type section: okaara.cli.Section
+        :param section: section to search in
+        :type name: str
+        :param name: command/section name or alias
+        :rtype: bool
+        """
+        return self.find(section, name) is not None
+
+
+registry = CommandRegistry()
+
+
+class CommandType(type):
+    """
+    Metaclass that computes the command name once when the class is defined
+    and registers the class in the command registry.
+    Classes can still set the name explicitly. Base classes that are not
+    executable commands set abstract = True and are not registered.
+    """
+
+    def __new__(mcs, class_name, bases, attrs):
+        if 'name' not in attrs:
+            attrs['name'] = command_name(class_name)
+        attrs.setdefault('aliases', ())
+        abstract = attrs.pop('abstract', False)
+        cls = super(CommandType, mcs).__new__(mcs, class_name, bases, attrs)
+
+        # register only subclasses, the base command class is not executable
+        if not abstract and any(isinstance(base, CommandType) for base in bases):
+            registry.register(cls)
+        return cls
@@ -0,0 +1,329 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Record and replay of api traffic, so that commands can be benchmarked
+and profiled without a server.
+
+Record the calls of a command against a live server:
+
+    KATELLO_CLI_RECORD=org_list.json katello org list
+
+Replay them, optionally with simulated network conditions:
+
+    KATELLO_CLI_REPLAY=org_list.json \\
+    KATELLO_CLI_REPLAY_LATENCY=50 \\
+    KATELLO_CLI_REPLAY_BANDWIDTH=1000000 \\
+    katello org list
+
+The latency is in milliseconds per call, the bandwidth in bytes per second
+of the json encoded responses. Identical calls are answered in the order
+they were recorded, the last answer is repeated.
+
+Values json can't represent as they are (tuples, sets, byte strings, dicts
+with non-string keys, other objects) are recorded as one-key objects
+tagged with their type, e.g. {"__tuple__": [1, 2]}, so the replayed
+responses have the types of the recorded ones.
+"""
+
+import atexit
+import cPickle
+import json
+import os
+import threading
+import time
+
+from pertinax.bindings import BindingsProxy
+from pertinax.timing import clock
+
+FIXTURE_VERSION = 2
+# version 1 fixtures have no type tags, they are replayed as plain json
+SUPPORTED_VERSIONS = (1, FIXTURE_VERSION)
+
+# tags of the encoded values
+TUPLE = '__tuple__'
+SET = '__set__'
+BYTES = '__str__'
+ITEMS = '__dict__'
+PICKLE = '__pickle__'
+TAGS = frozenset([TUPLE, SET, BYTES, ITEMS, PICKLE])
+
+_recorder = None
+# fixture path -> Fixture, a fixture is loaded once per process
+_fixtures = {}
+
+
+class ReplayMismatch(Exception):
+    """
+    Raised when the replayed command makes a call that was not recorded.
+    """
+    pass
+
+
+class ReplayedError(Exception):
+    """
+    Stands for a recorded exception whose class can't be imported.
+    """
+    pass
+
+
+def call_key(path, args, kwargs):
+    return json.dumps(['.'.join(path), list(args), kwargs], sort_keys=True, default=repr)
+
+
+def encode_value(value):
+    """
+    Returns json representable version of a value, with type tags where
+    json would change the type.
+    """
+    if value is None or isinstance(value, (unicode, bool, int, long, float)):
+        return value
+    if isinstance(value, str):
+        # latin-1 maps every byte to one character
+        return {BYTES: value.decode('latin-1')}
+    if isinstance(value, list):
+        return [encode_value(item) for item in value]
+    if isinstance(value, tuple):
+        return {TUPLE: [encode_value(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        return {SET: [encode_value(item) for item in value]}
+    if isinstance(value, dict):
+        if all(isinstance(key, unicode) for key in value) and not (len(value) == 1 and iter(value).next() in TAGS):
+            return dict((key, encode_value(item)) for key, item in value.iteritems())
+        return {ITEMS: [[encode_value(key), encode_value(item)] for key, item in value.iteritems()]}
+    try:
+        return {PICKLE: cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL).encode('base64')}
+    except Exception:  # pylint: disable=W0703
+        return repr(value).decode('latin-1')
+
+
+def decode_value(value):
+    """
+    Reverse of encode_value.
+    """
+    if isinstance(value, list):
+        return [decode_value(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if len(value) == 1:
+        tag, data = value.items()[0]
+        if tag == TUPLE:
+            return tuple(decode_value(item) for item in data)
+        if tag == SET:
+            return set(decode_value(item) for item in data)
+        if tag == BYTES:
+            return data.encode('latin-1')
+        if tag == ITEMS:
+            return dict((decode_value(key), decode_value(item)) for key, item in data)
+        if tag == PICKLE:
+            return cPickle.loads(data.decode('base64'))
+    return dict((key, decode_value(item)) for key, item in value.iteritems())
+
+
+def _error_class(name):
+    module_name, _dot, class_name = name.rpartition('.')
+    try:
+        module = __import__(module_name, fromlist=[class_name])
+        return getattr(module, class_name)
+    except (ImportError, AttributeError, ValueError):
+        return None
+
+
+class Recorder(object):
+    """
+    Collects api calls and writes them to a fixture file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = []
+
+    def add(self, path, args, kwargs, seconds, response=None, exception=None):
+        call = {
+            'key': call_key(path, args, kwargs),
+            'seconds': seconds,
+            'response': encode_value(response),
+            'error': None,
+        }
+        if exception is not None:
+            call['error'] = {
+                'type': '%s.%s' % (exception.__class__.__module__, exception.__class__.__name__),
+                'args': encode_value(list(exception.args)),
+            }
+        self.calls.append(call)
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump({'version': FIXTURE_VERSION, 'calls': self.calls}, f, indent=1, default=repr)
+
+
+class RecordingProxy(BindingsProxy):
+    """
+    Bindings proxy that passes calls to the real bindings and records them.
+    """
+
+    def __init__(self, bindings, recorder, path=()):
+        """
+        :type recorder: Recorder
+        """
+        super(RecordingProxy, self).__init__(bindings, path)
+        self.recorder = recorder
+
+    def _child(self, bindings, path):
+        return RecordingProxy(bindings, self.recorder, path)
+
+    def _call(self, path, func, args, kwargs):
+        start = clock()
+        try:
+            response = super(RecordingProxy, self)._call(path, func, args, kwargs)
+        except Exception, e:
+            self.recorder.add(path, args, kwargs, clock() - start, exception=e)
+            raise
+        self.recorder.add(path, args, kwargs, clock() - start, response=response)
+        return response
+
+
+class Fixture(object):
+    """
+    Recorded calls indexed by their arguments. The calls keep the encoded
+    responses, every answer decodes a new copy.
+    """
+
+    def __init__(self, calls):
+        self.__answers = {}
+        self.__served = {}
+        self.__lock = threading.Lock()
+        # dotted paths of the recorded methods
+        self.methods = set()
+        for call in calls:
+            # size of the json encoded response for the bandwidth simulation
+            call['size'] = len(json.dumps(call['response']))
+            self.__answers.setdefault(call['key'], []).append(call)
+            self.methods.add(json.loads(call['key'])[0])
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') not in SUPPORTED_VERSIONS:
+            raise ValueError('Unsupported fixture version in %s' % path)
+        return cls(data['calls'])
+
+    @classmethod
+    def get(cls, path):
+        """
+        Returns the fixture loaded from the file, it's read only on the first
+        call. The replay starts from the first recorded answers again.
+        """
+        fixture = _fixtures.get(path)
+        if fixture is None:
+            fixture = _fixtures[path] = cls.load(path)
+        fixture.restart()
+        return fixture
+
+    def restart(self):
+        """
+        Answer the calls from the first recorded ones again.
+        """
+        with self.__lock:
+            self.__served.clear()
+
+    def answer(self, key):
+        """
+        Returns the next recorded call with the key.
+
+        :raises ReplayMismatch: if no such call was recorded
+        """
+        answers = self.__answers.get(key)
+        if not answers:
+            raise ReplayMismatch('No recorded response for %s' % key)
+        with self.__lock:
+            index = self.__served.get(key, 0)
+            self.__served[key] = index + 1
+        return answers[min(index, len(answers) - 1)]
+
+
+class ReplayBindings(object):
+    """
+    Stand-in for the api bindings that answers calls from a fixture.
+    Attributes are methods if they were recorded as such, otherwise nested
+    bindings objects: replay.organization.organizations() looks up
+    'organization.organizations'.
+    """
+
+    def __init__(self, fixture, latency=0.0, bandwidth=None, path=()):
+        """
+        :type fixture: Fixture
+        :type latency: float
+        :param latency: seconds added to every call
+        :type bandwidth: float
+        :param bandwidth: bytes per second, None for unlimited
+        """
+        self._fixture = fixture
+        self._latency = latency
+        self._bandwidth = bandwidth
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        path = self._path + (name,)
+        if '.'.join(path) in self._fixture.methods:
+            return lambda *args, **kwargs: self._answer(path, args, kwargs)
+        return ReplayBindings(self._fixture, self._latency, self._bandwidth, path)
+
+    def _answer(self, path, args, kwargs):
+        call = self._fixture.answer(call_key(path, args, kwargs))
+        delay = self._latency
+        if self._bandwidth:
+            delay += call['size'] / float(self._bandwidth)
+        if delay > 0:
+            time.sleep(delay)
+
+        error = call['error']
+        if error is not None:
+            error_class = _error_class(error['type']) or ReplayedError
+            raise error_class(*decode_value(error['args']))
+        return decode_value(call['response'])
+
+
+def _env_float(name, default=None):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return float(value)
+
+
+def bindings_from_env(bindings):
+    """
+    Returns bindings for record or replay mode set in the environment
+    (KATELLO_CLI_RECORD, KATELLO_CLI_REPLAY), the bindings unchanged otherwise.
+    """
+    global _recorder
+
+    replay_file = os.environ.get('KATELLO_CLI_REPLAY')
+    if replay_file:
+        return ReplayBindings(Fixture.get(replay_file),
+            _env_float('KATELLO_CLI_REPLAY_LATENCY', 0.0) / 1000,
+            _env_float('KATELLO_CLI_REPLAY_BANDWIDTH'))
+
+    record_file = os.environ.get('KATELLO_CLI_RECORD')
+    if record_file:
+        if _recorder is None:
+            _recorder = Recorder(record_file)
+            atexit.register(_recorder.save)
+        return RecordingProxy(bindings, _recorder)
+
+    return bindings
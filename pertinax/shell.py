@@ -20,8 +20,10 @@ import sys
 from cmd import Cmd
 
 from pertinax.completion import Completion, parse_tokens
+from pertinax.i18n import lazy_gettext
+from pertinax.registry import registry
 from okaara.cli import Command
-from katello.client.lib.utils.encoding import encode_stream, stdout_origin
+from pertinax.encoding import encoded_stdout, raw_stream
 
 
 class Shell(Cmd):
@@ -29,9 +31,9 @@ class Shell(Cmd):
     # maximum length of history file
     HISTORY_LENGTH = 1024
     BUILTIN_COMMANDS = (
-        Command("help", _("print this help"), lambda options: None),
-        Command("quit", _("exit the shell"), lambda options: None),
-        Command("exit", _("exit the shell"), lambda options: None)
+        Command("help", lazy_gettext("print this help"), lambda options: None),
+        Command("quit", lazy_gettext("exit the shell"), lambda options: None),
+        Command("exit", lazy_gettext("exit the shell"), lambda options: None)
     )
 
     cmdqueue = []
@@ -44,11 +46,13 @@ class Shell(Cmd):
 
     def __init__(self, cli, prompt="> ", use_history=True, history_file=None):
         # remove stdout stream encoding while in 'shell' mode, becuase this breaks readline
-        # (autocompletion and shell history). In 'shell' mode the stdout
-        # is encoded just for time necessary for command execution see precmd a postcmd
+        # (autocompletion and shell history). The printer and the prompt write through
+        # the shared encoded output instead, see pertinax.encoding.encoded_stdout
 
-        sys.stdout = stdout_origin
-        self.stdout_with_codec = encode_stream(sys.stdout, "utf-8")
+        sys.stdout = raw_stream(sys.stdout)
+        prompt = getattr(cli, 'prompt', None)
+        if prompt is not None:
+            prompt.output = encoded_stdout()
 
         self.completion_matches = None
         Cmd.__init__(self)
@@ -84,6 +88,10 @@ class Shell(Cmd):
         for cmd in commands_and_sections:
             setattr(self, "do_"+cmd, self.do_command)
 
+        for cmd in self.cli.root_section.commands.values():
+            for alias in getattr(cmd, 'aliases', ()):
+                setattr(self, "do_"+alias, self.do_command)
+
         # add builtin commands into cli command - needed for correct completion
         for cmd in self.BUILTIN_COMMANDS:
             self.cli.add_command(cmd)
@@ -107,8 +115,6 @@ class Shell(Cmd):
         self.cli.run(parse_tokens(args))
 
     def precmd(self, line):
-        # turn on wrapper for encoding stdout
-        sys.stdout = self.stdout_with_codec
         # preprocess the line
         line = line.strip()
         line = self.__history_preprocess(line)
@@ -116,8 +122,8 @@ class Shell(Cmd):
 
 
     def postcmd(self, stop, line):
-        # turn off wrapper for encoding stdout
-        sys.stdout = stdout_origin
+        # write out whatever the command left in the output buffer
+        encoded_stdout().flush()
         # always stay in the command loop (we call sys.exit from exit commands)
         return False
 
@@ -175,8 +181,7 @@ class Shell(Cmd):
         the main command knows what subcommands to run.
         """
         cmd, arg, line = Cmd.parseline(self, line)
-        commands_and_sections = self.cli.root_section.commands.keys() + self.cli.root_section.subsections.keys()
-        if (cmd in commands_and_sections) and (arg != None):
+        if (arg != None) and registry.contains(self.cli.root_section, cmd):
             arg = cmd + " " + arg
         return cmd, arg, line
 
@@ -0,0 +1,93 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# monotonic clock where available, python 2 has only the wall clock
+clock = getattr(time, 'monotonic', time.time)
+
+
+class PhaseTimer(object):
+    """
+    Collects durations of named phases of a command execution.
+    Phases keep the order in which they were first recorded, repeated phases
+    are summed up. Phases can be recorded from multiple threads.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__phases = []
+        self.__durations = {}
+        self.__start = clock()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager that measures the enclosed block as the phase 'name'.
+        """
+        start = clock()
+        try:
+            yield
+        finally:
+            self.add(name, clock() - start)
+
+    def add(self, name, seconds):
+        """
+        Add a duration to a phase.
+
+        :type name: str
+        :param name: name of the phase
+        :type seconds: float
+        :param seconds: duration in seconds
+        """
+        with self.__lock:
+            if name not in self.__durations:
+                self.__phases.append(name)
+                self.__durations[name] = 0.0
+            self.__durations[name] += seconds
+
+    def get(self, name):
+        """
+        Returns the duration of a phase in seconds, 0 if it wasn't recorded.
+        """
+        return self.__durations.get(name, 0.0)
+
+    def phases(self):
+        """
+        :return: list of (phase name, seconds) in the order of recording
+        :rtype: list of tuples
+        """
+        return [(name, self.__durations[name]) for name in self.__phases]
+
+    def elapsed(self):
+        """
+        Returns seconds elapsed since the timer was created.
+        """
+        return clock() - self.__start
+
+    def report(self, output=None):
+        """
+        Print a breakdown of the phases.
+
+        :param output: stream to print to, stderr by default
+        """
+        output = output or sys.stderr
+        output.write("Timings:\n")
+        for name, seconds in self.phases():
+            output.write("  %-20s %10.2f ms\n" % (name, seconds * 1000))
+        output.write("  %-20s %10.2f ms\n" % ('total', self.elapsed() * 1000))
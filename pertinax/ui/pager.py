@@ -0,0 +1,379 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Interactive pager for large outputs. Items are read from the iterator only
+as far as the user scrolls and only the visible ones are formatted. Rendered
+items are kept in a bounded cache, so memory used for the formatted text
+doesn't grow with the size of the output.
+
+Keys:
+    j, down, enter    line down         k, up        line up
+    space, f, pgdown  page down         b, pgup      page up
+    g, home           first item        G, end       last item
+    :N                jump to item N    /TEXT        search forward
+    n                 next match        q            quit
+"""
+
+import os
+import sys
+from collections import OrderedDict
+
+from pertinax.encoding import u_str, encoded_stdout
+from pertinax.lazy import lazy_import
+from pertinax.ui.printer import clip, get_term_height, get_term_width
+
+select = lazy_import('select', globals())
+termios = lazy_import('termios', globals())
+tty = lazy_import('tty', globals())
+
+# number of items used for computing the layout (e.g. column widths)
+LAYOUT_SAMPLE = 100
+# seconds to wait for the rest of an escape sequence, a bare escape key
+# is not followed by anything
+ESCAPE_TIMEOUT = 0.05
+# maximal length of an escape sequence
+ESCAPE_LENGTH = 8
+
+ALT_SCREEN_ON = '\033[?1049h'
+ALT_SCREEN_OFF = '\033[?1049l'
+HOME = '\033[H'
+CLEAR_LINE = '\033[K'
+REVERSE = '\033[7m'
+NORMAL = '\033[0m'
+
+KEYS = {
+    '\033[A': 'up', '\033[B': 'down', '\033[5~': 'page_up', '\033[6~': 'page_down',
+    '\033[H': 'home', '\033[F': 'end', '\033[1~': 'home', '\033[4~': 'end',
+    'k': 'up', 'j': 'down', '\r': 'down', '\n': 'down',
+    'b': 'page_up', ' ': 'page_down', 'f': 'page_down',
+    'g': 'home', 'G': 'end', 'n': 'next', '/': 'search', ':': 'jump', 'q': 'quit',
+}
+
+
+class ItemSource(object):
+    """
+    Items of an iterator read only as far as they are requested.
+    """
+
+    def __init__(self, items):
+        self.__iterator = iter(items)
+        self.__items = []
+        self.exhausted = False
+
+    def get(self, index):
+        """
+        Returns item on the index or None if there are not so many items.
+        """
+        while len(self.__items) <= index and not self.exhausted:
+            try:
+                self.__items.append(next(self.__iterator))
+            except StopIteration:
+                self.exhausted = True
+        if index < len(self.__items):
+            return self.__items[index]
+        return None
+
+    def read_all(self):
+        while not self.exhausted:
+            self.get(len(self.__items))
+
+    def loaded(self):
+        """
+        Returns number of items read so far.
+        """
+        return len(self.__items)
+
+
+class Pager(object):
+    """
+    Shows items formatted by a printer strategy in a scrollable window.
+    The position is kept as (item index, line within the item), so items
+    of variable height (VerboseStrategy) need no global line numbering.
+    """
+
+    def __init__(self, strategy, heading, columns, items, input=None, output=None, cache_size=None):
+        """
+        :type strategy: pertinax.ui.printer.PrinterStrategy
+        :param strategy: strategy that formats the items
+        :type heading: str
+        :param heading: title shown above the items, None for no header
+        :type columns: list of dicts
+        :type items: iterable
+        :param items: list or iterator of items, read lazily
+        :param input: terminal input, stdin by default
+        :param output: terminal output, stdout by default
+        :type cache_size: int
+        :param cache_size: number of rendered items kept, 10 screens by default
+        """
+        self.strategy = strategy
+        self.columns = columns
+        self.source = ItemSource(items)
+        self.input = input or sys.stdin
+        self.output = output or encoded_stdout()
+        self.height = get_term_height()
+        self.width = get_term_width()
+        self.cache_size = cache_size or self.height * 10
+
+        self.source.get(LAYOUT_SAMPLE - 1)
+        sample = [self.source.get(i) for i in xrange(self.source.loaded())]
+        self.layout = strategy.item_layout(columns, sample)
+        self.header = []
+        if heading is not None:
+            self.header = self.__split(strategy.render_header(heading, columns, self.layout))
+
+        self.top = (0, 0)
+        self.pattern = None
+        self.message = None
+        self.__rendered = OrderedDict()
+
+    @classmethod
+    def __split(cls, text):
+        return u_str(text).rstrip(u'\n').split(u'\n')
+
+    def body_height(self):
+        return max(1, self.height - len(self.header) - 1)
+
+    def item_lines(self, index):
+        """
+        Returns rendered lines of an item, None if the item doesn't exist.
+        """
+        if index in self.__rendered:
+            lines = self.__rendered.pop(index)
+        else:
+            item = self.source.get(index)
+            if item is None:
+                return None
+            lines = self.__split(self.strategy.render_item(item, self.columns, self.layout))
+            if len(self.__rendered) >= self.cache_size:
+                self.__rendered.popitem(last=False)
+        self.__rendered[index] = lines
+        return lines
+
+    def visible_lines(self):
+        lines = []
+        index, offset = self.top
+        while len(lines) < self.body_height():
+            item_lines = self.item_lines(index)
+            if item_lines is None:
+                break
+            lines.extend(item_lines[offset:])
+            index, offset = index + 1, 0
+        return lines[:self.body_height()]
+
+    def scroll_down(self, count):
+        index, offset = self.top
+        while count > 0:
+            lines = self.item_lines(index)
+            if lines is None:
+                # no items
+                break
+            remaining = len(lines) - offset - 1
+            if remaining >= count:
+                offset += count
+                break
+            if self.item_lines(index + 1) is None:
+                offset += remaining
+                break
+            count -= remaining + 1
+            index, offset = index + 1, 0
+        self.top = (index, offset)
+
+    def scroll_up(self, count):
+        index, offset = self.top
+        while count > 0:
+            if offset >= count:
+                offset -= count
+                break
+            if index == 0:
+                offset = 0
+                break
+            count -= offset + 1
+            index -= 1
+            offset = len(self.item_lines(index) or ()) - 1
+        self.top = (index, max(0, offset))
+
+    def jump(self, index):
+        """
+        Show the item with the index (numbered from 0) at the top.
+        """
+        index = max(0, index)
+        if self.source.get(index) is None:
+            index = max(0, self.source.loaded() - 1)
+        self.top = (index, 0)
+
+    def end(self):
+        self.source.read_all()
+        last = self.source.loaded() - 1
+        if last < 0:
+            return
+        self.top = (last, max(0, len(self.item_lines(last) or ()) - 1))
+        self.scroll_up(self.body_height() - 1)
+
+    def matches(self, item, pattern):
+        """
+        Tests whether the pattern is in any of the column values. Values are
+        searched raw, without formatting the item.
+        """
+        pattern = pattern.lower()
+        for column in self.columns:
+            value = self.strategy.column_value(column, item)
+            if value is not None and pattern in u_str(value).lower():
+                return True
+        return False
+
+    def search(self, pattern, start):
+        """
+        Move to the first item from 'start' matching the pattern.
+
+        :return: True if a match was found
+        """
+        index = start
+        while True:
+            item = self.source.get(index)
+            if item is None:
+                return False
+            if self.matches(item, pattern):
+                self.top = (index, 0)
+                return True
+            index += 1
+
+    def status(self):
+        first = self.top[0] + 1
+        total = self.source.loaded()
+        text = _('item %(first)d of %(total)s') % {
+            'first': first, 'total': total if self.source.exhausted else '%d+' % total}
+        if self.message:
+            text += u'  ' + self.message
+        return text
+
+    def draw(self):
+        lines = self.header + self.visible_lines()
+        lines += [u''] * (self.height - 1 - len(lines))
+        out = [HOME]
+        for line in lines:
+            out.append(clip(line, self.width) + CLEAR_LINE + u'\n')
+        out.append(REVERSE + clip(self.status(), self.width) + NORMAL + CLEAR_LINE)
+        self.output.write(u''.join(u_str(part) for part in out))
+        self.output.flush()
+
+    def handle(self, action, argument=None):
+        """
+        Perform an action of a key.
+
+        :return: False if the pager should quit
+        """
+        self.message = None
+        page = self.body_height()
+        if action == 'quit':
+            return False
+        elif action == 'down':
+            self.scroll_down(1)
+        elif action == 'up':
+            self.scroll_up(1)
+        elif action == 'page_down':
+            self.scroll_down(page)
+        elif action == 'page_up':
+            self.scroll_up(page)
+        elif action == 'home':
+            self.top = (0, 0)
+        elif action == 'end':
+            self.end()
+        elif action == 'jump' and argument:
+            try:
+                self.jump(int(argument) - 1)
+            except ValueError:
+                self.message = _('not a number: %s') % argument
+        elif action in ('search', 'next'):
+            if argument:
+                self.pattern = argument
+            if self.pattern:
+                start = self.top[0] + (1 if action == 'next' else 0)
+                if not self.search(self.pattern, start):
+                    self.message = _('pattern not found: %s') % self.pattern
+        return True
+
+    def run(self):
+        """
+        Browse the items until the user quits.
+        """
+        fd = self.input.fileno()
+        saved = termios.tcgetattr(fd)
+        try:
+            tty.setcbreak(fd)
+            self.output.write(ALT_SCREEN_ON)
+            while True:
+                self.draw()
+                key = self.read_key()
+                if not key:
+                    # end of the input
+                    break
+                action = KEYS.get(key)
+                argument = None
+                if action in ('search', 'jump'):
+                    argument = self.__read_argument('/' if action == 'search' else ':')
+                if action is not None and not self.handle(action, argument):
+                    break
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+            self.output.write(ALT_SCREEN_OFF)
+            self.output.flush()
+
+    def read_key(self):
+        """
+        Read one key press, a character or an escape sequence.
+
+        :return: the key, empty string at the end of the input
+        """
+        key = self.__read_char()
+        if key == '\033':
+            while len(key) < ESCAPE_LENGTH:
+                char = self.__read_char(ESCAPE_TIMEOUT)
+                if not char:
+                    break
+                key += char
+                # sequences end with a letter or ~, e.g. \033[A or \033[5~
+                if len(key) > 2 and (char.isalpha() or char == '~'):
+                    break
+        return key
+
+    def __read_char(self, timeout=None):
+        """
+        Read one byte of the input, None if nothing comes in timeout seconds.
+        The file descriptor is read directly, buffered data of the input
+        object would be invisible to select.
+        """
+        fd = self.input.fileno()
+        if timeout is not None and not select.select([fd], [], [], timeout)[0]:
+            return None
+        return os.read(fd, 1)
+
+    def __read_argument(self, prompt):
+        """
+        Read a line of text in the status line. Escape cancels the input.
+        """
+        text = ''
+        while True:
+            self.output.write(u'\r' + REVERSE + prompt + text.decode('utf-8', 'replace') + NORMAL + CLEAR_LINE)
+            self.output.flush()
+            char = self.read_key()
+            if char in ('\r', '\n'):
+                return text.decode('utf-8', 'replace')
+            elif char.startswith('\033') or not char:
+                return None
+            elif char in ('\x7f', '\b'):
+                text = text[:-1]
+            else:
+                text += char
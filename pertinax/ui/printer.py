@@ -13,15 +13,19 @@
 # granted to use or replicate Red Hat trademarks that are incorporated
 # in this software or its documentation.
 
-import fcntl
-import termios
-import struct
 import sys
-import unicodedata
-
-
+import threading
+from contextlib import contextmanager
+from itertools import chain, islice
 from math import floor
-from katello.client.lib.utils.encoding import u_str
+from pertinax.encoding import u_str, UnicodeSequenceView
+from pertinax.lazy import lazy_import
+from pertinax.ui.sink import TextBuffer, output_sink
+
+fcntl = lazy_import('fcntl', globals())
+termios = lazy_import('termios', globals())
+struct = lazy_import('struct', globals())
+unicodedata = lazy_import('unicodedata', globals())
 
 
 
@@ -30,9 +34,18 @@ class PrinterStrategy(object):
     Strategy of formatting the data and printing them on the output.
     """
 
-    def __init__(self, output=sys.stdout):
+    def __init__(self, output=None):
+        """
+        :param output: stream or pertinax.ui.sink.OutputSink, stdout by default
+        """
         super(PrinterStrategy, self).__init__()
-        self._output = output
+        self._output = output_sink(output)
+
+    def batch(self):
+        """
+        Returns context manager in which the output is written in bulk.
+        """
+        return self._output.batch()
 
     def print_item(self, heading, columns, item):
         """
@@ -45,7 +58,8 @@ class PrinterStrategy(object):
         :type item: dict
         :param item: data to be printed, one item
         """
-        self.print_items(heading, columns, [item])
+        with self._output.atomic():
+            self.print_items(heading, columns, [item])
 
     def print_items(self, heading, columns, items):
         """
@@ -100,6 +114,51 @@ class PrinterStrategy(object):
             value = item_format_func(item)
         return value
 
+    @classmethod
+    def column_value(cls, column, item):
+        """
+        Returns the value displayed in the column, before it's padded or
+        wrapped by the strategy. For users of the strategy that work with
+        the values, e.g. searching in the pager.
+
+        :type column: dict
+        :param column: column definition
+        :type item: dict
+        :param item: data to get the value from
+        """
+        return cls._get_column_value(column, item)
+
+    def item_layout(self, columns, sample):
+        """
+        Returns layout of the items (e.g. column widths) computed from
+        a sample of them, used for rendering items one by one.
+        """
+        return None
+
+    def render_header(self, heading, columns, layout):
+        """
+        Returns the header as text instead of printing it.
+        """
+        return u''
+
+    def render_item(self, item, columns, layout):
+        """
+        Returns one item formatted as text instead of printing it.
+        """
+        return self._capture(self.print_items, None, columns, [item])
+
+    def _capture(self, func, *args):
+        """
+        Call a printing method and return its output as text.
+        """
+        buf = TextBuffer()
+        previous = self._output.push_buffer(buf)
+        try:
+            func(*args)
+        finally:
+            self._output.pop_buffer(previous)
+        return buf.text()
+
     def _println(self, text=''):
         self._print(text + "\n")
 
@@ -120,11 +179,22 @@ class VerboseStrategy(PrinterStrategy):
         :type items: list of dicts
         :param items: data to be printed, list of items
         """
+        # the header and every item are written in one piece, so the output
+        # of parallel threads doesn't interleave
+        label_width = self._max_label_width(columns)
         if heading is not None:
-            self._print_header(heading)
+            self._print(self.render_header(heading, columns, label_width))
         for item in items:
-            self._print_item(item, columns)
-            self._println()
+            self._print(self.render_item(item, columns, label_width))
+
+    def item_layout(self, columns, sample):
+        return self._max_label_width(columns)
+
+    def render_header(self, heading, columns, layout):
+        return self._capture(self._print_header, heading)
+
+    def render_item(self, item, columns, layout):
+        return self._format_item(item, columns, layout) + u'\n'
 
     def _print_header(self, heading):
         """
@@ -138,7 +208,7 @@ class VerboseStrategy(PrinterStrategy):
         print_line(output=self._output)
 
 
-    def _print_item(self, item, columns):
+    def _print_item(self, item, columns, label_width=None):
         """
         Print one record.
 
@@ -146,8 +216,22 @@ class VerboseStrategy(PrinterStrategy):
         :param item: data to print
         :type columns: list of dicts
         :param columns: columns definition
+        :type label_width: int
+        :param label_width: width of the column labels, computed from the columns if not set
         """
-        self._println()
+        self._print(self._format_item(item, columns, label_width))
+
+    def _format_item(self, item, columns, label_width=None):
+        """
+        Returns one record formatted as text, see _print_item.
+
+        :rtype: unicode
+        """
+        if label_width is None:
+            label_width = self._max_label_width(columns)
+        line_format = u"{0:<" + u_str(label_width) + u"} : {1}"
+
+        lines = [u'']
         for column in columns:
             if not self._column_has_value(column, item):
                 continue
@@ -155,14 +239,14 @@ class VerboseStrategy(PrinterStrategy):
             value = self._get_column_value(column, item)
 
             if not column.get('multiline', False):
-                col_width = self._max_label_width(columns)
-                if not isinstance(value, (list, tuple)):
+                if not isinstance(value, (list, tuple, UnicodeSequenceView)):
                     value = [value]
                 for v in value:
-                    self._println(("{0:<" + u_str(col_width) + "} : {1}").format(u_str(column['name']), u_str(v)))
+                    lines.append(line_format.format(u_str(column['name']), u_str(v)))
             else:
-                self._println(column['name'] + ":")
-                self._println(indent_text(value, "    "))
+                lines.append(u_str(column['name']) + u":")
+                lines.append(u_str(indent_text(value, "    ")))
+        return u'\n'.join(lines) + u'\n'
 
 
     @classmethod
@@ -186,17 +270,27 @@ class GrepStrategy(PrinterStrategy):
     """
     Prints data into a grid that can be grepped easily.
     String to divide the columns can be set optionally.
+
+    Items can be passed also as an iterator (e.g. from pertinax.jsonstream).
+    Then only the first STREAM_SAMPLE items are used to compute the column
+    widths and the rest is printed as it comes.
     """
 
-    def __init__(self, delimiter=None, output=sys.stdout):
+    # number of items used for computing column widths of streamed items
+    STREAM_SAMPLE = 100
+
+    def __init__(self, delimiter=None, output=None, row_cache=None):
         """
         :type delimiter: string
         :param delimiter: delimiter for dividing the grid columns
         :type noheading: boolean
         :param noheading: to suppress headings in the output
+        :type row_cache: pertinax.ui.watch.RowCache
+        :param row_cache: cache of formatted rows kept between runs in the watch mode
         """
         super(GrepStrategy, self).__init__(output)
         self.__delim = delimiter if delimiter else ""
+        self.row_cache = row_cache
 
     def print_items(self, heading, columns, items):
         """
@@ -207,14 +301,46 @@ class GrepStrategy(PrinterStrategy):
         :type columns: list of dicts
         :param columns: definition of columns
         :type items: list of dicts
-        :param items: data to be printed, list of items
-        """
-        column_widths = self._calc_column_widths(items, columns)
+        :param items: data to be printed, list or iterator of items
+        """
+        streamed = not isinstance(items, (list, tuple, UnicodeSequenceView))
+        if streamed:
+            items = iter(items)
+            sample = list(islice(items, self.STREAM_SAMPLE))
+            column_widths = self._calc_column_widths(sample, columns)
+            items = chain(sample, items)
+        else:
+            column_widths = self._calc_column_widths(items, columns)
+
+        # the header and every row are written in one piece, so the output
+        # of parallel threads doesn't interleave
         if heading is not None:
-            self._print_header(heading, columns, column_widths)
-        for item in items:
-            self._print_item(item, columns, column_widths)
-            self._println()
+            self._print(self.render_header(heading, columns, column_widths))
+        for i, item in enumerate(items):
+            self.__print_row(item, columns, column_widths)
+            if streamed and i + 1 == self.STREAM_SAMPLE:
+                # show the first rows while the rest is still being downloaded
+                self._output.flush()
+
+    def __print_row(self, item, columns, column_widths):
+        if self.row_cache is None:
+            self._print(self.render_item(item, columns, column_widths))
+            return
+
+        text = self.row_cache.get(item, column_widths)
+        if text is None:
+            text = self.render_item(item, columns, column_widths)
+            self.row_cache.put(item, column_widths, text)
+        self._print(text)
+
+    def item_layout(self, columns, sample):
+        return self._calc_column_widths(sample, columns)
+
+    def render_header(self, heading, columns, layout):
+        return self._capture(self._print_header, heading, columns, layout)
+
+    def render_item(self, item, columns, layout):
+        return self._format_item(item, columns, layout) + u'\n'
 
     def _print_header(self, heading, columns, column_widths):
         """
@@ -238,7 +364,7 @@ class GrepStrategy(PrinterStrategy):
                 self._print(column['name'] + self.__delim)
             else:
                 self._print(column['name'].ljust(width))
-        print
+        self._println()
         print_line(output=self._output)
 
 
@@ -253,6 +379,17 @@ class GrepStrategy(PrinterStrategy):
         :type column_widths:
         :param column_widths:
         """
+        self._print(self._format_item(item, columns, column_widths))
+
+    def _format_item(self, item, columns, column_widths):
+        """
+        Returns item of a list formatted on single line. The cells are
+        joined here and not written one by one, so that the row can be
+        written to the output in one piece.
+
+        :rtype: unicode
+        """
+        cells = []
         for column in columns:
             #get defined width
             width = column_widths.get(column['attr_name'], 0)
@@ -260,9 +397,9 @@ class GrepStrategy(PrinterStrategy):
             #skip missing attributes
             if not self._column_has_value(column, item):
                 if self.__delim:
-                    self._print(" " * width)
+                    cells.append(" " * width)
                 else:
-                    self._print(self.__delim)
+                    cells.append(self.__delim)
                 continue
             value = self._get_column_value(column, item)
 
@@ -271,9 +408,10 @@ class GrepStrategy(PrinterStrategy):
             value = u_str(value)
 
             if self.__delim:
-                self._print('%s' % (value) + self.__delim)
+                cells.append('%s' % (value) + self.__delim)
             else:
-                self._print('%s%s' % (value, ' '*(width-unicode_len((value)))))
+                cells.append('%s%s' % (value, ' '*(width-unicode_len((value)))))
+        return u''.join(cells)
 
 
     def _column_width(self, items, column):
@@ -315,15 +453,31 @@ class Printer:
     Unified interface for printing data in CLI.
     """
 
-    def __init__(self, strategy=None, noheading=False):
+    def __init__(self, strategy=None, noheading=False, timer=None, output=None, row_cache=None, pager=False):
         """
         :type strategy: PrinterStrategy
         :param strategy: strategy that is used for formatting the output.
+        :type timer: pertinax.timing.PhaseTimer
+        :param timer: timer that measures the 'render' phase, optional
+        :param output: output of the default strategies, stdout by default.
+            Printers of the same output can be used from multiple threads.
+        :type row_cache: pertinax.ui.watch.RowCache
+        :param row_cache: row cache of the default GrepStrategy
+        :type pager: bool
+        :param pager: browse lists of items in the interactive pager
+            when running in a terminal
         """
         self.__printer_strategy = strategy
         self.__columns = []
         self.__heading = ""
         self.__nohead = noheading
+        self.__timer = timer
+        self.__output = output
+        self.__sink = output_sink(output)
+        self.__row_cache = row_cache
+        self.__pager = pager
+        self.__lock = threading.Lock()
+        self.rows_printed = 0
 
     def set_header(self, heading):
         """
@@ -376,19 +530,56 @@ class Printer:
         :param item: data to be printed
         """
         if not self.__printer_strategy:
-            self.set_strategy(VerboseStrategy())
-        self.__printer_strategy.print_item(self.get_header(), self.__filtered_columns(), item)
+            self.set_strategy(VerboseStrategy(output=self.__sink))
+        with self.__render_phase(), self.__printer_strategy.batch():
+            self.__printer_strategy.print_item(self.get_header(), self.__filtered_columns(), item)
+        self.__count(1)
 
     def print_items(self, items):
         """
         Print list of records
 
-        :type items: list of dicts
+        :type items: list or iterator of dicts
         :param items: data to be printed
         """
         if not self.__printer_strategy:
-            self.set_strategy(GrepStrategy())
-        self.__printer_strategy.print_items(self.get_header(), self.__filtered_columns(), items)
+            self.set_strategy(GrepStrategy(output=self.__sink, row_cache=self.__row_cache))
+        if self.__pager and self.__output is None and sys.stdin.isatty() and sys.stdout.isatty():
+            # imported here, the pager module depends on this one
+            from pertinax.ui.pager import Pager
+
+            pager = Pager(self.__printer_strategy, self.get_header(), self.__filtered_columns(), items)
+            pager.run()
+            self.__count(pager.source.loaded())
+            return
+        if isinstance(items, (list, tuple, UnicodeSequenceView)):
+            self.__count(len(items))
+        else:
+            items = self.__count_rows(items)
+        with self.__render_phase(), self.__printer_strategy.batch():
+            self.__printer_strategy.print_items(self.get_header(), self.__filtered_columns(), items)
+
+    def ordered_output(self):
+        """
+        Returns pertinax.ui.sink.OrderedOutput for printing from parallel
+        tasks. Output of the tasks is written in their order, regardless
+        of the order they finish in.
+        """
+        return self.__sink.ordered()
+
+    def __count(self, rows):
+        with self.__lock:
+            self.rows_printed += rows
+
+    def __count_rows(self, items):
+        for item in items:
+            self.__count(1)
+            yield item
+
+    def __render_phase(self):
+        if self.__timer is None:
+            return _no_op()
+        return self.__timer.phase('render')
 
     @classmethod
     def __attr_to_name(cls, attr_name):
@@ -415,6 +606,11 @@ class Printer:
         return filtered
 
 
+@contextmanager
+def _no_op():
+    yield
+
+
 def indent_text(text, indent="\t"):
     """
     Indents given text.
@@ -428,7 +624,7 @@ def indent_text(text, indent="\t"):
     if text is None:
         text = u_str(None)
 
-    if isinstance(text, list):
+    if isinstance(text, (list, UnicodeSequenceView)):
         glue = "\n"+indent
         return indent+glue.join([u_str(l) for l in text])
     else:
@@ -448,7 +644,7 @@ def text_to_line(text, glue=" "):
     if text is None:
         text = u_str(None)
 
-    if isinstance(text, list):
+    if isinstance(text, (list, UnicodeSequenceView)):
         return glue.join(text)
     else:
         return glue.join(text.split("\n"))
@@ -478,17 +674,18 @@ def center_text(text, width=None):
     return "\n".join(centered)
 
 
-def print_line(width=None, output=sys.stdout):
+def print_line(width=None, output=None):
     """
     Prints line of characters '-' to stdout
 
     :type width: int
     :param width: width of the line in characters. If no width is given,
     full terminal size is used.
+    :param output: stream or pertinax.ui.sink.OutputSink, stdout by default
     """
     if not width:
         width = get_term_width()
-    print >> output, '-'*width
+    output_sink(output).write('-'*width + '\n')
 
 
 def get_term_width():
@@ -507,10 +704,39 @@ def get_term_width():
     return 80 if w == 0 else w
 
 
+def get_term_height():
+    """
+    returns terminal height (tested only with Linux)
+
+    :rtype: int
+    """
+    try:
+        h = struct.unpack('HHHH',
+            fcntl.ioctl(0, termios.TIOCGWINSZ,
+            struct.pack('HHHH', 0, 0, 0, 0)))[0]
+        h = int(h)
+    except:  # pylint: disable=W0702
+        h = 24
+    return 24 if h == 0 else h
+
+
 def unicode_len(text):
     """ return byte lenght of unicode character """
     return sum(1+(unicodedata.east_asian_width(c) in "WF") for c in u_str(text))
 
+def clip(line, width):
+    """
+    Cut the line to fit the terminal width, wide characters count twice.
+    """
+    if len(line) * 2 <= width:
+        return line
+    length = 0
+    for i, char in enumerate(line):
+        length += unicode_len(char)
+        if length > width:
+            return line[:i]
+    return line
+
 def batch_add_columns(printer, *cols, **kwargs):
     for c in cols:
         for key in c.keys(): # should only ever be one
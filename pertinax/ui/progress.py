@@ -0,0 +1,80 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import sys
+
+from pertinax.timing import clock
+
+
+class ThroughputProgress(object):
+    """
+    Progress of a long running operation with unknown number of items.
+    Prints the number of processed and failed items and the throughput.
+    On a terminal the line is redrawn in place, otherwise a line is printed
+    every 'interval' seconds.
+    """
+
+    def __init__(self, output=None, interval=0.5):
+        """
+        :param output: stream to print to, stderr by default
+        :type interval: float
+        :param interval: minimal number of seconds between two updates
+        """
+        self.output = output or sys.stderr
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.__start = clock()
+        self.__last_update = None
+        self.__tty = hasattr(self.output, 'isatty') and self.output.isatty()
+
+    def update(self, done=0, failed=0):
+        """
+        Add processed items and redraw the progress if the interval has passed.
+
+        :type done: int
+        :param done: number of newly processed items, including the failed
+        :type failed: int
+        :param failed: number of newly failed items
+        """
+        self.done += done
+        self.failed += failed
+        now = clock()
+        if self.__last_update is None or now - self.__last_update >= self.interval:
+            self.__last_update = now
+            self.__draw()
+
+    def finish(self):
+        self.__draw()
+        if self.__tty:
+            self.output.write('\n')
+        self.output.flush()
+
+    def rate(self):
+        """
+        Returns number of items processed per second.
+        """
+        elapsed = clock() - self.__start
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def __draw(self):
+        line = _('%(done)d processed, %(failed)d failed, %(rate).1f items/s') % \
+            {'done': self.done, 'failed': self.failed, 'rate': self.rate()}
+        if self.__tty:
+            # \033[K clears the rest of the previous line
+            self.output.write('\r' + line + '\033[K')
+        else:
+            self.output.write(line + '\n')
+        self.output.flush()
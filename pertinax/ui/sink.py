@@ -0,0 +1,226 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Thread-safe output of the printer. All writers to a stream share one
+OutputSink (see output_sink), which serializes writes to the stream.
+Text written by a thread inside atomic() or a task of OrderedOutput is
+collected in a buffer of that thread and written to the stream in one
+piece, so rows printed from parallel threads never interleave and no
+lock is taken for the single cells.
+"""
+
+import threading
+import weakref
+from contextlib import contextmanager
+
+from pertinax.encoding import u_str, encoded_stdout
+
+_sinks = weakref.WeakKeyDictionary()
+_sinks_lock = threading.Lock()
+
+
+class _ThreadState(threading.local):
+    # buffer of the innermost buffered block of the thread
+    buffer = None
+
+
+class TextBuffer(object):
+    """
+    Text collected in a buffered block.
+    """
+
+    def __init__(self):
+        self.__parts = []
+
+    def write(self, text):
+        self.__parts.append(text)
+
+    def text(self):
+        return u''.join(u_str(part) for part in self.__parts)
+
+
+class OutputSink(object):
+    """
+    Stream wrapper that can be written to from multiple threads.
+    """
+
+    def __init__(self, output):
+        """
+        :param output: stream the text is written to
+        """
+        self.output = output
+        self.__lock = threading.RLock()
+        self.__state = _ThreadState()
+
+    def write(self, text):
+        buf = self.__state.buffer
+        if buf is None:
+            with self.__lock:
+                self.output.write(text)
+        else:
+            buf.write(text)
+
+    def flush(self):
+        # buffered text is written at the end of its block
+        if self.__state.buffer is None:
+            with self.__lock:
+                self.output.flush()
+
+    @contextmanager
+    def buffered(self):
+        """
+        Context manager that collects text written by this thread inside
+        the block in a TextBuffer instead of writing it out.
+        """
+        buf = TextBuffer()
+        previous = self.push_buffer(buf)
+        try:
+            yield buf
+        finally:
+            self.pop_buffer(previous)
+
+    def push_buffer(self, buf):
+        """
+        Start collecting text written by this thread in the buffer, cheaper
+        than buffered() in hot paths.
+
+        :return: previous buffer, to be passed to pop_buffer
+        """
+        state = self.__state
+        previous, state.buffer = state.buffer, buf
+        return previous
+
+    def pop_buffer(self, previous):
+        self.__state.buffer = previous
+
+    @contextmanager
+    def atomic(self):
+        """
+        Context manager whose output is written as one piece at the end of
+        the block. Nested blocks become part of the enclosing one.
+        """
+        with self.buffered() as buf:
+            yield self
+        text = buf.text()
+        if text:
+            self.write(text)
+
+    @contextmanager
+    def batch(self):
+        """
+        Returns context manager in which the output is written in bulk,
+        if the stream supports it.
+        """
+        batch = getattr(self.output, 'batch', None)
+        if batch is None:
+            yield self
+            return
+        with self.__lock:
+            context = batch()
+            context.__enter__()
+        try:
+            yield self
+        finally:
+            with self.__lock:
+                context.__exit__(None, None, None)
+
+    def ordered(self):
+        """
+        Returns OrderedOutput for tasks writing to this sink.
+        """
+        return OrderedOutput(self)
+
+
+class OrderedOutput(object):
+    """
+    Output of tasks running in parallel, written in the order of the tasks
+    regardless of the order they finish in:
+
+        ordered = sink.ordered()
+        def work(index):
+            with ordered.task(index):
+                printer.print_item(items[index])
+        ...
+        ordered.close()
+    """
+
+    def __init__(self, sink):
+        """
+        :type sink: OutputSink
+        """
+        self.sink = sink
+        self.__lock = threading.Lock()
+        self.__finished = {}
+        self.__next = 0
+        self.__closed = False
+
+    @contextmanager
+    def task(self, index):
+        """
+        Context manager for the output of one task. The output is written
+        when all the previous tasks finished, even if the task fails.
+
+        :type index: int
+        :param index: order of the task, numbered from 0
+        """
+        try:
+            with self.sink.buffered() as buf:
+                yield self.sink
+        finally:
+            self.__finish(index, buf.text())
+
+    def __finish(self, index, text):
+        with self.__lock:
+            if self.__closed:
+                self.sink.write(text)
+                return
+            self.__finished[index] = text
+            while self.__next in self.__finished:
+                self.sink.write(self.__finished.pop(self.__next))
+                self.__next += 1
+
+    def close(self):
+        """
+        Write the output of all finished tasks. Tasks that haven't finished
+        (e.g. after a timeout) are skipped, their output is written as soon
+        as they finish.
+        """
+        with self.__lock:
+            for index in sorted(self.__finished):
+                self.sink.write(self.__finished[index])
+            self.__finished.clear()
+            self.__closed = True
+        self.sink.flush()
+
+
+def output_sink(output=None):
+    """
+    Returns the sink shared by all writers to the output, the standard
+    output by default.
+    """
+    if output is None:
+        output = encoded_stdout()
+    if isinstance(output, OutputSink):
+        return output
+    with _sinks_lock:
+        try:
+            sink = _sinks.get(output)
+        except TypeError:
+            # the stream can't be referenced weakly, it won't be shared
+            return OutputSink(output)
+        if sink is None:
+            sink = _sinks[output] = OutputSink(output)
+        return sink
@@ -0,0 +1,148 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+"""
+Support for the --watch mode of commands: the output of every run is
+collected in a FrameBuffer and the WatchScreen rewrites only the lines
+of the terminal that differ from the previous run. Rows of GrepStrategy
+tables are cached in a RowCache by a key column, so rows whose data
+didn't change are not formatted again.
+"""
+
+from pertinax.encoding import u_str
+from pertinax.ui.printer import clip, get_term_height, get_term_width
+
+# ANSI control sequences
+HOME = '\033[H'
+CLEAR_SCREEN = '\033[2J'
+CLEAR_LINE = '\033[K'
+CLEAR_BELOW = '\033[J'
+
+
+def move_to(row):
+    """
+    Returns control sequence that moves the cursor to the beginning of a row
+    (numbered from 0).
+    """
+    return '\033[%d;1H' % (row + 1)
+
+
+class FrameBuffer(object):
+    """
+    Output stream that collects the text of one run.
+    """
+
+    def __init__(self):
+        self.__parts = []
+
+    def write(self, text):
+        self.__parts.append(u_str(text))
+
+    def flush(self):
+        pass
+
+    def lines(self):
+        return u''.join(self.__parts).split(u'\n')
+
+
+class RowCache(object):
+    """
+    Formatted table rows by the value of the key column. A row is reused
+    while its item and the column widths stay the same.
+    """
+
+    def __init__(self, key_column='id'):
+        self.key_column = key_column
+        self.__rows = {}
+        self.hits = 0
+
+    def get(self, item, column_widths):
+        """
+        Returns the formatted row or None if it has to be formatted.
+        """
+        key = item.get(self.key_column)
+        if key is None:
+            return None
+        cached = self.__rows.get(key)
+        if cached is None or cached[0] != item or cached[1] != column_widths:
+            return None
+        self.hits += 1
+        return cached[2]
+
+    def put(self, item, column_widths, text):
+        key = item.get(self.key_column)
+        if key is not None:
+            self.__rows[key] = (dict(item), dict(column_widths), text)
+
+
+class WatchScreen(object):
+    """
+    Terminal screen that shows the frames of the watch mode. The first frame
+    clears the screen, the following ones rewrite only the changed lines.
+    Lines are cut to the terminal width and the frame to its height, so that
+    no line wraps and the screen never scrolls, otherwise the rows
+    the cursor is moved to wouldn't match the lines.
+    """
+
+    def __init__(self, output, width=None, height=None):
+        """
+        :param output: stream connected to the terminal
+        :type width: int
+        :param width: terminal width, read from the terminal for every frame by default
+        :type height: int
+        :param height: terminal height, read from the terminal for every frame by default
+        """
+        self.output = output
+        self.width = width
+        self.height = height
+        self.__lines = None
+        self.__size = None
+
+    def fit(self, lines):
+        """
+        Returns the lines of a frame cut to the screen size. The last row
+        is left for the cursor.
+
+        :type lines: list of unicode
+        """
+        width = self.width or get_term_width()
+        height = self.height or get_term_height()
+        self.__resize((width, height))
+        return [clip(line, width) for line in lines[:max(1, height - 1)]]
+
+    def __resize(self, size):
+        if size != self.__size:
+            # the terminal has rewrapped the old lines, start from a clear screen
+            self.__size = size
+            self.__lines = None
+
+    def show(self, lines):
+        """
+        :type lines: list of unicode
+        :param lines: lines of the new frame
+        """
+        lines = self.fit(lines)
+        previous = self.__lines
+        if previous is None:
+            self.output.write(HOME + CLEAR_SCREEN + u'\n'.join(lines))
+        else:
+            for i, line in enumerate(lines):
+                if i >= len(previous) or previous[i] != line:
+                    self.output.write(move_to(i) + line + CLEAR_LINE)
+            if len(lines) < len(previous):
+                self.output.write(move_to(len(lines)) + CLEAR_BELOW)
+        self.output.write(move_to(len(lines)))
+        self.output.flush()
+        self.__lines = lines
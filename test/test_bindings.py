@@ -0,0 +1,153 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import threading
+import time
+import unittest
+
+from pertinax.bindings import CoalescingBindings, RequestCoalescer, call_key
+
+
+class Repositories(object):
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+        self.delay = 0
+
+    def __record(self, name, *args):
+        with self.lock:
+            self.calls.append((name,) + args)
+        time.sleep(self.delay)
+
+    def repository(self, repo_id, details=None):
+        self.__record('repository', repo_id)
+        return {'id': repo_id, 'notes': {}}
+
+    def get_status(self, repo_id):
+        self.__record('get_status', repo_id)
+        return {'id': repo_id}
+
+    def delete(self, repo_id):
+        self.__record('delete', repo_id)
+
+
+class Bindings(object):
+
+    def __init__(self):
+        self.repo = Repositories()
+
+
+class RequestCoalescerTest(unittest.TestCase):
+
+    def test_owner_gets_the_result_itself(self):
+        value = {'id': 1}
+        coalescer = RequestCoalescer()
+        self.assertTrue(coalescer.call('key', lambda: value) is value)
+        memoized = coalescer.call('key', lambda: None)
+        self.assertEqual(memoized, value)
+        self.assertFalse(memoized is value)
+        self.assertEqual(coalescer.saved, 1)
+
+    def test_owner_changes_dont_reach_the_memo(self):
+        coalescer = RequestCoalescer()
+        coalescer.call('key', lambda: {'id': 1})['id'] = 2
+        self.assertEqual(coalescer.call('key', lambda: None), {'id': 1})
+
+    def test_memo_is_bounded(self):
+        coalescer = RequestCoalescer(max_results=2)
+        for key in 'abc':
+            coalescer.call(key, lambda: key)
+        # 'a' was dropped
+        self.assertEqual(coalescer.call('a', lambda: 'again'), 'again')
+        self.assertEqual(coalescer.call('c', lambda: 'again'), 'c')
+
+    def test_unpicklable_results_are_not_memoized(self):
+        coalescer = RequestCoalescer()
+        lock = threading.Lock()
+        self.assertTrue(coalescer.call('key', lambda: lock) is lock)
+        self.assertEqual(coalescer.call('key', lambda: 'again'), 'again')
+
+    def test_concurrent_calls_coalesce(self):
+        coalescer = RequestCoalescer()
+        calls = []
+        results = []
+
+        def func():
+            calls.append(1)
+            time.sleep(0.1)
+            return [1, 2]
+
+        threads = [threading.Thread(target=lambda: results.append(coalescer.call('key', func))) for _i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [[1, 2]] * 8)
+        # every caller got its own list
+        self.assertEqual(len(set(id(result) for result in results)), 8)
+        self.assertEqual(coalescer.saved, 7)
+
+    def test_failures_are_not_memoized(self):
+        coalescer = RequestCoalescer()
+
+        def fail():
+            raise ValueError('failed')
+        self.assertRaises(ValueError, coalescer.call, 'key', fail)
+        self.assertEqual(coalescer.call('key', lambda: 'ok'), 'ok')
+
+
+class CoalescingBindingsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bindings = Bindings()
+        self.api = CoalescingBindings(self.bindings, RequestCoalescer(), read_only=['repo.repository'])
+
+    def test_read_only_calls_are_coalesced(self):
+        self.api.repo.repository('a', details={'x': 1, 'y': 2})
+        self.api.repo.repository('a', details={'y': 2, 'x': 1})
+        self.api.repo.repository('b')
+        self.assertEqual(self.bindings.repo.calls, [('repository', 'a'), ('repository', 'b')])
+
+    def test_unlisted_methods_are_not_coalesced(self):
+        # a get_ prefix doesn't make a method read-only
+        self.api.repo.get_status('a')
+        self.api.repo.get_status('a')
+        self.assertEqual(len(self.bindings.repo.calls), 2)
+
+    def test_other_calls_clear_the_memo(self):
+        self.api.repo.repository('a')
+        self.api.repo.delete('a')
+        self.api.repo.repository('a')
+        self.assertEqual([call[0] for call in self.bindings.repo.calls], ['repository', 'delete', 'repository'])
+
+    def test_nothing_is_coalesced_by_default(self):
+        api = CoalescingBindings(self.bindings, RequestCoalescer())
+        api.repo.repository('a')
+        api.repo.repository('a')
+        self.assertEqual(len(self.bindings.repo.calls), 2)
+
+    def test_call_key(self):
+        self.assertEqual(call_key(('repo', 'repository'), (), {'a': {'x': 1, 'y': 2}}),
+            call_key(('repo', 'repository'), (), {'a': {'y': 2, 'x': 1}}))
+        self.assertNotEqual(call_key(('repo', 'repository'), ('a',), {}),
+            call_key(('repo', 'repository'), ('b',), {}))
+        # binary strings fall back to repr
+        self.assertNotEqual(call_key(('repo',), ('\xff',), {}), call_key(('repo',), ('\xfe',), {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import json
+import random
+import threading
+import time
+import unittest
+from StringIO import StringIO
+
+from pertinax.bulk import PertinaxBulkCommand, read_records
+from pertinax.config import CompiledConfig
+from pertinax.ui.printer import Printer
+
+
+class Context(object):
+
+    def __init__(self, workers=4):
+        self.config = CompiledConfig()
+        self.config.add_section('concurrency')
+        self.config.set('concurrency', 'workers', str(workers))
+
+    def get_concurrency_controller(self):
+        return None
+
+
+class SlowFirstItem(PertinaxBulkCommand):
+    name = 'test_slow_first_item'
+
+    def __init__(self, context):
+        # the parser is not needed to process records
+        self.context = context
+        self.printer = None
+        self.started = []
+        self.release = threading.Event()
+
+    def run_item(self, record):
+        self.started.append(record)
+        if record == u'slow':
+            self.release.wait(5)
+        if record == u'bad':
+            raise ValueError('bad record')
+        return record.upper()
+
+
+class Bulk(PertinaxBulkCommand):
+    name = 'test_bulk'
+    bulk_size = 2
+
+    def __init__(self, context):
+        self.context = context
+        self.printer = None
+        self.groups = []
+
+    def run_bulk(self, records):
+        self.groups.append(records)
+        return [len(record) for record in records]
+
+
+class Printing(PertinaxBulkCommand):
+    name = 'test_printing'
+
+    def __init__(self, context, output):
+        self.context = context
+        self.printer = Printer(output=output, noheading=True)
+        self.printer.add_column('name')
+
+    def run_item(self, record):
+        time.sleep(random.random() / 50)
+        self.printer.print_items([{'name': 'printed-' + record}])
+        return record
+
+
+def report_entries(report):
+    return [json.loads(line) for line in report.getvalue().splitlines()]
+
+
+class BulkCommandTest(unittest.TestCase):
+
+    def test_report_in_input_order(self):
+        command = SlowFirstItem(Context())
+        records = read_records(StringIO('slow\na\n{bad json\nbad\nb\n'))
+        threading.Timer(0.2, command.release.set).start()
+        report = StringIO()
+        self.assertEqual(command.process(records, report), 2)
+        entries = report_entries(report)
+        self.assertEqual([entry['item'] for entry in entries], ['slow', 'a', None, 'bad', 'b'])
+        self.assertEqual([entry['ok'] for entry in entries], [True, True, False, False, True])
+        self.assertEqual(entries[1]['result'], 'A')
+        self.assertEqual(entries[3]['error'], 'bad record')
+
+    def test_slow_item_doesnt_hold_back_the_calls(self):
+        command = SlowFirstItem(Context())
+        records = [u'slow'] + [u'item%d' % i for i in range(20)]
+        report = StringIO()
+        thread = threading.Thread(target=command.process, args=(records, report))
+        thread.start()
+        try:
+            deadline = time.time() + 2
+            while len(command.started) < len(records) and time.time() < deadline:
+                time.sleep(0.01)
+            # all the other records were processed while the first one was running
+            self.assertEqual(len(command.started), len(records))
+            self.assertEqual(report.getvalue(), '')
+        finally:
+            command.release.set()
+            thread.join()
+        self.assertEqual(len(report_entries(report)), len(records))
+
+    def test_bulk_groups(self):
+        command = Bulk(Context())
+        records = read_records(StringIO('a\nbb\n{bad\nccc\n'))
+        report = StringIO()
+        self.assertEqual(command.process(records, report), 1)
+        self.assertEqual(command.groups, [[u'a', u'bb'], [u'ccc']])
+        self.assertEqual([entry.get('result') for entry in report_entries(report)], [1, 2, None, 3])
+
+    def test_printed_output_in_record_order(self):
+        output = StringIO()
+        records = [u'r%02d' % i for i in range(30)]
+        self.assertEqual(Printing(Context(8), output).process(records, output), 0)
+        lines = output.getvalue().splitlines()
+        printed = [line.strip() for line in lines if line.startswith('printed-')]
+        reported = [json.loads(line)['item'] for line in lines if line.startswith('{')]
+        self.assertEqual(len(printed) + len(reported), len(lines))
+        self.assertEqual(printed, ['printed-' + record for record in records])
+        self.assertEqual(reported, records)
+
+    def test_missing_method(self):
+        self.assertRaises(TypeError, type(PertinaxBulkCommand), 'NoRunItem', (PertinaxBulkCommand,), {})
+        self.assertRaises(TypeError, type(PertinaxBulkCommand), 'NoRunBulk', (PertinaxBulkCommand,),
+            {'bulk_size': 10, 'run_item': lambda self, record: record})
+
+
+if __name__ == '__main__':
+    unittest.main()
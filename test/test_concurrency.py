@@ -0,0 +1,179 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import random
+import threading
+import time
+import unittest
+
+from pertinax.concurrency import AimdController, CallTimeout, fan_out, fan_out_iter
+
+
+class InFlight(object):
+    """
+    Call that records the maximal number of calls running at once and the
+    threads it ran in.
+    """
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.current = 0
+        self.maximum = 0
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def __call__(self, item):
+        with self.lock:
+            self.current += 1
+            self.maximum = max(self.maximum, self.current)
+            self.threads.add(threading.current_thread().name)
+        try:
+            time.sleep(self.delay if item is None else item)
+            return item
+        finally:
+            with self.lock:
+                self.current -= 1
+
+
+class FanOutTest(unittest.TestCase):
+
+    def test_results_in_order(self):
+        items = [random.random() / 50 for _i in range(40)]
+        result = fan_out(InFlight(), items, workers=8)
+        self.assertTrue(result.ok())
+        self.assertEqual(result.results, items)
+
+    def test_failures_in_order(self):
+        def call(item):
+            if item % 3 == 0:
+                raise ValueError(item)
+            return item * 2
+        result = fan_out(call, range(10), workers=4)
+        self.assertEqual([item for item, _e in result.failures], [0, 3, 6, 9])
+        self.assertEqual(result.results[1], 2)
+        self.assertEqual(len(result.errors), 4)
+
+    def test_fixed_pool(self):
+        call = InFlight()
+        fan_out(call, [None] * 50, workers=4)
+        self.assertEqual(call.maximum, 4)
+        self.assertEqual(len(call.threads), 4)
+
+    def test_controller_limit(self):
+        call = InFlight()
+        controller = AimdController(initial=2, maximum=2)
+        fan_out(call, [None] * 20, workers=8, controller=controller)
+        self.assertEqual(call.maximum, 2)
+        self.assertEqual(len(controller.latencies), 20)
+
+    def test_empty(self):
+        result = fan_out(InFlight(), [])
+        self.assertTrue(result.ok())
+        self.assertEqual(result.results, [])
+
+    def test_timed_out_call_holds_its_worker(self):
+        call = InFlight()
+        result = fan_out(call, [0.3, 0], workers=1, timeout=0.2)
+        self.assertTrue(isinstance(result.exception(0), CallTimeout))
+        self.assertEqual(result.results[1], 0)
+        # the second call waited for the first one to return
+        self.assertEqual(call.maximum, 1)
+
+    def test_stuck_workers_fail_the_rest(self):
+        release = threading.Event()
+
+        def call(item):
+            if item == 0:
+                release.wait(10)
+            return item
+        try:
+            start = time.time()
+            result = fan_out(call, range(3), workers=1, timeout=0.2)
+            self.assertTrue(time.time() - start < 2)
+            self.assertEqual([item for item, _e in result.failures], [0, 1, 2])
+            self.assertTrue(all(isinstance(e, CallTimeout) for _item, e in result.failures))
+        finally:
+            release.set()
+
+
+
+class FanOutIterTest(unittest.TestCase):
+
+    def test_ordered_stream(self):
+        items = [random.random() / 50 for _i in range(30)]
+        outcomes = list(fan_out_iter(InFlight(), iter(items), workers=4))
+        self.assertEqual([item for item, _value, _e in outcomes], items)
+        self.assertEqual([value for _item, value, _e in outcomes], items)
+
+    def test_window_limits_read_ahead(self):
+        read = []
+
+        def items():
+            for i in range(100):
+                read.append(i)
+                yield 0.5 if i == 0 else 0
+        outcomes = fan_out_iter(InFlight(), items(), workers=4, window=10)
+        next(outcomes)
+        # the first item held back the rest of the window only
+        self.assertTrue(len(read) <= 12)
+        self.assertEqual(len(list(outcomes)), 99)
+
+
+class AimdControllerTest(unittest.TestCase):
+
+    def test_additive_increase(self):
+        controller = AimdController(initial=2, maximum=4)
+        # about one per round of calls: 2 + 1/2 + 1/2.5 + 1/2.9
+        for _i in range(3):
+            controller.record(0.01)
+        self.assertEqual(controller.limit(), 3)
+        for _i in range(100):
+            controller.record(0.01)
+        self.assertEqual(controller.limit(), 4)
+
+    def test_overload_cuts_the_limit_once_per_call_duration(self):
+        controller = AimdController(initial=8, maximum=8)
+        controller.record(10, CallTimeout())
+        self.assertEqual(controller.limit(), 4)
+        # the other calls of the same burst don't cut it again
+        controller.record(10, CallTimeout())
+        self.assertEqual(controller.limit(), 4)
+
+    def test_slow_calls_count_as_overload(self):
+        controller = AimdController(initial=8, maximum=8, target_latency=1)
+        controller.record(0)
+        controller.record(2)
+        self.assertEqual(controller.limit(), 4)
+
+    def test_minimum(self):
+        controller = AimdController(initial=2, minimum=2, maximum=8)
+        controller.record(0, CallTimeout())
+        self.assertEqual(controller.limit(), 2)
+
+    def test_other_errors_dont_change_the_limit(self):
+        controller = AimdController(initial=4, maximum=8, classify=lambda e: isinstance(e, IOError))
+        controller.record(0.01, ValueError())
+        self.assertEqual(controller.limit(), 4)
+        controller.record(0.01, IOError())
+        self.assertEqual(controller.limit(), 2)
+
+    def test_summary(self):
+        controller = AimdController(initial=2, maximum=2)
+        self.assertTrue('no calls' in controller.summary())
+        controller.record(0.5)
+        self.assertTrue('1 calls' in controller.summary())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import unittest
+
+from pertinax.config import CompiledConfig, atomic_write, files_key, load_cached, save_cached
+
+
+class CompiledConfigTest(unittest.TestCase):
+
+    def setUp(self):
+        self.config = CompiledConfig()
+        self.config.add_section('s')
+
+    def test_typed_getters_dont_share_cached_values(self):
+        self.config.set('s', 'o', 'no')
+        self.assertEqual(self.config.get_str('s', 'o', None), 'no')
+        self.assertEqual(self.config.get_bool('s', 'o', None), False)
+        self.assertEqual(self.config.get_str('s', 'o', None), 'no')
+
+    def test_int_and_str_of_the_same_option(self):
+        self.config.set('s', 'o', '42')
+        self.assertEqual(self.config.get_int('s', 'o'), 42)
+        self.assertEqual(self.config.get_str('s', 'o'), '42')
+
+    def test_default_of_missing_option(self):
+        self.assertEqual(self.config.get_int('s', 'missing', 7), 7)
+        self.assertEqual(self.config.get_bool('s', 'missing'), False)
+
+    def test_cache_is_cleared_on_set(self):
+        self.config.set('s', 'o', 'yes')
+        self.assertTrue(self.config.get_bool('s', 'o'))
+        self.config.set('s', 'o', 'off')
+        self.assertFalse(self.config.get_bool('s', 'o'))
+
+    def test_dump_and_load(self):
+        self.config.set('s', 'o', 'value')
+        loaded = CompiledConfig()
+        loaded.load(self.config.dump())
+        self.assertEqual(loaded.get_str('s', 'o'), 'value')
+
+
+class FileHelpersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'file')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_atomic_write(self):
+        atomic_write(self.path, 'old')
+        atomic_write(self.path, ['new ', 'content'], 0600)
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'new content')
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0600)
+        self.assertEqual(os.listdir(self.directory), ['file'])
+
+    def test_atomic_write_failure_leaves_no_temporary_file(self):
+        os.mkdir(self.path)
+        self.assertRaises(OSError, atomic_write, self.path, 'data')
+        self.assertEqual(os.listdir(self.directory), ['file'])
+
+    def test_concurrent_writers(self):
+        contents = [str(i) * 100000 for i in range(8)]
+        threads = [threading.Thread(target=atomic_write, args=(self.path, content)) for content in contents]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with open(self.path) as f:
+            self.assertTrue(f.read() in contents)
+        self.assertEqual(os.listdir(self.directory), ['file'])
+
+    def test_cached_data(self):
+        path = os.path.join(self.directory, 'cache', 'data.cache')
+        key = files_key([self.path])
+        self.assertEqual(key, [])
+        atomic_write(self.path, 'source')
+        key = files_key([self.path])
+        self.assertEqual(load_cached(path, 1, key), None)
+        save_cached(path, 1, key, {'a': [1, 2]})
+        self.assertEqual(load_cached(path, 1, key), {'a': [1, 2]})
+        self.assertEqual(load_cached(path, 2, key), None)
+        self.assertEqual(load_cached(path, 1, []), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import tempfile
+import threading
+import unittest
+
+from pertinax import encoding
+from pertinax.encoding import EncodedOutput, UnicodeMappingView, UnicodeSequenceView, encode_stream, u_view
+
+
+class RawStream(object):
+    """
+    Byte stream that records the writes.
+    """
+
+    def __init__(self, tty=False):
+        self.writes = []
+        self.tty = tty
+
+    def write(self, data):
+        self.writes.append(data)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return self.tty
+
+    def getvalue(self):
+        return ''.join(self.writes)
+
+
+class EncodedOutputTest(unittest.TestCase):
+
+    def test_buffered_until_flush(self):
+        raw = RawStream()
+        output = EncodedOutput(raw)
+        output.write(u'žluťoučký ')
+        output.write('kůň')
+        self.assertEqual(raw.writes, [])
+        output.flush()
+        self.assertEqual(raw.getvalue(), 'žluťoučký kůň')
+
+    def test_terminal_is_flushed_except_in_batch(self):
+        raw = RawStream(tty=True)
+        output = EncodedOutput(raw)
+        output.write(u'a')
+        self.assertEqual(raw.getvalue(), 'a')
+        with output.batch():
+            output.write(u'b')
+            output.write(u'c')
+            self.assertEqual(raw.getvalue(), 'a')
+        self.assertEqual(raw.writes, ['a', 'bc'])
+
+    def test_stderr_is_unbuffered_when_redirected(self):
+        with tempfile.TemporaryFile() as f:
+            output = encode_stream(f, autoflush=True)
+            output.write(u'chyba\n')
+            f.seek(0)
+            self.assertEqual(f.read(), 'chyba\n')
+
+    def test_one_exit_hook_for_all_outputs(self):
+        outputs = [EncodedOutput(RawStream()) for _i in xrange(3)]
+        for output in outputs:
+            output.write(u'x')
+        self.assertTrue(encoding._flush_registered)
+        encoding._flush_outputs()
+        self.assertEqual([o.raw.getvalue() for o in outputs], ['x', 'x', 'x'])
+
+    def test_collected_output_is_flushed(self):
+        raw = RawStream()
+        output = EncodedOutput(raw)
+        output.write(u'left in the buffer')
+        del output
+        self.assertEqual(raw.getvalue(), 'left in the buffer')
+
+    def test_concurrent_writes(self):
+        raw = RawStream()
+        output = EncodedOutput(raw, buffer_size=64)
+
+        def write(char):
+            for _i in xrange(1000):
+                output.write(char * 10 + u'\n')
+
+        threads = [threading.Thread(target=write, args=(c,)) for c in u'abcd']
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        output.flush()
+        lines = raw.getvalue().splitlines()
+        self.assertEqual(len(lines), 4000)
+        for line in lines:
+            self.assertEqual(line, line[0] * 10)
+
+
+
+class UnicodeViewTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = {'name': 'caf\xc3\xa9', 'tags': ['a', 'b\xc3\xa9'], 'count': 3, 'nested': {'key': 'value'}}
+        self.view = u_view(self.data)
+
+    def test_strings_become_unicode(self):
+        self.assertEqual(self.view['name'], u'caf\xe9')
+        self.assertTrue(isinstance(self.view['nested']['key'], unicode))
+        self.assertEqual(list(self.view['tags']), [u'a', u'b\xe9'])
+        self.assertEqual(self.view['count'], 3)
+        self.assertEqual(sorted(self.view), [u'count', u'name', u'nested', u'tags'])
+
+    def test_views_of_containers(self):
+        self.assertTrue(isinstance(self.view, UnicodeMappingView))
+        self.assertTrue(isinstance(self.view['tags'], UnicodeSequenceView))
+        self.assertTrue(u_view(self.view) is self.view)
+
+    def test_converted_once_and_lazily(self):
+        self.assertTrue(self.view['nested'] is self.view['nested'])
+        # the data are not copied or changed
+        self.assertEqual(self.data['name'], 'caf\xc3\xa9')
+
+    def test_sequence_indexes(self):
+        tags = self.view['tags']
+        self.assertEqual(tags[-1], u'b\xe9')
+        self.assertEqual(list(tags[1:]), [u'b\xe9'])
+        self.assertEqual(len(tags), 2)
+        self.assertRaises(IndexError, tags.__getitem__, 2)
+        self.assertRaises(IndexError, tags.__getitem__, -3)
+        self.assertRaises(IndexError, u_view([1, 2, 3]).__getitem__, -5)
+
+    def test_non_ascii_keys(self):
+        view = u_view({'caf\xc3\xa9': 'x', u'tea': 'y'})
+        self.assertEqual(sorted(view.items()), [(u'caf\xe9', u'x'), (u'tea', u'y')])
+        self.assertEqual(view[u'caf\xe9'], u'x')
+        self.assertEqual(view['caf\xc3\xa9'], u'x')
+        self.assertTrue(u'caf\xe9' in view)
+        self.assertFalse(u'other' in view)
+        self.assertRaises(KeyError, view.__getitem__, u'other')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from StringIO import StringIO
+
+from pertinax.httpcache import CacheEntry, CachingConnection, ResponseCache
+
+
+class CountingCache(ResponseCache):
+
+    evictions = 0
+
+    def evict(self):
+        self.evictions += 1
+        ResponseCache.evict(self)
+
+
+class Response(object):
+
+    def __init__(self, status, body, headers):
+        self.status = status
+        self.reason = 'OK'
+        self.body = StringIO(body)
+        self.headers = headers
+
+    def read(self, amt=None):
+        return self.body.read() if amt is None else self.body.read(amt)
+
+    def getheader(self, name, default=None):
+        return dict(self.headers).get(name.lower(), default)
+
+    def getheaders(self):
+        return list(self.headers)
+
+
+class Connection(object):
+    host = 'localhost'
+    port = 443
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+
+    def request(self, method, url, body=None, headers=None):
+        self.requests.append((method, url, headers))
+
+    def getresponse(self):
+        return self.responses.pop(0)
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def entry(self, size):
+        return CacheEntry(200, 'OK', [('etag', '"1"')], 'x' * size)
+
+    def test_concurrent_stores_of_one_key(self):
+        cache = ResponseCache(os.path.join(self.directory, 'http'))
+        bodies = [str(i) * 200000 for i in range(8)]
+
+        def store(body):
+            for _i in range(5):
+                cache.store('key', CacheEntry(200, 'OK', [], body))
+                cache.count_miss()
+        threads = [threading.Thread(target=store, args=(body,)) for body in bodies]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(cache.lookup('key').body in bodies)
+        self.assertEqual(os.listdir(cache.directory), ['key.response'])
+        self.assertEqual(cache.misses, 40)
+
+    def test_evicts_only_over_the_limit(self):
+        cache = CountingCache(self.directory, max_size=5000)
+        for i in range(20):
+            cache.store('key%d' % i, self.entry(100))
+        # the first store scans the directory to learn its size
+        self.assertEqual(cache.evictions, 1)
+        for i in range(200):
+            cache.store('more%d' % i, self.entry(100))
+        self.assertTrue(cache.evictions <= 40)
+        names = os.listdir(self.directory)
+        self.assertTrue(sum(os.path.getsize(os.path.join(self.directory, name)) for name in names) <= 5000)
+        # the least recently used entries were removed
+        self.assertFalse(any(name.startswith('key') for name in names))
+
+    def test_lookup(self):
+        cache = ResponseCache(self.directory)
+        cache.store('key', self.entry(10))
+        self.assertEqual(cache.lookup('key').body, 'x' * 10)
+        self.assertEqual(cache.lookup('key').header('etag'), '"1"')
+        self.assertEqual(cache.lookup('missing'), None)
+
+
+class CachingConnectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ResponseCache(self.directory, max_entry_size=1000)
+        self.connection = Connection()
+        self.caching = CachingConnection(self.connection, self.cache)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get(self, response):
+        self.connection.responses.append(response)
+        self.caching.request('GET', '/api/items')
+        return self.caching.getresponse()
+
+    def test_revalidated_response_from_cache(self):
+        self.assertEqual(self.get(Response(200, 'body', [('etag', '"1"')])).read(), 'body')
+        response = self.get(Response(304, '', []))
+        self.assertEqual(response.read(), 'body')
+        self.assertEqual(self.connection.requests[-1][2]['If-None-Match'], '"1"')
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_large_body_with_length_is_not_read(self):
+        original = Response(200, 'x' * 2000, [('etag', '"1"'), ('content-length', '2000')])
+        self.assertTrue(self.get(original) is original)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_large_body_without_length(self):
+        body = ''.join(chr(ord('a') + i % 26) for i in range(5000))
+        response = self.get(Response(200, body, [('etag', '"1"')]))
+        self.assertEqual(response.read(10), body[:10])
+        self.assertEqual(response.read(), body[10:])
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import gettext
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from StringIO import StringIO
+
+from pertinax import i18n
+from pertinax.config import Config
+from pertinax.encoding import u_obj, u_str
+from pertinax.i18n import LazyString, load_translations, parse_mo
+
+HEADER = ('Content-Type: text/plain; charset=UTF-8\n'
+          'Plural-Forms: nplurals=3; plural=(n==1 ? 0 : n>=2 && n<=4 ? 1 : 2);\n')
+
+MESSAGES = {
+    '': HEADER,
+    'exit the shell': 'ukončit shell',
+    'item\x00items': 'položka\x00položky\x00položek',
+}
+
+
+def make_mo(messages):
+    """
+    Returns content of a .mo file with the messages {msgid: msgstr}.
+    """
+    ids = sorted(messages)
+    strs = [messages[msgid] for msgid in ids]
+    count = len(ids)
+    ids_offset = 28
+    strs_offset = ids_offset + 8 * count
+    data_offset = strs_offset + 8 * count
+    table = []
+    data = ''
+    for text in ids + strs:
+        table.append((len(text), data_offset + len(data)))
+        data += text + '\x00'
+    output = struct.pack('<7I', 0x950412de, 0, count, ids_offset, strs_offset, 0, 0)
+    for length, offset in table:
+        output += struct.pack('<2I', length, offset)
+    return output + data
+
+
+class ParseMoTest(unittest.TestCase):
+
+    def test_same_translations_as_gettext(self):
+        data = make_mo(MESSAGES)
+        reference = gettext.GNUTranslations(StringIO(data))
+        catalog, info = parse_mo(data)
+        translations = i18n.CatalogTranslations(catalog, info, i18n._plural_expression(info))
+
+        self.assertEqual(translations.ugettext('exit the shell'), reference.ugettext('exit the shell'))
+        self.assertEqual(translations.ugettext('unknown'), reference.ugettext('unknown'))
+        for n in (1, 3, 5):
+            self.assertEqual(translations.ungettext('item', 'items', n),
+                reference.ungettext('item', 'items', n))
+        self.assertEqual(translations.info()['content-type'], 'text/plain; charset=UTF-8')
+
+    def test_bad_magic(self):
+        self.assertRaises(IOError, parse_mo, 'not a mo file at all')
+
+
+class LoadTranslationsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.user_dir = Config.USER_DIR
+        Config.USER_DIR = self.directory
+        self.mofile = os.path.join(self.directory, 'katello-cli.mo')
+        with open(self.mofile, 'wb') as f:
+            f.write(make_mo(MESSAGES))
+
+    def tearDown(self):
+        Config.USER_DIR = self.user_dir
+        shutil.rmtree(self.directory)
+
+    def test_cached_catalog(self):
+        first = load_translations(self.mofile)
+        self.assertTrue(os.path.exists(i18n._catalog_cache_path(self.mofile)))
+        second = load_translations(self.mofile)
+        self.assertEqual(second.catalog, first.catalog)
+        self.assertEqual(second.ungettext('item', 'items', 3), u'položky')
+        self.assertEqual(second.gettext('exit the shell'), 'ukončit shell')
+
+
+class LazyStringTest(unittest.TestCase):
+
+    def test_casting_functions_resolve_lazy_strings(self):
+        text = LazyString('exit the shell')
+        self.assertEqual(u_str(text), u'exit the shell')
+        self.assertEqual(type(u_str(text)), unicode)
+        self.assertEqual(u_obj({'description': text}), {'description': u'exit the shell'})
+
+    def test_string_operations(self):
+        text = LazyString('exit')
+        self.assertEqual(text + ' now', u'exit now')
+        self.assertEqual(text.upper(), u'EXIT')
+        self.assertEqual(len(text), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import unittest
+
+from okaara.cli import CommandUsage
+
+from pertinax.i18n_optparse import NoCatchErrorParser, OptionParser
+
+
+class OptionParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = OptionParser()
+        self.parser.add_option('--org', dest='org')
+        self.parser.add_option('--count', dest='count', type='int')
+        self.parser.add_option('-v', '--verbose', dest='verbose', action='store_true')
+
+    def test_option_by_dest_and_name(self):
+        self.assertEqual(self.parser.get_option_by_dest('count').get_opt_string(), '--count')
+        self.assertEqual(self.parser.get_option_by_name('v').dest, 'verbose')
+        self.assertEqual(self.parser.get_option_by_name('verbose').dest, 'verbose')
+        self.assertEqual(self.parser.get_option_by_dest('missing'), None)
+
+    def test_removed_option_leaves_the_index(self):
+        self.parser.add_option('--organization', dest='org')
+        self.parser.remove_option('--org')
+        self.assertEqual(self.parser.get_option_by_dest('org').get_opt_string(), '--organization')
+        self.parser.remove_option('--organization')
+        self.assertEqual(self.parser.get_option_by_dest('org'), None)
+
+    def test_saved_defaults_are_coerced(self):
+        self.parser.set_saved_defaults([('count', '5'), ('org', 'ACME'), ('unknown', 'x')])
+        values, _args = self.parser.parse_args([])
+        self.assertEqual(values.count, 5)
+        self.assertEqual(values.org, 'ACME')
+
+    def test_invalid_saved_default_is_kept_raw(self):
+        self.parser.set_saved_defaults([('count', 'many')])
+        self.assertEqual(self.parser.defaults['count'], 'many')
+
+    def test_unchanged_saved_defaults_are_skipped(self):
+        saved = [('org', 'ACME')]
+        self.parser.set_saved_defaults(saved)
+        self.parser.set_default('org', 'other')
+        # same saved options, the defaults are not set again
+        self.parser.set_saved_defaults(saved)
+        self.assertEqual(self.parser.defaults['org'], 'other')
+
+
+
+class NoCatchErrorParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = NoCatchErrorParser()
+        self.parser.add_option('--name', dest='name')
+        self.parser.add_option('--tag', dest='tags', action='append')
+
+    def test_cached_results_are_copies(self):
+        values, args = self.parser.parse_args(['--tag', 'a', 'rest'])
+        values.tags.append('changed')
+        args.append('changed')
+        values, args = self.parser.parse_args(['--tag', 'a', 'rest'])
+        self.assertEqual(values.tags, ['a'])
+        self.assertEqual(args, ['rest'])
+
+    def test_changed_defaults_drop_the_cache(self):
+        self.assertEqual(self.parser.parse_args([])[0].name, None)
+        self.parser.set_default('name', 'default')
+        self.assertEqual(self.parser.parse_args([])[0].name, 'default')
+
+    def test_errors_are_raised_every_time(self):
+        for _i in range(2):
+            self.assertRaises(CommandUsage, self.parser.parse_args, ['--unknown'])
+
+    def test_callbacks_are_not_cached(self):
+        calls = []
+        self.parser.add_option('--call', action='callback', callback=lambda *args: calls.append(1))
+        self.parser.parse_args(['--call'])
+        self.parser.parse_args(['--call'])
+        self.assertEqual(len(calls), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import json
+import time
+import unittest
+
+from pertinax.jsonstream import JsonStreamError, iter_json_array
+
+DOCUMENT = json.dumps([
+    {'id': 1, 'name': u'žluťoučký', 'tags': ['a', 'b]', '{c'], 'nested': {'x': [1, [2, {}]]}},
+    'a "quoted" string with \\ backslash',
+    12.5e3,
+    -7,
+    True,
+    None,
+    [],
+    {},
+], indent=2)
+
+
+def split(text, size):
+    return [text[i:i + size] for i in xrange(0, len(text), size)]
+
+
+class IterJsonArrayTest(unittest.TestCase):
+
+    def test_any_chunking(self):
+        expected = json.loads(DOCUMENT)
+        for size in (1, 2, 3, 7, 64, len(DOCUMENT)):
+            self.assertEqual(list(iter_json_array(split(DOCUMENT, size))), expected)
+
+    def test_number_split_between_chunks(self):
+        self.assertEqual(list(iter_json_array(['[12', '34, 5', '6]'])), [1234, 56])
+
+    def test_escape_at_the_end_of_a_chunk(self):
+        self.assertEqual(list(iter_json_array(['["a\\', '"b", "c"]'])), [u'a"b', u'c'])
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array([' [ ] '])), [])
+
+    def test_wrap(self):
+        self.assertEqual(list(iter_json_array(['[1, 2]'], wrap=str)), ['1', '2'])
+
+    def test_errors(self):
+        for document in ('{"a": 1}', '[1, 2', '[1 2]', '[tru]', '[1,,2]', '[{"a": 1]'):
+            self.assertRaises(JsonStreamError, list, iter_json_array([document]))
+
+    def test_large_element_is_decoded_once(self):
+        element = {'values': ['x' * 100] * 20000}
+        chunks = split(json.dumps([element, element]), 1024)
+        start = time.time()
+        self.assertEqual(list(iter_json_array(chunks)), [element, element])
+        # quadratic re-decoding of the ~2MB elements takes minutes
+        self.assertTrue(time.time() - start < 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
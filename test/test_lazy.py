@@ -0,0 +1,65 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import sys
+import unittest
+
+from pertinax.config import lazy_path
+from pertinax.lazy import LazyModule, lazy_import
+
+
+class LazyImportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = sys.modules.pop('colorsys', None)
+
+    def tearDown(self):
+        sys.modules.pop('colorsys', None)
+        if self.saved is not None:
+            sys.modules['colorsys'] = self.saved
+
+    def test_imported_on_first_access(self):
+        namespace = {}
+        module = namespace['colorsys'] = lazy_import('colorsys', namespace)
+        self.assertTrue(isinstance(module, LazyModule))
+        self.assertFalse('colorsys' in sys.modules)
+        self.assertEqual(module.rgb_to_hsv(0, 0, 0), (0, 0, 0))
+        # the placeholder was replaced in the namespace
+        self.assertTrue(namespace['colorsys'] is sys.modules['colorsys'])
+
+    def test_imported_module_returned_directly(self):
+        self.assertTrue(lazy_import('os') is sys.modules['os'])
+
+
+class LazyPathTest(unittest.TestCase):
+
+    def test_computed_once(self):
+        calls = []
+
+        class Paths(object):
+            @lazy_path
+            def HOME(cls):
+                calls.append(cls)
+                return '/home/' + cls.__name__
+        self.assertEqual(Paths.HOME, '/home/Paths')
+        self.assertEqual(Paths.HOME, '/home/Paths')
+        self.assertEqual(calls, [Paths])
+        # the attribute is a plain value now, it can be overridden
+        Paths.HOME = '/tmp'
+        self.assertEqual(Paths.HOME, '/tmp')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from pertinax.logutil import QueueHandler
+
+# run in a fresh interpreter, where nothing else has set up the logging yet
+SCRIPT = '''
+import __builtin__; __builtin__._ = lambda text: text
+import sys
+import pertinax.concurrency, pertinax.exceptions, pertinax.httpcache, pertinax.namecache
+from pertinax import logutil
+logutil.LOGDIR = logutil.Config.USER_DIR = sys.argv[1]
+assert logutil.handler is None, 'set up on import'
+pertinax.concurrency._log.debug('first use')
+assert logutil.handler is not None, 'not set up on the first use'
+'''
+
+
+class LazyLoggerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_logging_set_up_on_first_use(self):
+        logdir = os.path.join(self.directory, 'log')
+        self.assertEqual(subprocess.call([sys.executable, '-c', SCRIPT, logdir]), 0)
+        self.assertTrue(os.path.exists(logdir))
+
+
+
+class ListHandler(logging.Handler):
+
+    def __init__(self, blocker=None):
+        logging.Handler.__init__(self)
+        self.records = []
+        self.blocker = blocker
+
+    def emit(self, record):
+        if self.blocker is not None:
+            self.blocker.wait(5)
+        self.records.append(record)
+
+
+class QueueHandlerTest(unittest.TestCase):
+
+    def record(self, msg, *args):
+        return logging.LogRecord('test', logging.INFO, __file__, 0, msg, args, None)
+
+    def test_records_written_in_order(self):
+        target = ListHandler()
+        handler = QueueHandler(target, batch_size=7)
+        for i in range(100):
+            handler.handle(self.record('record %d', i))
+        handler.close()
+        self.assertEqual([record.msg for record in target.records], ['record %d' % i for i in range(100)])
+
+    def test_message_formatted_when_logged(self):
+        target = ListHandler()
+        handler = QueueHandler(target)
+        state = ['before']
+        handler.handle(self.record('state %s', state))
+        state[0] = 'after'
+        handler.close()
+        self.assertEqual(target.records[0].getMessage(), "state ['before']")
+
+    def test_full_queue_drops_records(self):
+        blocker = threading.Event()
+        target = ListHandler(blocker)
+        handler = QueueHandler(target, queue_size=1, batch_size=1)
+        for i in range(10):
+            handler.handle(self.record('record %d', i))
+        self.assertTrue(handler.dropped > 0)
+        blocker.set()
+        handler.close()
+        # the writer reports how many records were dropped
+        messages = [record.getMessage() for record in target.records]
+        self.assertTrue(any('were dropped' in message for message in messages))
+
+if __name__ == '__main__':
+    unittest.main()
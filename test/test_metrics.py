@@ -0,0 +1,59 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from pertinax.exceptions import CODE_UNEXPECTED
+from pertinax.metrics import MetricsFile
+
+
+class MetricsFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.metrics = MetricsFile(os.path.join(self.directory, 'cli.prom'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def state(self):
+        with open(self.metrics.state_path) as f:
+            return json.load(f)
+
+    def test_success(self):
+        self.metrics.record('org list', os.EX_OK, 0.2, 0.01, 1)
+        cmd = self.state()['org list']
+        self.assertEqual(cmd['invocations'], 1)
+        self.assertEqual(cmd['failures'], {})
+
+    def test_missing_exit_code_is_a_failure(self):
+        self.metrics.record('org list', None, 0.2, 0.01, 1)
+        self.assertEqual(self.state()['org list']['failures'], {str(CODE_UNEXPECTED): 1})
+
+    def test_failures_by_exit_code(self):
+        self.metrics.record('org list', os.EX_DATAERR, 0.2, 0.01, 1)
+        self.metrics.record('org list', os.EX_DATAERR, 0.2, 0.01, 1)
+        with open(self.metrics.path) as f:
+            text = f.read()
+        self.assertTrue('katello_cli_failures_total{command="org list",exit_code="%d"} 2' % os.EX_DATAERR in text)
+        self.assertTrue('katello_cli_invocations_total{command="org list"} 2' in text)
+
+
+if __name__ == '__main__':
+    unittest.main()
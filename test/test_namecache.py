@@ -0,0 +1,105 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pertinax.namecache import NameCache, cachefile
+
+
+class NotFound(Exception):
+    pass
+
+
+class NameCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.lookups = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def lookup(self, name):
+        self.lookups.append(name)
+        return {'ACME': 1, 'Dev': 2}.get(name)
+
+    def test_resolve_caches_found_ids(self):
+        cache = NameCache()
+        self.assertEqual(cache.resolve('organization', 'ACME', self.lookup), 1)
+        self.assertEqual(cache.resolve('organization', 'ACME', self.lookup), 1)
+        self.assertEqual(cache.resolve('organization', 'missing', self.lookup), None)
+        self.assertEqual(cache.resolve('organization', 'missing', self.lookup), None)
+        self.assertEqual(self.lookups, ['ACME', 'missing', 'missing'])
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_scopes_are_separate(self):
+        cache = NameCache()
+        cache.put('environment', 'Dev', 2, scope=(1,))
+        self.assertEqual(cache.get('environment', 'Dev', scope=(1,)), 2)
+        self.assertEqual(cache.get('environment', 'Dev', scope=(3,)), None)
+
+    def test_expired_entries(self):
+        cache = NameCache(ttl=-1)
+        cache.put('organization', 'ACME', 1)
+        self.assertEqual(cache.get('organization', 'ACME'), None)
+
+    def test_resolve_many_looks_up_missing_names_once(self):
+        cache = NameCache()
+        cache.put('organization', 'ACME', 1)
+        calls = []
+
+        def lookup_many(names):
+            calls.append(names)
+            return {'Dev': 2}
+        resolved = cache.resolve_many('organization', ['ACME', 'Dev', 'Dev', 'missing'], lookup_many)
+        self.assertEqual(resolved, {'ACME': 1, 'Dev': 2})
+        self.assertEqual(calls, [['Dev', 'missing']])
+
+    def test_stale_id_is_resolved_again(self):
+        cache = NameCache(is_not_found=lambda e: isinstance(e, NotFound))
+        cache.put('organization', 'ACME', 99)
+        calls = []
+
+        def call(object_id):
+            calls.append(object_id)
+            if object_id == 99:
+                raise NotFound()
+            return 'ok'
+        self.assertEqual(cache.call_with('organization', 'ACME', self.lookup, call), 'ok')
+        self.assertEqual(calls, [99, 1])
+        self.assertEqual(cache.get('organization', 'ACME'), 1)
+
+    def test_not_found_without_cached_id_is_raised(self):
+        cache = NameCache(is_not_found=lambda e: isinstance(e, NotFound))
+
+        def call(object_id):
+            raise NotFound()
+        self.assertRaises(NotFound, cache.call_with, 'organization', 'ACME', self.lookup, call)
+
+    def test_persisted(self):
+        path = cachefile(self.directory, 'localhost:443/katello', 'admin')
+        cache = NameCache(path)
+        cache.put('environment', 'Dev', 2, scope=(1,))
+        cache.save()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(NameCache(path).get('environment', 'Dev', scope=(1,)), 2)
+        self.assertNotEqual(path, cachefile(self.directory, 'localhost:443/katello', 'other'))
+
+
+if __name__ == '__main__':
+    unittest.main()
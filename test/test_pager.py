@@ -0,0 +1,105 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import os
+import time
+import unittest
+from StringIO import StringIO
+
+from pertinax.ui.pager import Pager
+from pertinax.ui.printer import GrepStrategy, VerboseStrategy
+
+COLUMNS = [{'attr_name': 'id', 'name': 'Id'}, {'attr_name': 'name', 'name': 'Name'}]
+
+
+def make_pager(items, strategy=None, input=None):
+    strategy = strategy or GrepStrategy(output=StringIO())
+    return Pager(strategy, None, COLUMNS, items, input=input, output=StringIO())
+
+
+def items(count):
+    return [{'id': i, 'name': u'item %d' % i} for i in range(count)]
+
+
+class PagerTest(unittest.TestCase):
+
+    def test_empty_source(self):
+        pager = make_pager([])
+        for action in ('down', 'page_down', 'up', 'page_up', 'end', 'home'):
+            self.assertTrue(pager.handle(action))
+            self.assertEqual(pager.top, (0, 0))
+        self.assertTrue(pager.handle('search', 'x'))
+        self.assertTrue(pager.message)
+        pager.draw()
+
+    def test_scroll_stops_at_the_last_line(self):
+        pager = make_pager(items(5))
+        pager.scroll_down(100)
+        self.assertEqual(pager.top, (4, 0))
+        pager.scroll_up(2)
+        self.assertEqual(pager.top, (2, 0))
+
+    def test_scroll_within_multiline_items(self):
+        pager = make_pager(items(3), VerboseStrategy(output=StringIO()))
+        height = len(pager.item_lines(0))
+        pager.scroll_down(height + 1)
+        self.assertEqual(pager.top, (1, 1))
+        pager.scroll_up(2)
+        self.assertEqual(pager.top, (0, height - 1))
+
+    def test_end_of_lazy_source(self):
+        pager = make_pager(iter(items(500)))
+        pager.handle('end')
+        self.assertTrue(pager.source.exhausted)
+        self.assertEqual(pager.top[0], 500 - pager.body_height())
+
+    def test_search_column_values(self):
+        pager = make_pager(items(300))
+        self.assertTrue(pager.handle('search', 'ITEM 250'))
+        self.assertEqual(pager.top, (250, 0))
+        self.assertTrue(pager.handle('next'))
+        self.assertTrue(pager.message)
+
+
+class ReadKeyTest(unittest.TestCase):
+
+    def setUp(self):
+        read_fd, self.write_fd = os.pipe()
+        self.input = os.fdopen(read_fd)
+        self.pager = make_pager(items(1), input=self.input)
+
+    def tearDown(self):
+        self.input.close()
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+
+    def test_keys(self):
+        os.write(self.write_fd, 'j\033[A\033[5~q')
+        self.assertEqual([self.pager.read_key() for _i in range(4)], ['j', '\033[A', '\033[5~', 'q'])
+
+    def test_bare_escape_doesnt_block(self):
+        os.write(self.write_fd, '\033')
+        start = time.time()
+        self.assertEqual(self.pager.read_key(), '\033')
+        self.assertTrue(time.time() - start < 1)
+
+    def test_end_of_input(self):
+        os.close(self.write_fd)
+        self.write_fd = None
+        self.assertEqual(self.pager.read_key(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import threading
+import time
+import unittest
+
+from pertinax.paging import PagerError, PrefetchingPager
+
+
+class Server(object):
+    """
+    Paginated api with a cap on the page size.
+    """
+
+    def __init__(self, count, cap=None, with_total=False):
+        self.items = range(count)
+        self.cap = cap
+        self.with_total = with_total
+        self.requests = []
+
+    def fetch(self, offset, limit):
+        self.requests.append((offset, limit))
+        if self.cap is not None:
+            limit = min(limit, self.cap)
+        page = self.items[offset:offset + limit]
+        if self.with_total:
+            return {'results': page, 'total': len(self.items), 'subtotal': len(self.items)}
+        return page
+
+
+class PrefetchingPagerTest(unittest.TestCase):
+
+    def test_all_items(self):
+        server = Server(1234)
+        self.assertEqual(list(PrefetchingPager(server.fetch, page_size=100)), server.items)
+
+    def test_capped_page_size_doesnt_truncate(self):
+        server = Server(500, cap=50)
+        pager = PrefetchingPager(server.fetch, page_size=100, target_latency=10)
+        self.assertEqual(list(pager), server.items)
+
+    def test_total_ends_without_an_empty_page(self):
+        server = Server(250, with_total=True)
+        self.assertEqual(list(PrefetchingPager(server.fetch, page_size=100)), server.items)
+        # no request for the empty page after the last item
+        self.assertTrue(all(offset < 250 for offset, _limit in server.requests))
+
+    def test_empty(self):
+        self.assertEqual(list(PrefetchingPager(Server(0).fetch)), [])
+
+    def test_error_is_raised_in_the_consumer(self):
+        def fetch(offset, limit):
+            if offset:
+                raise ValueError('server error')
+            return range(limit)
+        pager = iter(PrefetchingPager(fetch, page_size=10))
+        self.assertEqual([next(pager) for _i in xrange(10)], range(10))
+        self.assertRaises(ValueError, next, pager)
+
+    def test_timeout(self):
+        release = threading.Event()
+
+        def fetch(offset, limit):
+            release.wait(5)
+            return []
+        try:
+            start = time.time()
+            self.assertRaises(PagerError, list, PrefetchingPager(fetch, timeout=0.3))
+            self.assertTrue(time.time() - start < 2)
+        finally:
+            release.set()
+
+
+if __name__ == '__main__':
+    unittest.main()
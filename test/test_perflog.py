@@ -0,0 +1,98 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from multiprocessing import Process
+
+from pertinax.perflog import EventSink, percentile, read_events
+
+
+class PercentileTest(unittest.TestCase):
+
+    def test_nearest_rank(self):
+        values = [1, 2, 3, 4]
+        self.assertEqual(percentile(values, 50), 2)
+        self.assertEqual(percentile(values, 75), 3)
+        self.assertEqual(percentile(values, 76), 4)
+        self.assertEqual(percentile(values, 100), 4)
+
+    def test_rank_of_exact_products(self):
+        values = range(1, 21)
+        self.assertEqual(percentile(values, 95), 19)
+        self.assertEqual(percentile(values, 5), 1)
+
+    def test_bounds(self):
+        self.assertEqual(percentile([7], 0), 7)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([], 50), None)
+
+
+def _write_events(path, process, count):
+    sink = EventSink(path, max_bytes=0)
+    for i in xrange(count):
+        sink.write({'process': process, 'i': i, 'padding': 'x' * 500})
+
+
+class EventSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'perf.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write_appends_lines(self):
+        sink = EventSink(self.path)
+        sink.write({'a': 1})
+        sink.write({'a': 2})
+        self.assertEqual([e['a'] for e in read_events([self.path])], [1, 2])
+
+    def test_rotation(self):
+        sink = EventSink(self.path, max_bytes=100, backup_count=2)
+        for i in xrange(10):
+            sink.write({'i': i, 'padding': 'x' * 30})
+        self.assertTrue(os.path.getsize(self.path) <= 100)
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        self.assertTrue(os.path.exists(self.path + '.2'))
+        self.assertFalse(os.path.exists(self.path + '.3'))
+        events = list(read_events([self.path + '.2', self.path + '.1', self.path]))
+        self.assertEqual([e['i'] for e in events], range(10 - len(events), 10))
+
+    def test_unwritable_path_is_ignored(self):
+        path = os.path.join(self.directory, 'missing', 'perf.jsonl')
+        EventSink(path).write({'a': 1})
+        EventSink(path, max_bytes=1).write({'a': 1})
+        self.assertFalse(os.path.exists(path))
+
+    def test_concurrent_processes_write_whole_lines(self):
+        processes = [Process(target=_write_events, args=(self.path, p, 200)) for p in xrange(4)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        with open(self.path) as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 800)
+        for line in lines:
+            json.loads(line)
+
+
+if __name__ == '__main__':
+    unittest.main()
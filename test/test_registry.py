@@ -0,0 +1,108 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import unittest
+
+from pertinax.registry import CommandRegistry, CommandType, command_name
+
+
+class Section(object):
+
+    def __init__(self, commands=None, subsections=None):
+        self.commands = commands or {}
+        self.subsections = subsections or {}
+
+
+class CommandNameTest(unittest.TestCase):
+
+    def test_snake_case(self):
+        self.assertEqual(command_name('CreateSyncPlan'), 'create_sync_plan')
+        self.assertEqual(command_name('List'), 'list')
+        self.assertEqual(command_name('ImportHTTPManifest'), 'import_http_manifest')
+
+
+class CommandRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = CommandRegistry()
+
+        class Info(object):
+            name = 'info'
+            aliases = ('show',)
+        self.info = Info
+        self.registry.register(Info)
+
+    def test_classes_by_name_and_alias(self):
+        self.assertEqual(self.registry.get_classes('info'), [self.info])
+        self.assertEqual(self.registry.get_classes('show'), [self.info])
+        self.assertEqual(self.registry.get_classes('other'), [])
+        self.assertEqual(self.registry.resolve_name('show'), 'info')
+
+    def test_find_in_section(self):
+        command = self.info()
+        section = Section(commands={'info': command}, subsections={'repo': Section()})
+        self.assertTrue(self.registry.find(section, 'info') is command)
+        self.assertTrue(self.registry.find(section, 'show') is command)
+        self.assertTrue(self.registry.contains(section, 'repo'))
+        self.assertFalse(self.registry.contains(section, 'list'))
+
+    def test_alias_shared_by_sections(self):
+        class List(object):
+            name = 'list'
+            aliases = ('ls',)
+
+        class ListRepos(object):
+            name = 'list_repos'
+            aliases = ('ls',)
+
+        class Plain(object):
+            name = 'list'
+            aliases = ()
+        self.registry.register(List)
+        self.registry.register(ListRepos)
+        self.registry.register(Plain)
+
+        org = Section(commands={'list': List()})
+        repo = Section(commands={'list': Plain(), 'list_repos': ListRepos()})
+        self.assertTrue(isinstance(self.registry.find(org, 'ls'), List))
+        self.assertTrue(isinstance(self.registry.find(repo, 'ls'), ListRepos))
+        self.assertEqual(self.registry.find(Section(commands={'list': Plain()}), 'ls'), None)
+        self.assertEqual(self.registry.get_classes('ls'), [List, ListRepos])
+
+
+class CommandTypeTest(unittest.TestCase):
+
+    def test_name_and_registration(self):
+        from pertinax.registry import registry
+
+        class TestBase(object):
+            __metaclass__ = CommandType
+
+        class TestAbstractCommand(TestBase):
+            abstract = True
+
+        class TestRegisteredCommand(TestAbstractCommand):
+            aliases = ('test_registered_alias',)
+
+        self.assertEqual(TestRegisteredCommand.name, 'test_registered_command')
+        self.assertEqual(registry.get_classes('test_registered_alias'), [TestRegisteredCommand])
+        self.assertEqual(registry.get_classes('test_abstract_command'), [])
+        self.assertEqual(registry.get_classes('test_base'), [])
+        # the abstract flag is not inherited
+        self.assertFalse(hasattr(TestRegisteredCommand, 'abstract'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from pertinax import replay
+from pertinax.replay import (Fixture, Recorder, RecordingProxy, ReplayBindings, ReplayMismatch,
+    decode_value, encode_value)
+
+
+class Organizations(object):
+
+    def organizations(self):
+        return [{'name': u'Ácme', 'labels': ('a', 'b'), 'ids': {1: 'one'}}]
+
+    def organization(self, name):
+        if name == 'missing':
+            raise KeyError(name)
+        return {'name': name, 'created': datetime(2013, 1, 2)}
+
+
+class Bindings(object):
+
+    def __init__(self):
+        self.organization = Organizations()
+
+
+class EncodingTest(unittest.TestCase):
+
+    def round_trip(self, value):
+        decoded = decode_value(encode_value(value))
+        self.assertEqual(decoded, value)
+        self.assertEqual(type(decoded), type(value))
+        return decoded
+
+    def test_types(self):
+        self.round_trip((1, [2, 3]))
+        self.round_trip(set([1, 2]))
+        self.round_trip('\xff bytes')
+        self.round_trip(u'text')
+        self.round_trip({1: 'one', (2, 3): None})
+        self.round_trip({u'__tuple__': 1})
+        self.round_trip(datetime(2013, 1, 2))
+        self.assertEqual(type(self.round_trip({u'key': 'bytes'})[u'key']), str)
+        self.assertEqual(type(self.round_trip([(1,)])[0]), tuple)
+
+    def test_plain_json_is_unchanged(self):
+        value = {u'name': u'x', u'items': [1, 2.5, None, True]}
+        self.assertEqual(encode_value(value), value)
+
+
+class ReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'fixture.json')
+
+    def tearDown(self):
+        replay._fixtures.pop(self.path, None)
+        shutil.rmtree(self.directory)
+
+    def record(self):
+        recorder = Recorder(self.path)
+        api = RecordingProxy(Bindings(), recorder)
+        api.organization.organizations()
+        api.organization.organization('x')
+        self.assertRaises(KeyError, api.organization.organization, 'missing')
+        recorder.save()
+
+    def test_replay_keeps_types(self):
+        self.record()
+        api = ReplayBindings(Fixture.load(self.path))
+        bindings = Bindings()
+        self.assertEqual(api.organization.organizations(), bindings.organization.organizations())
+        self.assertEqual(api.organization.organizations()[0]['labels'], ('a', 'b'))
+        self.assertEqual(api.organization.organization('x'), bindings.organization.organization('x'))
+        self.assertRaises(KeyError, api.organization.organization, 'missing')
+        self.assertRaises(ReplayMismatch, api.organization.organization, 'other')
+
+    def test_answers_are_copies(self):
+        self.record()
+        api = ReplayBindings(Fixture.load(self.path))
+        api.organization.organizations()[0]['name'] = 'changed'
+        self.assertEqual(api.organization.organizations()[0]['name'], u'Ácme')
+
+    def test_fixture_loaded_once(self):
+        self.record()
+        fixture = Fixture.get(self.path)
+        os.remove(self.path)
+        self.assertTrue(Fixture.get(self.path) is fixture)
+
+
+if __name__ == '__main__':
+    unittest.main()
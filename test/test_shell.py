@@ -0,0 +1,66 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import sys
+import unittest
+
+from pertinax.encoding import EncodedOutput, raw_stream
+from pertinax.shell import Shell
+
+
+class Section(object):
+
+    def __init__(self):
+        self.commands = {}
+        self.subsections = {}
+
+
+class Prompt(object):
+    output = None
+
+
+class Cli(object):
+
+    def __init__(self):
+        self.root_section = Section()
+        self.prompt = Prompt()
+
+    def add_command(self, command):
+        pass
+
+
+class ShellTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout = sys.stdout
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+
+    def test_stdout_stays_raw(self):
+        cli = Cli()
+        shell = Shell(cli, use_history=False)
+        stdout = sys.stdout
+        self.assertTrue(stdout is raw_stream(stdout))
+        self.assertTrue(isinstance(cli.prompt.output, EncodedOutput))
+
+        self.assertEqual(shell.precmd('  command --option value '), 'command --option value')
+        self.assertTrue(sys.stdout is stdout)
+        shell.postcmd(False, '')
+        self.assertTrue(sys.stdout is stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
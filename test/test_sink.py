@@ -0,0 +1,114 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import random
+import threading
+import time
+import unittest
+from StringIO import StringIO
+
+from pertinax.concurrency import fan_out
+from pertinax.ui.printer import Printer
+from pertinax.ui.sink import OutputSink, output_sink
+
+
+class OutputSinkTest(unittest.TestCase):
+
+    def test_shared_per_stream(self):
+        stream = StringIO()
+        self.assertTrue(output_sink(stream) is output_sink(stream))
+        sink = OutputSink(StringIO())
+        self.assertTrue(output_sink(sink) is sink)
+
+    def test_atomic_blocks_dont_interleave(self):
+        stream = StringIO()
+        sink = output_sink(stream)
+
+        def write(name):
+            for _i in range(50):
+                with sink.atomic():
+                    for part in ('<', name, '>'):
+                        sink.write(part)
+                        time.sleep(0)
+        threads = [threading.Thread(target=write, args=(str(i),)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        text = stream.getvalue()
+        self.assertEqual(len(text), 4 * 50 * 3)
+        for i in range(0, len(text), 3):
+            self.assertEqual((text[i], text[i + 2]), ('<', '>'))
+
+
+class OrderedOutputTest(unittest.TestCase):
+
+    def test_tasks_written_in_order(self):
+        stream = StringIO()
+        ordered = output_sink(stream).ordered()
+
+        def task(index):
+            time.sleep(random.random() / 100)
+            with ordered.task(index) as out:
+                out.write('%d\n' % index)
+        threads = [threading.Thread(target=task, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ordered.close()
+        self.assertEqual(stream.getvalue(), ''.join('%d\n' % i for i in range(20)))
+
+    def test_close_skips_unfinished_tasks(self):
+        stream = StringIO()
+        ordered = output_sink(stream).ordered()
+        with ordered.task(1) as out:
+            out.write('1\n')
+        self.assertEqual(stream.getvalue(), '')
+        ordered.close()
+        self.assertEqual(stream.getvalue(), '1\n')
+        with ordered.task(0) as out:
+            out.write('0\n')
+        self.assertEqual(stream.getvalue(), '1\n0\n')
+
+    def test_failed_task_output_is_written(self):
+        stream = StringIO()
+        ordered = output_sink(stream).ordered()
+        try:
+            with ordered.task(0) as out:
+                out.write('partial\n')
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(stream.getvalue(), 'partial\n')
+
+    def test_printer_in_fan_out(self):
+        stream = StringIO()
+        printer = Printer(output=stream, noheading=True)
+        printer.add_column('id')
+        ordered = printer.ordered_output()
+
+        def call(index):
+            time.sleep(random.random() / 50)
+            printer.print_items([{'id': index}])
+        result = fan_out(call, range(16), workers=8, output=ordered)
+        ordered.close()
+        self.assertTrue(result.ok())
+        self.assertEqual([int(line) for line in stream.getvalue().split()], range(16))
+        self.assertEqual(printer.rows_printed, 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import threading
+import unittest
+from StringIO import StringIO
+
+from pertinax.timing import PhaseTimer
+
+
+class PhaseTimerTest(unittest.TestCase):
+
+    def test_phases_in_order_and_summed(self):
+        timer = PhaseTimer()
+        timer.add('parse', 0.5)
+        timer.add('run', 1.0)
+        timer.add('parse', 0.25)
+        self.assertEqual(timer.phases(), [('parse', 0.75), ('run', 1.0)])
+        self.assertEqual(timer.get('missing'), 0.0)
+
+    def test_phase_recorded_on_error(self):
+        timer = PhaseTimer()
+        try:
+            with timer.phase('run'):
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual([name for name, _seconds in timer.phases()], ['run'])
+
+    def test_threads(self):
+        timer = PhaseTimer()
+
+        def add():
+            for _i in range(1000):
+                timer.add('api', 0.001)
+        threads = [threading.Thread(target=add) for _i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertAlmostEqual(timer.get('api'), 4.0)
+
+    def test_report(self):
+        timer = PhaseTimer()
+        timer.add('render', 0.002)
+        output = StringIO()
+        timer.report(output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], 'Timings:')
+        self.assertEqual(lines[1].split(), ['render', '2.00', 'ms'])
+        self.assertEqual(lines[2].split()[0], 'total')
+
+
+if __name__ == '__main__':
+    unittest.main()
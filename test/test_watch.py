@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright 2013 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Red Hat trademarks are not licensed under GPLv2. No permission is
+# granted to use or replicate Red Hat trademarks that are incorporated
+# in this software or its documentation.
+#
+
+import unittest
+from StringIO import StringIO
+
+from pertinax.ui.watch import CLEAR_SCREEN, FrameBuffer, WatchScreen, move_to
+
+
+class WatchScreenTest(unittest.TestCase):
+
+    def setUp(self):
+        self.output = StringIO()
+        self.screen = WatchScreen(self.output, width=10, height=4)
+
+    def show(self, text):
+        self.output.truncate(0)
+        frame = FrameBuffer()
+        frame.write(text)
+        self.screen.show(frame.lines())
+        return self.output.getvalue()
+
+    def test_lines_cut_to_width(self):
+        text = self.show(u'0123456789abc\n日本語日本語')
+        self.assertTrue(u'0123456789\n' in text)
+        self.assertFalse(u'abc' in text)
+        # wide characters take two columns
+        self.assertTrue(u'日本語日本' in text)
+        self.assertFalse(u'日本語日本語' in text)
+
+    def test_frame_cut_to_height(self):
+        text = self.show(u'a\nb\nc\nd\ne')
+        self.assertTrue(text.endswith(u'a\nb\nc' + move_to(3)))
+
+    def test_only_changed_visible_lines_redrawn(self):
+        self.show(u'a\nb\nc\nd')
+        text = self.show(u'a\nB\nc\nD')
+        self.assertEqual(text, move_to(1) + u'B\033[K' + move_to(3))
+
+    def test_resize_redraws(self):
+        self.show(u'a\nb')
+        self.screen.width = 20
+        self.assertTrue(CLEAR_SCREEN in self.show(u'a\nb'))
+
+
+if __name__ == '__main__':
+    unittest.main()